@@ -5,11 +5,20 @@ API client for communicating with the Core API
 import aiohttp
 import logging
 from typing import Dict, Optional, List
+from urllib.parse import parse_qs, urlparse
 from config import config
 
 logger = logging.getLogger(__name__)
 
 
+def cursor_from_url(url: Optional[str]) -> Optional[str]:
+    """Extract the ``cursor`` query parameter from a keyset pagination link"""
+    if not url:
+        return None
+    values = parse_qs(urlparse(url).query).get("cursor")
+    return values[0] if values else None
+
+
 class APIClient:
     """Client for Core API communication"""
 
@@ -134,7 +143,8 @@ class APIClient:
         limit: int = 10,
     ) -> List[Dict]:
         """Get list of procurements"""
-        params = {}
+        # Keyset page sized to the limit: no COUNT(*) and no OFFSET scan
+        params = {"cursor": "", "page_size": limit}
         if status:
             params["status"] = status
         if category:
@@ -149,6 +159,21 @@ class APIClient:
             return result[:limit]
         return []
 
+    async def search_procurements(
+        self, query: str, status: str = None, limit: int = 10
+    ) -> List[Dict]:
+        """Search procurements by relevance (title, description, city)"""
+        params = {"q": query, "page_size": limit}
+        if status:
+            params["status"] = status
+
+        result = await self._request("GET", "/procurements/search/", params=params)
+        if result and isinstance(result, dict) and "results" in result:
+            return result["results"][:limit]
+        elif result and isinstance(result, list):
+            return result[:limit]
+        return []
+
     async def get_procurement_details(
         self, procurement_id: int, user_id: int = None
     ) -> Optional[Dict]:
@@ -187,6 +212,24 @@ class APIClient:
             },
         )
 
+    async def join_procurement_batch(
+        self,
+        procurement_id: int,
+        participants: List[Dict],
+        organizer_id: int = None,
+    ) -> Optional[Dict]:
+        """Admit many users into a procurement in one transaction.
+
+        Each entry needs ``user_id`` and ``amount`` (``quantity`` and ``notes``
+        are optional).  Returns the ``admitted`` / ``rejected`` lists.
+        """
+        data = {"participants": participants}
+        if organizer_id is not None:
+            data["organizer_id"] = organizer_id
+        return await self._request(
+            "POST", f"/procurements/{procurement_id}/join_batch/", data=data
+        )
+
     async def leave_procurement(
         self, procurement_id: int, user_id: int
     ) -> Optional[Dict]:
@@ -238,6 +281,30 @@ class APIClient:
         return []
 
     # Chat methods
+    async def get_messages(
+        self, procurement_id: int, cursor: str = "", limit: int = 50
+    ) -> Dict:
+        """Get one newest-first page of chat history.
+
+        Pass the returned ``next_cursor`` back in to scroll to older messages;
+        it is ``None`` once the beginning of the chat is reached.
+        """
+        result = await self._request(
+            "GET",
+            "/chat/messages/",
+            params={
+                "procurement_id": procurement_id,
+                "cursor": cursor,
+                "page_size": limit,
+            },
+        )
+        if not result or not isinstance(result, dict):
+            return {"results": [], "next_cursor": None}
+        return {
+            "results": result.get("results", []),
+            "next_cursor": cursor_from_url(result.get("next")),
+        }
+
     async def get_unread_count(self, user_id: int, procurement_id: int) -> int:
         """Get unread message count"""
         result = await self._request(
@@ -247,6 +314,20 @@ class APIClient:
         )
         return result.get("unread_count", 0) if result else 0
 
+    async def get_unread_counts(self, user_id: int) -> Dict[int, int]:
+        """Get unread message counts for all of the user's chats in one call"""
+        result = await self._request(
+            "GET",
+            "/chat/messages/unread_counts/",
+            params={"user_id": user_id},
+        )
+        if not result or not isinstance(result, dict):
+            return {}
+        return {
+            int(procurement_id): count
+            for procurement_id, count in result.get("unread_counts", {}).items()
+        }
+
     async def get_notifications(
         self, user_id: int, unread_only: bool = True
     ) -> List[Dict]:
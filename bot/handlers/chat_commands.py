@@ -57,10 +57,10 @@ async def cmd_chat(message: Message, state: FSMContext):
         return
 
     # Build keyboard with available chats
+    unread_counts = await api_client.get_unread_counts(user["id"])
     buttons = []
     for proc in all_procurements[:10]:
-        # Get unread count for this chat
-        unread_count = await api_client.get_unread_count(user["id"], proc["id"])
+        unread_count = unread_counts.get(proc["id"], 0)
 
         btn_text = f"💬 {proc.get('title', 'Unknown')}"
         if unread_count > 0:
@@ -208,9 +208,10 @@ async def back_to_chat_list(callback: CallbackQuery):
         )
         return
 
+    unread_counts = await api_client.get_unread_counts(user["id"])
     buttons = []
     for proc in all_procurements[:10]:
-        unread_count = await api_client.get_unread_count(user["id"], proc["id"])
+        unread_count = unread_counts.get(proc["id"], 0)
 
         btn_text = f"💬 {proc.get('title', 'Unknown')}"
         if unread_count > 0:
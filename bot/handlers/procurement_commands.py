@@ -324,15 +324,7 @@ async def process_search_query(message: Message, state: FSMContext):
         await message.answer("Search query must be at least 2 characters.")
         return
 
-    procurements = await api_client.get_procurements(status="active")
-    query_lower = query.lower()
-    results = [
-        p
-        for p in procurements
-        if query_lower in p.get("title", "").lower()
-        or query_lower in p.get("city", "").lower()
-        or query_lower in p.get("description", "").lower()
-    ]
+    results = await api_client.search_procurements(query, status="active")
 
     if not results:
         await message.answer(
@@ -0,0 +1,108 @@
+"""
+Background admin exports (see :class:`~admin_api.models.ExportJob`).
+
+The export endpoints only record a pending job and answer 202 with its status
+and download URLs.  ``manage.py run_export_jobs --interval 5`` (kept running
+by the django-worker service, never inside Gunicorn) claims it, rebuilds the
+filtered queryset from the stored query parameters and writes the rows with
+:func:`admin_api.exports.export_file` in constant memory.  The finished file
+goes to default storage under ``exports/`` (MEDIA_ROOT, a volume shared with
+django-admin) and is served by GET /api/admin/exports/{id}/download/.
+
+Progress (``rows``) is saved every ``EXPORT_CHUNK_SIZE`` rows; a running
+job whose progress is ``ADMIN_EXPORT_STALE_MINUTES`` old is claimed again.
+Files are deleted ``ADMIN_EXPORT_RETENTION_HOURS`` after the export finished.
+With ``ADMIN_EXPORTS_INLINE = True`` jobs run synchronously after the
+request's commit (tests, single-process setups).
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .exports import export_file
+from .models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+# A running job whose progress has not moved for this long is considered
+# orphaned (its worker died) and may be claimed again
+STALE_AFTER = timedelta(minutes=getattr(settings, 'ADMIN_EXPORT_STALE_MINUTES', 30))
+RETENTION = timedelta(hours=getattr(settings, 'ADMIN_EXPORT_RETENTION_HOURS', 24))
+
+
+def enqueue_job(job):
+    """Leave the pending job to the worker, or run it after commit when inline"""
+    if getattr(settings, 'ADMIN_EXPORTS_INLINE', False):
+        transaction.on_commit(lambda: run_job(job.pk))
+
+
+def due_jobs():
+    """Pending jobs and running ones orphaned by a worker that died"""
+    stale = timezone.now() - STALE_AFTER
+    return ExportJob.objects.filter(
+        Q(status=ExportJob.Status.PENDING)
+        | Q(status=ExportJob.Status.RUNNING, updated_at__lt=stale)
+    )
+
+
+def claim_job(job_id):
+    """Mark a pending (or orphaned running) job as running; False if taken"""
+    return bool(
+        due_jobs().filter(pk=job_id)
+        .update(status=ExportJob.Status.RUNNING, rows=0, updated_at=timezone.now())
+    )
+
+
+def run_job(job_id):
+    """Write the job's export file"""
+    # The views build the export querysets and import this module
+    from .views import export_queryset
+
+    if not claim_job(job_id):
+        logger.info(f"Export job {job_id} is already being processed")
+        return
+
+    job = ExportJob.objects.get(pk=job_id)
+
+    def progress(rows):
+        ExportJob.objects.filter(pk=job_id).update(rows=rows, updated_at=timezone.now())
+
+    try:
+        queryset, columns = export_queryset(job.name, job.params)
+        with export_file(queryset, columns, job.export_format, job.name, progress) as output:
+            job.file.save(job.filename, File(output, name=job.filename), save=False)
+    except Exception as e:
+        logger.exception(f"Export job {job_id} failed")
+        ExportJob.objects.filter(pk=job_id).update(
+            status=ExportJob.Status.FAILED,
+            error_message=str(e),
+            updated_at=timezone.now(),
+        )
+        return
+
+    ExportJob.objects.filter(pk=job_id).update(
+        status=ExportJob.Status.DONE,
+        file=job.file.name,
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    job.refresh_from_db(fields=['rows'])
+    logger.info(f"Export job {job_id} done: {job.name}.{job.export_format}, rows={job.rows}")
+
+
+def purge_expired():
+    """Delete the files of exports finished more than RETENTION ago; returns how many"""
+    expired = ExportJob.objects.filter(
+        status=ExportJob.Status.DONE, finished_at__lt=timezone.now() - RETENTION
+    ).exclude(file='')
+    purged = 0
+    for job in expired:
+        job.file.delete(save=False)
+        ExportJob.objects.filter(pk=job.pk).update(file='', updated_at=timezone.now())
+        purged += 1
+    return purged
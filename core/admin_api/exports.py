@@ -0,0 +1,88 @@
+"""
+CSV / XLSX exports of admin lists.
+
+Rows are read with ``values_list(...).iterator()`` (a server-side cursor on
+PostgreSQL), so memory use does not depend on the size of the export.
+:func:`export_file` writes them to a temporary file as they arrive: CSV line
+by line, XLSX with openpyxl in write-only mode.
+
+The export endpoints do not build the file themselves: they queue an
+``ExportJob`` that the django-worker service runs (admin_api.export_jobs), so
+a multi-million-row export never ties up a Gunicorn worker.
+"""
+from common.exports import CHUNK_SIZE, csv_file, xlsx_file
+
+PAYMENT_COLUMNS = [
+    ('id', 'id'),
+    ('user', 'user_id'),
+    ('user_first_name', 'user__first_name'),
+    ('user_last_name', 'user__last_name'),
+    ('payment_type', 'payment_type'),
+    ('amount', 'amount'),
+    ('status', 'status'),
+    ('external_id', 'external_id'),
+    ('provider', 'provider'),
+    ('procurement', 'procurement_id'),
+    ('description', 'description'),
+    ('paid_at', 'paid_at'),
+    ('created_at', 'created_at'),
+]
+
+TRANSACTION_COLUMNS = [
+    ('id', 'id'),
+    ('user', 'user_id'),
+    ('user_first_name', 'user__first_name'),
+    ('user_last_name', 'user__last_name'),
+    ('transaction_type', 'transaction_type'),
+    ('amount', 'amount'),
+    ('balance_after', 'balance_after'),
+    ('payment', 'payment_id'),
+    ('procurement', 'procurement_id'),
+    ('description', 'description'),
+    ('created_at', 'created_at'),
+]
+
+USER_COLUMNS = [
+    ('id', 'id'),
+    ('platform', 'platform'),
+    ('platform_user_id', 'platform_user_id'),
+    ('username', 'username'),
+    ('first_name', 'first_name'),
+    ('last_name', 'last_name'),
+    ('phone', 'phone'),
+    ('email', 'email'),
+    ('role', 'role'),
+    ('balance', 'balance'),
+    ('is_active', 'is_active'),
+    ('is_verified', 'is_verified'),
+    ('created_at', 'created_at'),
+]
+
+
+def _rows(queryset, columns):
+    return queryset.values_list(*[field for _, field in columns]).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _counted(rows, progress):
+    """Pass ``rows`` through, calling ``progress(n)`` every CHUNK_SIZE rows and at the end"""
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count % CHUNK_SIZE == 0:
+            progress(count)
+    progress(count)
+
+
+def export_file(queryset, columns, export_format, sheet_title, progress=None):
+    """Temporary file with ``queryset`` exported as CSV or XLSX
+
+    ``progress``, if given, is called with the number of rows written so far.
+    """
+    headers = [header for header, _ in columns]
+    rows = _rows(queryset, columns)
+    if progress is not None:
+        rows = _counted(rows, progress)
+    if export_format == 'xlsx':
+        return xlsx_file(headers, rows, sheet_title)
+    return csv_file(headers, rows)
@@ -0,0 +1,61 @@
+"""
+Management command to run queued or interrupted admin export jobs.
+
+Run with:
+    python manage.py run_export_jobs
+
+The export endpoints only queue jobs; this command claims the ``pending``
+ones and those left ``running`` with a stale ``updated_at`` by a worker that
+died, writes their files (see admin_api.export_jobs) and deletes the files
+of exports older than ADMIN_EXPORT_RETENTION_HOURS.  The django-worker
+service keeps it running with --interval SECONDS (poll again after each
+pass).  Use --job-id to run a single job.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from admin_api.export_jobs import due_jobs, purge_expired, run_job
+from admin_api.models import ExportJob
+
+
+class Command(BaseCommand):
+    help = "Run pending and interrupted admin export jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--job-id",
+            type=int,
+            help="Run a single job",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            help="Keep running, polling for jobs every INTERVAL seconds",
+        )
+
+    def handle(self, *args, **options):
+        ran = 0
+        while True:
+            ran += self._run_due(options)
+            purged = purge_expired()
+            if purged:
+                self.stdout.write(f"  Deleted {purged} expired export files")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"\nDone. Ran {ran} jobs."))
+
+    def _run_due(self, options):
+        jobs = due_jobs()
+        if options["job_id"]:
+            jobs = jobs.filter(pk=options["job_id"])
+
+        ran = 0
+        for job_id in jobs.order_by("created_at").values_list("id", flat=True):
+            run_job(job_id)
+            job = ExportJob.objects.get(pk=job_id)
+            self.stdout.write(f"  Job {job.id}: {job.name}.{job.export_format} {job.status}, {job.rows} rows")
+            ran += 1
+        return ran
@@ -0,0 +1,52 @@
+"""
+Migration: 0001_initial
+Creates the metric rollup and checkpoint tables behind the admin dashboard
+and analytics (see admin_api.rollups).
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[
+                    ('hour', 'Hour'), ('day', 'Day'), ('snapshot', 'Snapshot'),
+                ], max_length=10)),
+                ('bucket', models.DateTimeField()),
+                ('metric', models.CharField(max_length=50)),
+                ('dimension', models.CharField(blank=True, default='', max_length=100)),
+                ('count', models.BigIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+            ],
+            options={
+                'db_table': 'admin_metric_rollups',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='metricrollup',
+            constraint=models.UniqueConstraint(
+                fields=('granularity', 'metric', 'bucket', 'dimension'),
+                name='admin_rollup_bucket_uniq',
+            ),
+        ),
+        migrations.CreateModel(
+            name='RollupCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('built_until', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'admin_rollup_checkpoints',
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+"""
+Migration: 0002_exportjob
+Adds the job table backing background admin exports (see
+admin_api.export_jobs).
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30)),
+                ('export_format', models.CharField(choices=[
+                    ('csv', 'CSV'), ('xlsx', 'XLSX'),
+                ], default='csv', max_length=10)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('requested_by', models.CharField(blank=True, default='', max_length=150)),
+                ('status', models.CharField(choices=[
+                    ('pending', 'Pending'),
+                    ('running', 'Running'),
+                    ('done', 'Done'),
+                    ('failed', 'Failed'),
+                ], db_index=True, default='pending', max_length=20)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('file', models.FileField(blank=True, upload_to='exports/')),
+                ('error_message', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'admin_export_jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,104 @@
+"""
+Admin API models: pre-aggregated metrics backing the dashboard and analytics,
+and background export jobs.
+"""
+from django.db import models
+from django.utils import timezone
+
+
+class MetricRollup(models.Model):
+    """One aggregated value of a metric for a time bucket and dimension.
+
+    ``day`` and ``hour`` rows hold event flows (registrations, revenue,
+    messages, ...) per local-time bucket; ``snapshot`` rows hold state
+    breakdowns (users by role, payments by status, ...) of all rows created
+    before ``bucket``.  Rows are written by ``admin_api.rollups.build_rollups``.
+    """
+
+    class Granularity(models.TextChoices):
+        HOUR = 'hour', 'Hour'
+        DAY = 'day', 'Day'
+        SNAPSHOT = 'snapshot', 'Snapshot'
+
+    granularity = models.CharField(max_length=10, choices=Granularity.choices)
+    bucket = models.DateTimeField()
+    metric = models.CharField(max_length=50)
+    dimension = models.CharField(max_length=100, blank=True, default='')
+    count = models.BigIntegerField(default=0)
+    amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'admin_metric_rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'metric', 'bucket', 'dimension'],
+                name='admin_rollup_bucket_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.metric}[{self.dimension}] {self.granularity} {self.bucket}: {self.count}"
+
+
+class RollupCheckpoint(models.Model):
+    """How far the rollups have been built.
+
+    Everything before ``built_until`` (always the start of an hour) is covered
+    by rollup rows: whole days by ``day`` rows, the hours of the last day by
+    ``hour`` rows.  Readers only aggregate raw rows from ``built_until`` on.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    built_until = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'admin_rollup_checkpoints'
+
+    def __str__(self):
+        return f"{self.name}: {self.built_until}"
+
+
+class ExportJob(models.Model):
+    """Background export of one admin list to a CSV / XLSX file.
+
+    Status machine: pending → running → done | failed
+    ``params`` are the list's query parameters (its filters) at request time;
+    ``admin_api.export_jobs`` rebuilds the queryset from them and writes
+    ``file``, bumping ``rows`` as it goes.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    class Format(models.TextChoices):
+        CSV = 'csv', 'CSV'
+        XLSX = 'xlsx', 'XLSX'
+
+    name = models.CharField(max_length=30)
+    export_format = models.CharField(max_length=10, choices=Format.choices, default=Format.CSV)
+    params = models.JSONField(default=dict, blank=True)
+    requested_by = models.CharField(max_length=150, blank=True, default='')
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING, db_index=True
+    )
+    rows = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/', blank=True)
+    error_message = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'admin_export_jobs'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"ExportJob {self.id} {self.name}.{self.export_format} [{self.status}] {self.rows} rows"
+
+    @property
+    def filename(self):
+        """Download name, e.g. ``payments-20260101.csv``"""
+        return f"{self.name}-{timezone.localtime(self.created_at):%Y%m%d}.{self.export_format}"
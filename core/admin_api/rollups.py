@@ -0,0 +1,268 @@
+"""
+Materialized rollups for the admin dashboard and analytics.
+
+``build_rollups`` (``manage.py build_rollups --interval 300``, kept running by
+the django-worker service) aggregates the raw tables into
+:class:`~admin_api.models.MetricRollup` rows up to the start of the current
+hour:
+
+* ``day`` rows per local day for the flow metrics in ``FLOWS``, rebuilt
+  incrementally from the previous checkpoint (minus
+  ``ADMIN_ROLLUP_LOOKBACK_DAYS`` so late ``paid_at`` values are picked up);
+* ``hour`` rows for the hours of the current day;
+* ``snapshot`` rows with the state breakdowns in ``SNAPSHOTS`` of every row
+  created before their ``bucket``, rebuilt when they are
+  ``ADMIN_ROLLUP_SNAPSHOT_MINUTES`` (60) older than the cutoff.
+
+:class:`RollupReader` combines those rows with an aggregate of the raw rows
+since the checkpoint - normally less than an hour of data, found through the
+timestamp indexes - so reads stay flat however large the tables get.  Until
+the rollups have been built once, everything is aggregated from raw tables.
+
+All-time totals of flow metrics (revenue, messages) are summed from the
+incremental ``day`` / ``hour`` rows (:meth:`RollupReader.total`).  Snapshots
+are not incremental: a row's state can change long after it was created, so
+each snapshot rebuild is a full GROUP BY of users, procurements and
+payments.  That is why they are only rebuilt once per snapshot interval (by
+default once an hour, since the cutoff only moves hourly) rather than on
+every build; raise the interval on large tables.  Readers add the raw rows
+created since the snapshot, and state changes of older rows (a payment
+succeeding, a procurement closing) show up after the next snapshot rebuild.
+"""
+import logging
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Subquery, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from chat.models import Message
+from payments.models import Payment
+from procurements.models import Procurement
+from users.models import User
+from .models import MetricRollup, RollupCheckpoint
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT = 'metrics'
+LOOKBACK_DAYS = getattr(settings, 'ADMIN_ROLLUP_LOOKBACK_DAYS', 1)
+SNAPSHOT_INTERVAL = timedelta(minutes=getattr(settings, 'ADMIN_ROLLUP_SNAPSHOT_MINUTES', 60))
+
+Granularity = MetricRollup.Granularity
+
+# queryset: rows counted; field: timestamp the rows are bucketed by;
+# dimension: field the rows are grouped by; amount: field summed into ``amount``
+Metric = namedtuple('Metric', 'queryset field dimension amount', defaults=(None, None))
+
+SUCCEEDED_PAYMENTS = Payment.objects.filter(status=Payment.Status.SUCCEEDED)
+
+FLOWS = {
+    'new_users': Metric(User.objects.all(), 'created_at'),
+    'procurements_created': Metric(Procurement.objects.all(), 'created_at'),
+    'messages': Metric(Message.objects.all(), 'created_at'),
+    'revenue': Metric(SUCCEEDED_PAYMENTS, 'paid_at', amount='amount'),
+}
+
+SNAPSHOTS = {
+    'users_by_role': Metric(User.objects.all(), 'created_at', 'role'),
+    'users_by_platform': Metric(User.objects.all(), 'created_at', 'platform'),
+    'procurements_by_status': Metric(Procurement.objects.all(), 'created_at', 'status'),
+    'procurements_by_category': Metric(
+        Procurement.objects.filter(category__isnull=False), 'created_at', 'category_id'
+    ),
+    'procurements_by_organizer': Metric(
+        Procurement.objects.filter(organizer__role=User.Role.ORGANIZER), 'created_at', 'organizer_id'
+    ),
+    'payments_by_status': Metric(Payment.objects.all(), 'created_at', 'status'),
+}
+
+
+def hour_start(value):
+    return timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(value):
+    return timezone.localtime(value).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def aggregate(metric, start=None, end=None, trunc=None):
+    """Raw aggregate rows of ``metric`` over ``start <= field < end``"""
+    queryset = metric.queryset
+    if start is not None:
+        queryset = queryset.filter(**{f'{metric.field}__gte': start})
+    if end is not None:
+        queryset = queryset.filter(**{f'{metric.field}__lt': end})
+
+    aggregates = {'count': Count('pk')}
+    if metric.amount:
+        aggregates['amount'] = Sum(metric.amount)
+    keys = {}
+    if trunc is not None:
+        keys['bucket'] = trunc(metric.field)
+    if metric.dimension:
+        keys['dimension'] = F(metric.dimension)
+    if not keys:
+        return [queryset.aggregate(**aggregates)]
+    return list(queryset.annotate(**keys).values(*keys).annotate(**aggregates).order_by())
+
+
+def _dimension(row):
+    value = row.get('dimension')
+    return '' if value is None else str(value)
+
+
+def _add(totals, key, count, amount):
+    entry = totals[key]
+    entry[0] += count
+    entry[1] += amount or 0
+
+
+def _totals():
+    return defaultdict(lambda: [0, Decimal('0')])
+
+
+def get_checkpoint():
+    return (
+        RollupCheckpoint.objects.filter(name=CHECKPOINT)
+        .values_list('built_until', flat=True).first()
+    )
+
+
+def _snapshot_bucket():
+    """Cutoff of the current snapshot rows (all share it)"""
+    return (
+        MetricRollup.objects.filter(granularity=Granularity.SNAPSHOT)
+        .order_by('-bucket').values('bucket')[:1]
+    )
+
+
+def build_rollups(now=None, lookback_days=None, full=False):
+    """Roll raw rows up to the start of the current hour; returns rows written"""
+    cutoff = hour_start(now or timezone.now())
+    today = day_start(cutoff)
+    if lookback_days is None:
+        lookback_days = LOOKBACK_DAYS
+    built_until = None if full else get_checkpoint()
+    days_from = None if built_until is None else day_start(built_until) - timedelta(days=lookback_days)
+
+    def rows_for(granularity, name, rows, bucket=None):
+        return [
+            MetricRollup(
+                granularity=granularity, metric=name, bucket=bucket or row['bucket'],
+                dimension=_dimension(row), count=row['count'], amount=row.get('amount') or 0,
+            )
+            for row in rows if row['count']
+        ]
+
+    rollups = []
+    for name, metric in FLOWS.items():
+        rollups += rows_for(Granularity.DAY, name, aggregate(metric, days_from, today, TruncDay))
+        rollups += rows_for(Granularity.HOUR, name, aggregate(metric, today, cutoff, TruncHour))
+
+    # Full-table scans; only once per snapshot interval
+    snapshot_bucket = None if full else _snapshot_bucket().values_list('bucket', flat=True).first()
+    rebuild_snapshots = snapshot_bucket is None or cutoff - snapshot_bucket >= SNAPSHOT_INTERVAL
+    if rebuild_snapshots:
+        for name, metric in SNAPSHOTS.items():
+            rollups += rows_for(Granularity.SNAPSHOT, name, aggregate(metric, end=cutoff), bucket=cutoff)
+
+    with transaction.atomic():
+        days = MetricRollup.objects.filter(granularity=Granularity.DAY)
+        if days_from is not None:
+            days = days.filter(bucket__gte=days_from)
+        days.delete()
+        replaced = [Granularity.HOUR, Granularity.SNAPSHOT] if rebuild_snapshots else [Granularity.HOUR]
+        MetricRollup.objects.filter(granularity__in=replaced).delete()
+        MetricRollup.objects.bulk_create(rollups, batch_size=1000)
+        RollupCheckpoint.objects.update_or_create(name=CHECKPOINT, defaults={'built_until': cutoff})
+
+    logger.info(f"Built {len(rollups)} metric rollups up to {cutoff.isoformat()}")
+    return len(rollups)
+
+
+class RollupReader:
+    """Reads metrics from the rollups plus the raw rows since the checkpoint"""
+
+    def __init__(self):
+        self.built_until, self.snapshot_until = (
+            RollupCheckpoint.objects.filter(name=CHECKPOINT)
+            .annotate(snapshot_until=Subquery(_snapshot_bucket()))
+            .values_list('built_until', 'snapshot_until').first()
+        ) or (None, None)
+
+    def daily(self, names, start, end=None):
+        """{metric: {local day: [count, amount]}} of flow metrics over [start, end)"""
+        result = {name: _totals() for name in names}
+        raw_start = start
+        if self.built_until is not None:
+            rollups = MetricRollup.objects.filter(
+                granularity__in=[Granularity.DAY, Granularity.HOUR], metric__in=names,
+                bucket__gte=start, bucket__lt=self.built_until,
+            )
+            if end is not None:
+                rollups = rollups.filter(bucket__lt=end)
+            for name, bucket, count, amount in rollups.values_list('metric', 'bucket', 'count', 'amount'):
+                _add(result[name], day_start(bucket), count, amount)
+            raw_start = max(start, self.built_until)
+
+        if end is None or raw_start < end:
+            for name in names:
+                for row in aggregate(FLOWS[name], raw_start, end, TruncDay):
+                    _add(result[name], day_start(row['bucket']), row['count'], row.get('amount'))
+        return result
+
+    def total(self, names):
+        """{metric: [count, amount]} of flow metrics over all time"""
+        result = {name: [0, Decimal('0')] for name in names}
+        if self.built_until is not None:
+            rollups = (
+                MetricRollup.objects.filter(
+                    granularity__in=[Granularity.DAY, Granularity.HOUR], metric__in=names,
+                    bucket__lt=self.built_until,
+                )
+                .values('metric').annotate(count=Sum('count'), amount=Sum('amount')).order_by()
+            )
+            for row in rollups:
+                _add(result, row['metric'], row['count'], row['amount'])
+        for name in names:
+            row = aggregate(FLOWS[name], start=self.built_until)[0]
+            _add(result, name, row['count'], row.get('amount'))
+        return result
+
+    def snapshot(self, names):
+        """{metric: {dimension: [count, amount]}} of state metrics over all rows"""
+        result = {name: _totals() for name in names}
+        if self.snapshot_until is not None:
+            rollups = MetricRollup.objects.filter(granularity=Granularity.SNAPSHOT, metric__in=names)
+            for name, dimension, count, amount in rollups.values_list('metric', 'dimension', 'count', 'amount'):
+                _add(result[name], dimension, count, amount)
+
+        for name in names:
+            for row in aggregate(SNAPSHOTS[name], start=self.snapshot_until):
+                _add(result[name], _dimension(row), row['count'], row.get('amount'))
+        return result
+
+    def top(self, name, limit):
+        """[(dimension, count)] of the ``limit`` largest dimensions of a state metric
+
+        Only the snapshot's top ``limit`` and the dimensions with new rows
+        can make the cut, so no other snapshot rows are read.
+        """
+        counts = defaultdict(int)
+        recent = {
+            _dimension(row): row['count']
+            for row in aggregate(SNAPSHOTS[name], start=self.snapshot_until)
+        }
+        if self.snapshot_until is not None:
+            rollups = MetricRollup.objects.filter(granularity=Granularity.SNAPSHOT, metric=name)
+            leaders = rollups.order_by('-count', 'dimension')[:limit].values_list('dimension', 'count')
+            rest = rollups.filter(dimension__in=list(recent)).values_list('dimension', 'count')
+            counts.update(dict(leaders))
+            counts.update(dict(rest))
+        for dimension, count in recent.items():
+            counts[dimension] += count
+        return sorted(counts.items(), key=lambda item: -item[1])[:limit]
@@ -1,11 +1,14 @@
 """
 Admin API Serializers
 """
+from django.urls import reverse
 from rest_framework import serializers
 from users.models import User
 from procurements.models import Category, Procurement, Participant
 from payments.models import Payment, Transaction
-from chat.models import Message, Notification
+from chat.models import BulkNotificationJob, Message, Notification
+
+from .models import ExportJob
 
 
 class DashboardStatsSerializer(serializers.Serializer):
@@ -34,12 +37,17 @@ class DashboardStatsSerializer(serializers.Serializer):
 
 
 class AdminUserSerializer(serializers.ModelSerializer):
-    """Serializer for User model in admin context."""
+    """Serializer for User model in admin context.
+
+    The statistics are annotations added by AdminUserViewSet.get_queryset.
+    """
     full_name = serializers.CharField(read_only=True)
     role_display = serializers.CharField(read_only=True)
-    participations_count = serializers.SerializerMethodField()
-    organized_count = serializers.SerializerMethodField()
-    total_spent = serializers.SerializerMethodField()
+    participations_count = serializers.IntegerField(read_only=True)
+    organized_count = serializers.IntegerField(read_only=True)
+    total_spent = serializers.DecimalField(
+        max_digits=12, decimal_places=2, read_only=True, coerce_to_string=False
+    )
 
     class Meta:
         model = User
@@ -52,19 +60,6 @@ class AdminUserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at']
 
-    def get_participations_count(self, obj):
-        return obj.participations.count()
-
-    def get_organized_count(self, obj):
-        return obj.organized_procurements.count()
-
-    def get_total_spent(self, obj):
-        from django.db.models import Sum
-        total = obj.transactions.filter(amount__lt=0).aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        return abs(total)
-
 
 class AdminUserUpdateSerializer(serializers.ModelSerializer):
     """Serializer for updating User in admin context."""
@@ -151,8 +146,11 @@ class AdminTransactionSerializer(serializers.ModelSerializer):
 
 
 class AdminCategorySerializer(serializers.ModelSerializer):
-    """Serializer for Category model in admin context."""
-    procurements_count = serializers.SerializerMethodField()
+    """Serializer for Category model in admin context.
+
+    ``procurements_count`` is annotated by AdminCategoryViewSet.get_queryset.
+    """
+    procurements_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Category
@@ -161,9 +159,6 @@ class AdminCategorySerializer(serializers.ModelSerializer):
             'is_active', 'created_at', 'procurements_count'
         ]
 
-    def get_procurements_count(self, obj):
-        return obj.procurements.count()
-
 
 class AdminMessageSerializer(serializers.ModelSerializer):
     """Serializer for Message model in admin context."""
@@ -190,6 +185,50 @@ class AdminNotificationSerializer(serializers.ModelSerializer):
         ]
 
 
+class AdminBulkNotificationJobSerializer(serializers.ModelSerializer):
+    """Serializer for BulkNotificationJob progress in admin context."""
+    job_id = serializers.IntegerField(source='id', read_only=True)
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BulkNotificationJob
+        fields = [
+            'job_id', 'status', 'notification_type', 'title', 'total', 'processed',
+            'progress', 'error_message', 'created_at', 'updated_at', 'finished_at'
+        ]
+
+    def get_progress(self, obj):
+        if not obj.total:
+            return 100 if obj.status == BulkNotificationJob.Status.DONE else 0
+        return min(100, int(obj.processed * 100 / obj.total))
+
+
+class AdminExportJobSerializer(serializers.ModelSerializer):
+    """Serializer for ExportJob progress in admin context."""
+    job_id = serializers.IntegerField(source='id', read_only=True)
+    status_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            'job_id', 'name', 'export_format', 'status', 'rows', 'error_message',
+            'created_at', 'updated_at', 'finished_at', 'status_url', 'download_url'
+        ]
+
+    def _absolute(self, path):
+        request = self.context.get('request')
+        return request.build_absolute_uri(path) if request else path
+
+    def get_status_url(self, obj):
+        return self._absolute(reverse('admin-exports-detail', args=[obj.pk]))
+
+    def get_download_url(self, obj):
+        if obj.status != ExportJob.Status.DONE or not obj.file:
+            return None
+        return self._absolute(reverse('admin-exports-download', args=[obj.pk]))
+
+
 class AdminLoginSerializer(serializers.Serializer):
     """Serializer for admin login."""
     username = serializers.CharField()
@@ -12,10 +12,13 @@ from .views import (
     AdminProcurementViewSet,
     AdminPaymentViewSet,
     AdminTransactionViewSet,
+    AdminExportJobViewSet,
     AdminCategoryViewSet,
     AdminMessageViewSet,
     AdminNotificationViewSet,
     AdminChatMessageView,
+    UserCacheStatsView,
+    TochkaLatencyStatsView,
 )
 
 router = DefaultRouter()
@@ -23,6 +26,7 @@ router.register(r'users', AdminUserViewSet, basename='admin-users')
 router.register(r'procurements', AdminProcurementViewSet, basename='admin-procurements')
 router.register(r'payments', AdminPaymentViewSet, basename='admin-payments')
 router.register(r'transactions', AdminTransactionViewSet, basename='admin-transactions')
+router.register(r'exports', AdminExportJobViewSet, basename='admin-exports')
 router.register(r'categories', AdminCategoryViewSet, basename='admin-categories')
 router.register(r'messages', AdminMessageViewSet, basename='admin-messages')
 router.register(r'notifications', AdminNotificationViewSet, basename='admin-notifications')
@@ -31,6 +35,8 @@ urlpatterns = [
     path('auth/', AdminAuthView.as_view(), name='admin-auth'),
     path('dashboard/', DashboardView.as_view(), name='admin-dashboard'),
     path('analytics/', AnalyticsView.as_view(), name='admin-analytics'),
+    path('cache/users/', UserCacheStatsView.as_view(), name='admin-user-cache-stats'),
+    path('tochka/latency/', TochkaLatencyStatsView.as_view(), name='admin-tochka-latency'),
     path('chat/admin_message/', AdminChatMessageView.as_view(), name='admin-chat-message'),
     path('', include(router.urls)),
 ]
@@ -3,10 +3,13 @@ Admin API Views
 Provides API endpoints for the admin panel.
 """
 import logging
+import os
 from datetime import timedelta
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 
-from django.db.models import Count, Sum, Q
+from django.db.models import Count, DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Abs, Coalesce
+from django.http import FileResponse, HttpRequest, QueryDict
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import ensure_csrf_cookie
@@ -17,13 +20,24 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
+from rest_framework.request import Request
 
+from users.cache import cache_stats
 from users.models import User
-from procurements.models import Category, Procurement
+from procurements.models import Category, Participant, Procurement
+from procurements.search import search_procurements
 from payments.models import Payment, Transaction
-from chat.models import Message, Notification
-
+from payments.summaries import cached_payment_summary
+from payments.tochka_client import latency_stats
+from chat.bulk_notifications import enqueue_job
+from chat.models import BulkNotificationJob, Message, Notification
+from common.exports import OPENPYXL_AVAILABLE, XLSX_CONTENT_TYPE, CSVRenderer, XLSXRenderer
+
+from .export_jobs import enqueue_job as enqueue_export
+from .exports import PAYMENT_COLUMNS, TRANSACTION_COLUMNS, USER_COLUMNS
+from .models import ExportJob
 from .permissions import IsAdminUser
+from .rollups import RollupReader, day_start
 from .serializers import (
     DashboardStatsSerializer,
     AdminUserSerializer, AdminUserUpdateSerializer,
@@ -31,7 +45,8 @@ from .serializers import (
     AdminParticipantSerializer,
     AdminPaymentSerializer, AdminTransactionSerializer,
     AdminCategorySerializer,
-    AdminMessageSerializer, AdminNotificationSerializer,
+    AdminMessageSerializer, AdminNotificationSerializer, AdminBulkNotificationJobSerializer,
+    AdminExportJobSerializer,
     AdminLoginSerializer, AdminUserInfoSerializer,
     BulkActionSerializer
 )
@@ -92,82 +107,59 @@ class AdminAuthView(APIView):
 
 
 class DashboardView(APIView):
-    """Dashboard statistics endpoint."""
+    """Dashboard statistics endpoint.
+
+    Reads the materialized rollups (see admin_api.rollups) plus the raw rows
+    created since they were last built, so its cost does not grow with the
+    size of the tables.
+    """
     permission_classes = [IsAdminUser]
 
     def get(self, request):
         """Get dashboard statistics."""
-        now = timezone.now()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        today_start = day_start(timezone.now())
         week_start = today_start - timedelta(days=7)
         month_start = today_start - timedelta(days=30)
 
-        # User statistics
-        total_users = User.objects.count()
-        users_by_role = dict(
-            User.objects.values_list('role').annotate(count=Count('id'))
-        )
-        users_by_platform = dict(
-            User.objects.values_list('platform').annotate(count=Count('id'))
-        )
-        new_users_today = User.objects.filter(created_at__gte=today_start).count()
-        new_users_week = User.objects.filter(created_at__gte=week_start).count()
-        new_users_month = User.objects.filter(created_at__gte=month_start).count()
-
-        # Procurement statistics
-        total_procurements = Procurement.objects.count()
-        procurements_by_status = dict(
-            Procurement.objects.values_list('status').annotate(count=Count('id'))
-        )
-        active_procurements = Procurement.objects.filter(status='active').count()
-        completed_procurements = Procurement.objects.filter(status='completed').count()
+        reader = RollupReader()
+        state = reader.snapshot([
+            'users_by_role', 'users_by_platform', 'procurements_by_status', 'payments_by_status',
+        ])
+        totals = reader.total(['revenue', 'messages'])
+        flows = reader.daily(['new_users', 'revenue', 'messages'], month_start)
 
-        # Payment statistics
-        total_payments = Payment.objects.count()
-        payments_by_status = dict(
-            Payment.objects.values_list('status').annotate(count=Count('id'))
-        )
+        def counts(name):
+            return {dimension: count for dimension, (count, _) in state[name].items()}
+
+        def since(name, start, index=0):
+            return sum(values[index] for day, values in flows[name].items() if day >= start)
 
-        succeeded_payments = Payment.objects.filter(status='succeeded')
-        total_revenue = succeeded_payments.aggregate(
-            total=Sum('amount')
-        )['total'] or Decimal('0')
-        revenue_today = succeeded_payments.filter(
-            paid_at__gte=today_start
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        revenue_week = succeeded_payments.filter(
-            paid_at__gte=week_start
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        revenue_month = succeeded_payments.filter(
-            paid_at__gte=month_start
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-
-        # Message statistics
-        total_messages = Message.objects.count()
-        messages_today = Message.objects.filter(created_at__gte=today_start).count()
+        users_by_role = counts('users_by_role')
+        procurements_by_status = counts('procurements_by_status')
+        payments_by_status = counts('payments_by_status')
 
         stats = {
-            'total_users': total_users,
+            'total_users': sum(users_by_role.values()),
             'users_by_role': users_by_role,
-            'users_by_platform': users_by_platform,
-            'new_users_today': new_users_today,
-            'new_users_week': new_users_week,
-            'new_users_month': new_users_month,
+            'users_by_platform': counts('users_by_platform'),
+            'new_users_today': since('new_users', today_start),
+            'new_users_week': since('new_users', week_start),
+            'new_users_month': since('new_users', month_start),
 
-            'total_procurements': total_procurements,
+            'total_procurements': sum(procurements_by_status.values()),
             'procurements_by_status': procurements_by_status,
-            'active_procurements': active_procurements,
-            'completed_procurements': completed_procurements,
+            'active_procurements': procurements_by_status.get('active', 0),
+            'completed_procurements': procurements_by_status.get('completed', 0),
 
-            'total_payments': total_payments,
+            'total_payments': sum(payments_by_status.values()),
             'payments_by_status': payments_by_status,
-            'total_revenue': total_revenue,
-            'revenue_today': revenue_today,
-            'revenue_week': revenue_week,
-            'revenue_month': revenue_month,
+            'total_revenue': totals['revenue'][1],
+            'revenue_today': since('revenue', today_start, 1),
+            'revenue_week': since('revenue', week_start, 1),
+            'revenue_month': since('revenue', month_start, 1),
 
-            'total_messages': total_messages,
-            'messages_today': messages_today,
+            'total_messages': totals['messages'][0],
+            'messages_today': since('messages', today_start),
         }
 
         serializer = DashboardStatsSerializer(stats)
@@ -179,14 +171,16 @@ class DashboardView(APIView):
 
 
 class AnalyticsView(APIView):
-    """Advanced analytics endpoint with date range filtering."""
+    """Advanced analytics endpoint with date range filtering.
+
+    Time series, top lists and registrations come from the rollups (see
+    admin_api.rollups); ranges are whole local days.
+    """
     permission_classes = [IsAdminUser]
 
     def get(self, request):
         """Get analytics data with optional date filtering."""
         from datetime import datetime
-        from django.db.models.functions import TruncDate, TruncWeek, TruncMonth
-        from procurements.models import Participant
 
         params = request.query_params
         now = timezone.now()
@@ -201,9 +195,9 @@ class AnalyticsView(APIView):
                 date_from = datetime.strptime(date_from_str, '%Y-%m-%d')
                 date_from = timezone.make_aware(date_from)
             except ValueError:
-                date_from = now - timedelta(days=30)
+                date_from = day_start(now - timedelta(days=30))
         else:
-            date_from = now - timedelta(days=30)
+            date_from = day_start(now - timedelta(days=30))
 
         if date_to_str:
             try:
@@ -216,82 +210,71 @@ class AnalyticsView(APIView):
         else:
             date_to = now
 
-        # Choose truncation function based on period
-        trunc_fn = {
-            'day': TruncDate,
-            'week': TruncWeek,
-            'month': TruncMonth,
-        }.get(period, TruncDate)
-
-        # Time series: user registrations
-        user_series = list(
-            User.objects.filter(
-                created_at__gte=date_from, created_at__lte=date_to
-            ).annotate(
-                date=trunc_fn('created_at')
-            ).values('date').annotate(
-                count=Count('id')
-            ).order_by('date')
-        )
-
-        # Time series: revenue
-        revenue_series = list(
-            Payment.objects.filter(
-                status='succeeded',
-                paid_at__gte=date_from,
-                paid_at__lte=date_to,
-            ).annotate(
-                date=trunc_fn('paid_at')
-            ).values('date').annotate(
-                total=Sum('amount'),
-                count=Count('id')
-            ).order_by('date')
+        reader = RollupReader()
+        flows = reader.daily(
+            ['new_users', 'revenue', 'procurements_created', 'messages'],
+            date_from, day_start(date_to) + timedelta(days=1),
         )
 
-        # Time series: procurements created
-        procurement_series = list(
-            Procurement.objects.filter(
-                created_at__gte=date_from, created_at__lte=date_to
-            ).annotate(
-                date=trunc_fn('created_at')
-            ).values('date').annotate(
-                count=Count('id')
-            ).order_by('date')
-        )
-
-        # Time series: messages sent
-        message_series = list(
-            Message.objects.filter(
-                created_at__gte=date_from, created_at__lte=date_to
-            ).annotate(
-                date=trunc_fn('created_at')
-            ).values('date').annotate(
-                count=Count('id')
-            ).order_by('date')
-        )
+        def period_start(day):
+            if period == 'week':
+                return day - timedelta(days=day.weekday())
+            if period == 'month':
+                return day.replace(day=1)
+            return day
+
+        # Group the daily values by period and serialize dates to strings
+        def serialize_series(name, with_total=False):
+            grouped = {}
+            for day, (count, amount) in flows[name].items():
+                if count:
+                    entry = grouped.setdefault(period_start(day), [0, 0])
+                    entry[0] += count
+                    entry[1] += amount
+            result = []
+            for start, (count, amount) in sorted(grouped.items()):
+                date_str = start.isoformat() if period in ('week', 'month') else start.date().isoformat()
+                entry = {'date': date_str, 'count': count}
+                if with_total:
+                    entry['total'] = float(amount)
+                result.append(entry)
+            return result
 
         # Top categories
-        top_categories = list(
-            Category.objects.annotate(
-                procurement_count=Count('procurements')
-            ).order_by('-procurement_count')[:10].values(
-                'id', 'name', 'icon', 'procurement_count'
-            )
-        )
+        category_counts = dict(reader.top('procurements_by_category', 10))
+        categories = Category.objects.in_bulk([int(pk) for pk in category_counts])
+        top_categories = [
+            {'id': category.id, 'name': category.name, 'icon': category.icon,
+             'procurement_count': category_counts[str(category.id)]}
+            for category in sorted(categories.values(), key=lambda c: -category_counts[str(c.id)])
+        ]
+        if len(top_categories) < 10:
+            top_categories += [
+                {**category, 'procurement_count': 0}
+                for category in Category.objects.exclude(id__in=categories).values(
+                    'id', 'name', 'icon'
+                )[:10 - len(top_categories)]
+            ]
 
         # Top organizers
-        top_organizers = list(
-            User.objects.filter(role='organizer').annotate(
-                procurement_count=Count('organized_procurements')
-            ).order_by('-procurement_count')[:10].values(
-                'id', 'first_name', 'last_name', 'procurement_count'
-            )
-        )
-
-        # Conversion funnel
-        total_users = User.objects.filter(
-            created_at__gte=date_from, created_at__lte=date_to
-        ).count()
+        organizer_counts = dict(reader.top('procurements_by_organizer', 10))
+        organizers = User.objects.in_bulk([int(pk) for pk in organizer_counts])
+        top_organizers = [
+            {'id': user.id, 'first_name': user.first_name, 'last_name': user.last_name,
+             'procurement_count': organizer_counts[str(user.id)]}
+            for user in sorted(organizers.values(), key=lambda u: -organizer_counts[str(u.id)])
+        ]
+        if len(top_organizers) < 10:
+            top_organizers += [
+                {**user, 'procurement_count': 0}
+                for user in User.objects.filter(role='organizer').exclude(id__in=organizers).values(
+                    'id', 'first_name', 'last_name'
+                )[:10 - len(top_organizers)]
+            ]
+
+        # Conversion funnel; distinct users do not add up across days, so
+        # these two are counted over the raw range
+        total_users = sum(count for count, _ in flows['new_users'].values())
         users_participated = Participant.objects.filter(
             created_at__gte=date_from, created_at__lte=date_to
         ).values('user').distinct().count()
@@ -301,26 +284,14 @@ class AnalyticsView(APIView):
             created_at__lte=date_to,
         ).values('user').distinct().count()
 
-        # Serialize dates to strings
-        def serialize_series(series, value_key='count'):
-            result = []
-            for item in series:
-                d = item.get('date')
-                date_str = d.isoformat() if d else None
-                entry = {'date': date_str, value_key: item[value_key]}
-                if 'total' in item:
-                    entry['total'] = float(item['total'] or 0)
-                result.append(entry)
-            return result
-
         return Response({
             'date_from': date_from.isoformat(),
             'date_to': date_to.isoformat(),
             'period': period,
-            'user_registrations': serialize_series(user_series),
-            'revenue': serialize_series(revenue_series),
-            'procurements_created': serialize_series(procurement_series),
-            'messages_sent': serialize_series(message_series),
+            'user_registrations': serialize_series('new_users'),
+            'revenue': serialize_series('revenue', with_total=True),
+            'procurements_created': serialize_series('procurements_created'),
+            'messages_sent': serialize_series('messages'),
             'top_categories': top_categories,
             'top_organizers': top_organizers,
             'funnel': {
@@ -331,6 +302,63 @@ class AnalyticsView(APIView):
         })
 
 
+class UserCacheStatsView(APIView):
+    """User lookup cache hit/miss counters for this API worker."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({'pid': os.getpid(), **cache_stats()})
+
+
+class TochkaLatencyStatsView(APIView):
+    """Tochka Cyclops API latency histograms of this API worker."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({'pid': os.getpid(), 'endpoints': latency_stats()})
+
+
+def count_subquery(queryset, field):
+    """COUNT of ``queryset`` rows whose ``field`` points at the outer row, as a subquery"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(c=Count('id')).values('c')
+        ),
+        Value(0),
+    )
+
+
+def export_list(request, name):
+    """Queue an export of the list ``name`` as filtered by the request's query parameters.
+
+    The file is written by the django-worker service (admin_api.export_jobs);
+    the response is 202 with the job, whose status_url / download_url serve
+    its progress and, once done, the file.
+    """
+    export_format = request.accepted_renderer.format
+    if export_format == 'xlsx' and not OPENPYXL_AVAILABLE:
+        return Response(
+            {'error': 'XLSX export requires openpyxl'},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    params = request.query_params.dict()
+    params.pop('format', None)
+    job = ExportJob.objects.create(
+        name=name,
+        export_format=export_format,
+        params=params,
+        requested_by=request.user.get_username(),
+    )
+    enqueue_export(job)
+    logger.info(f"Admin queued export of {name} as {export_format}: job={job.id}")
+    return Response(
+        AdminExportJobSerializer(job, context={'request': request}).data,
+        status=status.HTTP_202_ACCEPTED,
+        content_type='application/json'
+    )
+
+
 class AdminUserViewSet(viewsets.ModelViewSet):
     """Admin viewset for User management."""
     queryset = User.objects.all().order_by('-created_at')
@@ -342,7 +370,20 @@ class AdminUserViewSet(viewsets.ModelViewSet):
         return AdminUserSerializer
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        # Per-user statistics as correlated subqueries so a page of users is
+        # a single statement (see AdminUserSerializer)
+        spent = (
+            Transaction.objects.filter(user=OuterRef('pk'), amount__lt=0).order_by()
+            .values('user').annotate(s=Sum('amount')).values('s')
+        )
+        queryset = super().get_queryset().annotate(
+            participations_count=count_subquery(Participant.objects.all(), 'user'),
+            organized_count=count_subquery(Procurement.objects.all(), 'organizer'),
+            total_spent=Abs(Coalesce(
+                Subquery(spent), Value(Decimal('0')),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )),
+        )
         params = self.request.query_params
 
         # Filter by role
@@ -378,6 +419,16 @@ class AdminUserViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        # Reload with the annotations the serializer reads
+        serializer.instance = self.get_queryset().get(pk=serializer.instance.pk)
+
+    @action(detail=False, renderer_classes=[CSVRenderer, XLSXRenderer])
+    def export(self, request):
+        """Queue an export of the filtered users: GET /api/admin/users/export/?format=csv|xlsx"""
+        return export_list(request, 'users')
+
     @action(detail=True, methods=['post'])
     def toggle_active(self, request, pk=None):
         """Toggle user active status."""
@@ -409,24 +460,18 @@ class AdminUserViewSet(viewsets.ModelViewSet):
 
         try:
             amount = Decimal(str(amount))
-        except (ValueError, TypeError):
+        except InvalidOperation:
+            amount = None
+        if amount is None or not amount.is_finite():
             return Response(
                 {'detail': 'Invalid amount'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         description = request.data.get('description', 'Admin balance adjustment')
-        old_balance = user.balance
-        new_balance = user.update_balance(amount)
-
-        # Create transaction record
-        Transaction.objects.create(
-            user=user,
-            transaction_type='bonus' if amount > 0 else 'withdrawal',
-            amount=amount,
-            balance_after=new_balance,
-            description=description
-        )
+        # Posts the bonus / withdrawal ledger entry
+        new_balance = user.update_balance(amount, description=description)
+        old_balance = new_balance - amount
 
         logger.info(
             f"Admin updated user balance: user={user.id}, "
@@ -503,13 +548,11 @@ class AdminProcurementViewSet(viewsets.ModelViewSet):
         if is_featured is not None:
             queryset = queryset.filter(is_featured=is_featured.lower() == 'true')
 
-        # Search
+        # Search (full-text / trigram on PostgreSQL, plus organizer name)
         search = params.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(organizer__first_name__icontains=search)
+            queryset = search_procurements(
+                queryset, search, extra=Q(organizer__first_name__icontains=search)
             )
 
         return queryset
@@ -630,38 +673,17 @@ class AdminPaymentViewSet(viewsets.ReadOnlyModelViewSet):
 
         return queryset
 
+    @action(detail=False, renderer_classes=[CSVRenderer, XLSXRenderer])
+    def export(self, request):
+        """Queue an export of the filtered payments: GET /api/admin/payments/export/?format=csv|xlsx"""
+        return export_list(request, 'payments')
+
     @action(detail=False)
     def summary(self, request):
         """Get payment summary statistics."""
-        queryset = self.get_queryset()
-
-        total = queryset.aggregate(
-            count=Count('id'),
-            total_amount=Sum('amount')
-        )
-
-        by_status = {
-            row['status']: {'count': row['count'], 'total': row['total']}
-            for row in queryset.values('status').annotate(
-                count=Count('id'),
-                total=Sum('amount')
-            )
-        }
-
-        by_type = {
-            row['payment_type']: {'count': row['count'], 'total': row['total']}
-            for row in queryset.values('payment_type').annotate(
-                count=Count('id'),
-                total=Sum('amount')
-            )
-        }
-
-        return Response({
-            'total_count': total['count'],
-            'total_amount': total['total_amount'] or 0,
-            'by_status': by_status,
-            'by_type': by_type,
-        })
+        # One conditional-aggregation query, cached briefly per filter set
+        summary = cached_payment_summary(self.get_queryset(), request.query_params.dict())
+        return Response(summary)
 
 
 class AdminTransactionViewSet(viewsets.ReadOnlyModelViewSet):
@@ -695,6 +717,49 @@ class AdminTransactionViewSet(viewsets.ReadOnlyModelViewSet):
 
         return queryset
 
+    @action(detail=False, renderer_classes=[CSVRenderer, XLSXRenderer])
+    def export(self, request):
+        """Queue an export of the filtered transactions: GET /api/admin/transactions/export/?format=csv|xlsx"""
+        return export_list(request, 'transactions')
+
+
+# Exportable lists: the viewset whose get_queryset applies the filters, and the columns
+EXPORTS = {
+    'users': (AdminUserViewSet, USER_COLUMNS),
+    'payments': (AdminPaymentViewSet, PAYMENT_COLUMNS),
+    'transactions': (AdminTransactionViewSet, TRANSACTION_COLUMNS),
+}
+
+
+def export_queryset(name, params):
+    """Queryset and columns of an export of ``name``, filtered by the list's query ``params``"""
+    viewset_class, columns = EXPORTS[name]
+    http_request = HttpRequest()
+    http_request.GET = QueryDict(mutable=True)
+    http_request.GET.update(params)
+    viewset = viewset_class(request=Request(http_request), action='export', format_kwarg=None)
+    return viewset.get_queryset(), columns
+
+
+class AdminExportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Admin viewset for background export jobs (read-only)."""
+    queryset = ExportJob.objects.all().order_by('-created_at')
+    serializer_class = AdminExportJobSerializer
+    permission_classes = [IsAdminUser]
+
+    @action(detail=True)
+    def download(self, request, pk=None):
+        """File of a finished export: GET /api/admin/exports/{id}/download/"""
+        job = self.get_object()
+        if job.status != ExportJob.Status.DONE:
+            return Response({'detail': 'Export is not ready'}, status=status.HTTP_409_CONFLICT)
+        if not job.file:
+            return Response({'detail': 'Export file has expired'}, status=status.HTTP_410_GONE)
+        content_type = XLSX_CONTENT_TYPE if job.export_format == 'xlsx' else 'text/csv; charset=utf-8'
+        return FileResponse(
+            job.file.open('rb'), as_attachment=True, filename=job.filename, content_type=content_type
+        )
+
 
 class AdminCategoryViewSet(viewsets.ModelViewSet):
     """Admin viewset for Category management."""
@@ -702,6 +767,16 @@ class AdminCategoryViewSet(viewsets.ModelViewSet):
     serializer_class = AdminCategorySerializer
     permission_classes = [IsAdminUser]
 
+    def get_queryset(self):
+        return super().get_queryset().annotate(
+            procurements_count=count_subquery(Procurement.objects.all(), 'category'),
+        )
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        # Reload with the annotations the serializer reads
+        serializer.instance = self.get_queryset().get(pk=serializer.instance.pk)
+
 
 class AdminMessageViewSet(viewsets.ModelViewSet):
     """Admin viewset for Message management."""
@@ -802,8 +877,13 @@ class AdminNotificationViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def send_bulk(self, request):
-        """Send notification to multiple users."""
-        user_ids = request.data.get('user_ids', [])
+        """Queue a notification for multiple users (or all active users).
+
+        The fan-out runs in the background in bounded batches; the response
+        is 202 with the job, whose progress is served by
+        GET /api/admin/notifications/jobs/{job_id}/.
+        """
+        user_ids = request.data.get('user_ids') or None
         notification_type = request.data.get('notification_type', 'system')
         title = request.data.get('title')
         message_text = request.data.get('message')
@@ -814,21 +894,23 @@ class AdminNotificationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        notifications = []
-        if user_ids:
-            users = User.objects.filter(id__in=user_ids)
-        else:
-            # Send to all active users
-            users = User.objects.filter(is_active=True)
-
-        for user in users:
-            notifications.append(Notification(
-                user=user,
-                notification_type=notification_type,
-                title=title,
-                message=message_text
-            ))
-
-        Notification.objects.bulk_create(notifications)
-        logger.info(f"Admin sent bulk notification: count={len(notifications)}")
-        return Response({'sent': len(notifications)})
+        job = BulkNotificationJob.objects.create(
+            notification_type=notification_type,
+            title=title,
+            message=message_text,
+            user_ids=sorted(set(user_ids)) if user_ids else None,
+        )
+        enqueue_job(job)
+        logger.info(f"Admin queued bulk notification: job={job.id}")
+        return Response(
+            AdminBulkNotificationJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    @action(detail=False, methods=['get'], url_path=r'jobs/(?P<job_id>\d+)')
+    def job(self, request, job_id=None):
+        """Progress of a bulk notification job."""
+        job = BulkNotificationJob.objects.filter(pk=job_id).first()
+        if job is None:
+            return Response({'detail': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(AdminBulkNotificationJobSerializer(job).data)
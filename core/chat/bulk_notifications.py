@@ -0,0 +1,112 @@
+"""
+Background fan-out of bulk notifications.
+
+``send_bulk`` only records a pending :class:`~chat.models.BulkNotificationJob`
+and returns.  ``manage.py run_notification_jobs --interval 5`` (kept running
+by the django-worker service, never inside Gunicorn, so a worker restart or
+timeout cannot drop a job) claims it and walks the recipients by primary key
+in batches of ``NOTIFICATION_FANOUT_BATCH_SIZE`` ids, inserting one batch of
+notifications per transaction together with the job's progress cursor.
+Memory use is bounded by the batch size no matter how many users there are.
+
+Jobs interrupted by a restart of the worker are claimed again once their
+progress is ``NOTIFICATION_JOB_STALE_MINUTES`` old.  With
+``NOTIFICATION_JOBS_INLINE = True`` jobs run synchronously after the request's
+commit (tests, single-process setups).
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from users.models import User
+from .models import BulkNotificationJob, Notification
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'NOTIFICATION_FANOUT_BATCH_SIZE', 1000)
+# A running job whose progress has not moved for this long is considered
+# orphaned (its worker died) and may be claimed again
+STALE_AFTER = timedelta(minutes=getattr(settings, 'NOTIFICATION_JOB_STALE_MINUTES', 10))
+
+def recipients(job):
+    """Queryset of the job's recipients"""
+    if job.user_ids is not None:
+        return User.objects.filter(id__in=job.user_ids)
+    return User.objects.filter(is_active=True)
+
+
+def enqueue_job(job):
+    """Leave the pending job to the worker, or run it after commit when inline"""
+    if getattr(settings, 'NOTIFICATION_JOBS_INLINE', False):
+        transaction.on_commit(lambda: run_job(job.pk))
+
+
+def claim_job(job_id):
+    """Mark a pending (or orphaned running) job as running; False if taken"""
+    stale = timezone.now() - STALE_AFTER
+    return bool(
+        BulkNotificationJob.objects.filter(pk=job_id)
+        .filter(
+            Q(status=BulkNotificationJob.Status.PENDING)
+            | Q(status=BulkNotificationJob.Status.RUNNING, updated_at__lt=stale)
+        )
+        .update(status=BulkNotificationJob.Status.RUNNING, updated_at=timezone.now())
+    )
+
+
+def run_job(job_id, batch_size=None):
+    """Fan the job's notification out to all remaining recipients"""
+    batch_size = batch_size or BATCH_SIZE
+    if not claim_job(job_id):
+        logger.info(f"Bulk notification job {job_id} is already being processed")
+        return
+
+    job = BulkNotificationJob.objects.get(pk=job_id)
+    try:
+        if job.total is None:
+            job.total = recipients(job).count()
+            BulkNotificationJob.objects.filter(pk=job.pk).update(total=job.total)
+
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    recipients(job).filter(id__gt=job.last_user_id)
+                    .order_by('id').values_list('id', flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+                Notification.objects.bulk_create([
+                    Notification(
+                        user_id=user_id,
+                        notification_type=job.notification_type,
+                        title=job.title,
+                        message=job.message,
+                    )
+                    for user_id in ids
+                ])
+                job.last_user_id = ids[-1]
+                BulkNotificationJob.objects.filter(pk=job.pk).update(
+                    processed=F('processed') + len(ids),
+                    last_user_id=job.last_user_id,
+                    updated_at=timezone.now(),
+                )
+    except Exception as e:
+        logger.exception(f"Bulk notification job {job_id} failed")
+        BulkNotificationJob.objects.filter(pk=job_id).update(
+            status=BulkNotificationJob.Status.FAILED,
+            error_message=str(e),
+            updated_at=timezone.now(),
+        )
+        return
+
+    BulkNotificationJob.objects.filter(pk=job_id).update(
+        status=BulkNotificationJob.Status.DONE,
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    job.refresh_from_db(fields=['processed'])
+    logger.info(f"Bulk notification job {job_id} done: sent={job.processed}")
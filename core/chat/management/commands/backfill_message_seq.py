@@ -0,0 +1,150 @@
+"""
+Management command to number chat messages with per-procurement sequences.
+
+Run with:
+    python manage.py backfill_message_seq
+
+Procurements created before sequence numbers existed have
+``message_seq IS NULL`` and their messages ``seq IS NULL``; unread counts for
+them fall back to counting rows.  For each such procurement (processed in
+chunks of --chunk-size ids) the command locks the procurement row, numbers the
+messages oldest-first in batches of --batch-size, enables the counter and
+recomputes the read positions (last_read_seq / own_since_read) of its
+message_reads, all in one transaction per procurement.  Senders that post
+during the backfill wait on the row lock and continue the numbering.
+
+Messages left unnumbered in an already enabled procurement (e.g. inserted
+concurrently with its backfill) are appended after the current counter, so
+the command is safe to re-run.  Use --dry-run to only report the work left.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from chat.models import Message, MessageRead
+from procurements.models import Procurement
+
+
+def pending_procurements():
+    """Procurements with unnumbered messages or a disabled counter"""
+    return Procurement.objects.filter(
+        Q(message_seq__isnull=True)
+        | Q(id__in=Message.objects.filter(seq__isnull=True).values('procurement_id'))
+    )
+
+
+def backfill_procurement(procurement_id, batch_size=1000):
+    """Number one procurement's messages; returns how many were numbered"""
+    with transaction.atomic():
+        head = (
+            Procurement.objects.select_for_update()
+            .filter(pk=procurement_id)
+            .values_list('message_seq', flat=True)
+            .first()
+        )
+        legacy = head is None
+        head = head or 0
+        numbered = 0
+
+        unnumbered = Message.objects.filter(procurement_id=procurement_id, seq__isnull=True)
+        while True:
+            batch = list(unnumbered.order_by('created_at', 'id').only('id')[:batch_size])
+            if not batch:
+                break
+            for message in batch:
+                head += 1
+                message.seq = head
+            Message.objects.bulk_update(batch, ['seq'])
+            numbered += len(batch)
+
+        Procurement.objects.filter(pk=procurement_id).update(message_seq=head)
+
+        if legacy:
+            reads = MessageRead.objects.filter(procurement_id=procurement_id)
+            reads.update(last_read_seq=Coalesce(
+                Subquery(Message.objects.filter(pk=OuterRef('last_read_message_id')).values('seq')),
+                Value(0),
+            ))
+            own_after_read = (
+                Message.objects
+                .filter(procurement_id=procurement_id, user_id=OuterRef('user_id'),
+                        seq__gt=OuterRef('last_read_seq'))
+                .order_by().values('user_id').annotate(c=Count('id')).values('c')
+            )
+            reads.update(own_since_read=Coalesce(Subquery(own_after_read), Value(0)))
+
+            # Senders without a read marker need one so their own messages
+            # are not counted as unread
+            readers = reads.values('user_id')
+            senders = (
+                Message.objects
+                .filter(procurement_id=procurement_id, user_id__isnull=False)
+                .exclude(user_id__in=readers)
+                .order_by().values('user_id').annotate(c=Count('id'))
+            )
+            MessageRead.objects.bulk_create([
+                MessageRead(
+                    procurement_id=procurement_id, user_id=row['user_id'],
+                    last_read_seq=0, own_since_read=row['c'],
+                )
+                for row in senders
+            ], batch_size=batch_size)
+
+    return numbered
+
+
+class Command(BaseCommand):
+    help = "Assign per-procurement sequence numbers to existing chat messages"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Messages numbered per UPDATE batch",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Procurement ids fetched per chunk",
+        )
+        parser.add_argument(
+            "--procurement-id",
+            type=int,
+            help="Backfill a single procurement",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many procurements still need a backfill",
+        )
+
+    def handle(self, *args, **options):
+        queryset = pending_procurements()
+        if options["procurement_id"]:
+            queryset = queryset.filter(pk=options["procurement_id"])
+
+        if options["dry_run"]:
+            self.stdout.write(f"{queryset.count()} procurements need a message sequence backfill.")
+            return
+
+        last_id, procurements, messages = 0, 0, 0
+        while True:
+            ids = list(
+                queryset.filter(pk__gt=last_id).order_by("pk")
+                .values_list("pk", flat=True)[:options["chunk_size"]]
+            )
+            if not ids:
+                break
+            for procurement_id in ids:
+                messages += backfill_procurement(procurement_id, options["batch_size"])
+                procurements += 1
+            last_id = ids[-1]
+            self.stdout.write(f"  ...{procurements} procurements, {messages} messages numbered")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\nDone. Numbered {messages} messages in {procurements} procurements."
+        ))
@@ -0,0 +1,69 @@
+"""
+Management command to run queued or interrupted bulk notification jobs.
+
+Run with:
+    python manage.py run_notification_jobs
+
+``send_bulk`` only queues jobs; this command claims the ``pending`` ones and
+those left ``running`` with a stale ``updated_at`` by a worker that died,
+and finishes them from their progress cursor.  The django-worker service
+keeps it running with --interval SECONDS (poll again after each pass).  Use
+--job-id to run a single job and --batch-size to override
+NOTIFICATION_FANOUT_BATCH_SIZE.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from chat.bulk_notifications import STALE_AFTER, run_job
+from chat.models import BulkNotificationJob
+
+
+class Command(BaseCommand):
+    help = "Run pending and interrupted bulk notification jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--job-id",
+            type=int,
+            help="Run a single job",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Notifications inserted per transaction",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            help="Keep running, polling for jobs every INTERVAL seconds",
+        )
+
+    def handle(self, *args, **options):
+        ran = 0
+        while True:
+            ran += self._run_due(options)
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"\nDone. Ran {ran} jobs."))
+
+    def _run_due(self, options):
+        stale = timezone.now() - STALE_AFTER
+        jobs = BulkNotificationJob.objects.filter(
+            Q(status=BulkNotificationJob.Status.PENDING)
+            | Q(status=BulkNotificationJob.Status.RUNNING, updated_at__lt=stale)
+        )
+        if options["job_id"]:
+            jobs = jobs.filter(pk=options["job_id"])
+
+        ran = 0
+        for job_id in jobs.order_by("created_at").values_list("id", flat=True):
+            run_job(job_id, batch_size=options["batch_size"])
+            job = BulkNotificationJob.objects.get(pk=job_id)
+            self.stdout.write(f"  Job {job.id}: {job.status}, {job.processed}/{job.total}")
+            ran += 1
+        return ran
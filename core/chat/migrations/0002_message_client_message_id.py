@@ -0,0 +1,29 @@
+"""
+Migration: 0002_message_client_message_id
+Adds the sender-generated client_message_id to chat messages, unique when
+set, so batched deliveries from the WebSocket server can be retried safely.
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='client_message_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('client_message_id__isnull', False)),
+                fields=('client_message_id',),
+                name='chat_message_client_id_uniq',
+            ),
+        ),
+    ]
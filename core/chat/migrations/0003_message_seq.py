@@ -0,0 +1,48 @@
+"""
+Migration: 0003_message_seq
+Adds per-procurement sequence numbers to chat messages and the sequence-based
+read position to message_reads, plus a partial index over soft-deleted
+messages used when subtracting them from unread counts.  Existing messages
+are numbered by `manage.py backfill_message_seq`.
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_message_client_message_id'),
+        ('procurements', '0008_procurement_message_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='seq',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('seq__isnull', False)),
+                fields=('procurement', 'seq'),
+                name='chat_message_proc_seq_uniq',
+            ),
+        ),
+        migrations.AddField(
+            model_name='messageread',
+            name='last_read_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='messageread',
+            name='own_since_read',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        # Kept out of Message.Meta.indexes, whose names must match 0001 (issue #202)
+        migrations.RunSQL(
+            'CREATE INDEX chat_msg_deleted_seq_idx ON chat_messages (procurement_id, seq) '
+            'WHERE is_deleted',
+            'DROP INDEX chat_msg_deleted_seq_idx',
+        ),
+    ]
@@ -0,0 +1,50 @@
+"""
+Migration: 0004_bulknotificationjob
+Adds the job table backing asynchronous bulk notification fan-out.
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_message_seq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkNotificationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[
+                    ('new_message', 'New Message'),
+                    ('procurement_update', 'Procurement Update'),
+                    ('payment_required', 'Payment Required'),
+                    ('payment_received', 'Payment Received'),
+                    ('procurement_completed', 'Procurement Completed'),
+                    ('system', 'System'),
+                    ('admin_message', 'Admin Message'),
+                ], max_length=30)),
+                ('title', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('user_ids', models.JSONField(blank=True, null=True)),
+                ('status', models.CharField(choices=[
+                    ('pending', 'Pending'),
+                    ('running', 'Running'),
+                    ('done', 'Done'),
+                    ('failed', 'Failed'),
+                ], db_index=True, default='pending', max_length=20)),
+                ('total', models.PositiveIntegerField(blank=True, null=True)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('last_user_id', models.BigIntegerField(default=0)),
+                ('error_message', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'bulk_notification_jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
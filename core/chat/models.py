@@ -2,7 +2,7 @@
 Chat models for GroupBuy Bot
 Supports real-time messaging in procurement chats
 """
-from django.db import models
+from django.db import models, transaction
 from users.models import User
 from procurements.models import Procurement
 
@@ -32,6 +32,12 @@ class Message(models.Model):
     attachment_url = models.URLField(blank=True)
     is_edited = models.BooleanField(default=False)
     is_deleted = models.BooleanField(default=False)
+    # Sender-generated id (e.g. from the WebSocket server) that makes retried
+    # deliveries idempotent: a second insert with the same id is discarded
+    client_message_id = models.CharField(max_length=64, null=True, blank=True)
+    # Position in the procurement's chat (1, 2, ...), taken from
+    # Procurement.message_seq; NULL for messages not backfilled yet
+    seq = models.BigIntegerField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -41,11 +47,42 @@ class Message(models.Model):
             models.Index(fields=['procurement', 'created_at'], name='chat_messa_procure_a1b2c3_idx'),
             models.Index(fields=['user'], name='chat_messa_user_id_d4e5f6_idx'),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['client_message_id'],
+                condition=models.Q(client_message_id__isnull=False),
+                name='chat_message_client_id_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['procurement', 'seq'],
+                condition=models.Q(seq__isnull=False),
+                name='chat_message_proc_seq_uniq',
+            ),
+        ]
         ordering = ['created_at']
 
     def __str__(self):
         return f"Message by {self.user} in {self.procurement.title}"
 
+    def save(self, *args, **kwargs):
+        from .unread import invalidate_procurement_unread_counts, record_own_messages
+
+        if not self._state.adding or self.seq is not None:
+            super().save(*args, **kwargs)
+        else:
+            with transaction.atomic():
+                self.seq = Procurement.reserve_message_seq(self.procurement_id)
+                super().save(*args, **kwargs)
+                if self.seq is not None:
+                    record_own_messages(self.procurement_id, self.user_id, 1)
+        # New, edited and soft-deleted messages all change unread counts
+        invalidate_procurement_unread_counts([self.procurement_id])
+
+    def delete(self, *args, **kwargs):
+        from .unread import invalidate_procurement_unread_counts
+        invalidate_procurement_unread_counts([self.procurement_id])
+        return super().delete(*args, **kwargs)
+
 
 class MessageRead(models.Model):
     """Track read status of messages"""
@@ -55,6 +92,10 @@ class MessageRead(models.Model):
         Message, on_delete=models.SET_NULL,
         null=True, related_name='read_by'
     )
+    # Read position as a Message.seq, plus the user's own messages after it,
+    # so unread = Procurement.message_seq - last_read_seq - own_since_read
+    last_read_seq = models.BigIntegerField(default=0)
+    own_since_read = models.PositiveIntegerField(default=0)
     last_read_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -64,6 +105,11 @@ class MessageRead(models.Model):
     def __str__(self):
         return f"{self.user} in {self.procurement.title}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from .unread import invalidate_unread_counts
+        invalidate_unread_counts([self.user_id])
+
 
 class Notification(models.Model):
     """User notifications"""
@@ -98,3 +144,42 @@ class Notification(models.Model):
 
     def __str__(self):
         return f"Notification for {self.user}: {self.title}"
+
+
+class BulkNotificationJob(models.Model):
+    """Background fan-out of one notification to many users.
+
+    Status machine: pending → running → done | failed
+    ``last_user_id`` is the keyset cursor of the fan-out; it is advanced in
+    the same transaction as each inserted batch, so an interrupted job
+    resumes where it stopped without notifying anyone twice.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    notification_type = models.CharField(max_length=30, choices=Notification.NotificationType.choices)
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    # Explicit recipients; NULL means every active user
+    user_ids = models.JSONField(null=True, blank=True)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING, db_index=True
+    )
+    total = models.PositiveIntegerField(null=True, blank=True)
+    processed = models.PositiveIntegerField(default=0)
+    last_user_id = models.BigIntegerField(default=0)
+    error_message = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'bulk_notification_jobs'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"BulkNotificationJob {self.id} [{self.status}] {self.processed}/{self.total}"
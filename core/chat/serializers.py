@@ -13,10 +13,12 @@ class MessageSerializer(serializers.ModelSerializer):
         model = Message
         fields = [
             'id', 'procurement', 'user', 'user_name',
-            'message_type', 'text', 'attachment_url',
+            'message_type', 'text', 'attachment_url', 'client_message_id', 'seq',
             'is_edited', 'is_deleted', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'is_edited', 'is_deleted', 'created_at', 'updated_at']
+        read_only_fields = [
+            'id', 'client_message_id', 'seq', 'is_edited', 'is_deleted', 'created_at', 'updated_at'
+        ]
 
 
 class CreateMessageSerializer(serializers.Serializer):
@@ -31,6 +33,16 @@ class CreateMessageSerializer(serializers.Serializer):
     attachment_url = serializers.URLField(required=False, allow_blank=True)
 
 
+class BulkMessageItemSerializer(CreateMessageSerializer):
+    """One message in a bulk insert; client_message_id makes retries idempotent"""
+    client_message_id = serializers.CharField(max_length=64)
+
+
+class BulkMessageSerializer(serializers.Serializer):
+    """Serializer for POST /api/chat/messages/bulk/"""
+    messages = BulkMessageItemSerializer(many=True, allow_empty=False, max_length=1000)
+
+
 class MessageReadSerializer(serializers.ModelSerializer):
     """Message read status serializer"""
 
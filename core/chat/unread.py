@@ -0,0 +1,221 @@
+"""
+Unread message counts across all of a user's chats.
+
+Messages carry a per-procurement sequence number (``Message.seq``) and
+``MessageRead`` stores the user's read position as a sequence number plus the
+number of the user's own messages after it, so
+
+    unread = Procurement.message_seq - last_read_seq - own_since_read
+             - (other users' soft-deleted messages after last_read_seq)
+
+is computed from the procurement and read-marker rows without scanning the
+chat history (the last term is served by a partial index that only holds
+deleted messages).  :func:`unread_counts` evaluates it for every procurement
+the user can chat in (as organizer or active participant) in one query;
+procurements whose messages have not been numbered yet (see
+``manage.py backfill_message_seq``) fall back to counting rows.
+
+Results are cached per user under ``chat:unread:<user_id>`` together with
+the generation of each procurement in them (``chat:unread:gen:<id>``).  A new,
+edited or deleted message only replaces its procurement's generation, so the
+write path does constant work however large the chat is; a cached result
+whose generations no longer match is recomputed on the next read.
+``mark_read`` drops the reader's entry and participation changes the
+affected users' (see procurements.access_events).
+"""
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FilteredRelation, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+logger = logging.getLogger(__name__)
+
+UNREAD_CACHE_TTL = getattr(settings, 'CHAT_UNREAD_CACHE_TTL', 60)
+
+
+def _key(user_id):
+    return f'chat:unread:{user_id}'
+
+
+def _generation_key(procurement_id):
+    return f'chat:unread:gen:{procurement_id}'
+
+
+def _accessible_procurements(user_id):
+    from procurements.models import Participant, Procurement
+
+    return Procurement.objects.filter(
+        Q(organizer_id=user_id)
+        | Q(id__in=Participant.objects.filter(user_id=user_id, is_active=True)
+            .values('procurement_id'))
+    )
+
+
+def unread_counts(user_id, procurement_ids=None):
+    """Return ``{procurement_id: unread_count}`` for the user's chats.
+
+    Without ``procurement_ids`` every chat the user can access is included.
+    """
+    from procurements.models import Procurement
+    from .models import Message
+
+    if procurement_ids is None:
+        procurements = _accessible_procurements(user_id)
+    else:
+        procurements = Procurement.objects.filter(id__in=procurement_ids)
+
+    last_read_seq = Coalesce(F('my_read__last_read_seq'), Value(0))
+    deleted_after_read = (
+        Message.objects
+        .filter(procurement=OuterRef('pk'), is_deleted=True, seq__gt=OuterRef('read_seq'))
+        .exclude(user_id=user_id)
+        .order_by()
+        .values('procurement')
+        .annotate(c=Count('id'))
+        .values('c')
+    )
+    rows = (
+        procurements
+        .annotate(my_read=FilteredRelation('read_status', condition=Q(read_status__user_id=user_id)))
+        .annotate(read_seq=last_read_seq)
+        .annotate(unread=(
+            F('message_seq') - F('read_seq')
+            - Coalesce(F('my_read__own_since_read'), Value(0))
+            - Coalesce(Subquery(deleted_after_read), Value(0))
+        ))
+        .values_list('id', 'unread')
+        .order_by()
+    )
+    counts = dict(rows)
+    legacy = [pid for pid, unread in counts.items() if unread is None]
+    if legacy:
+        counts.update(_scan_unread_counts(user_id, legacy))
+    return counts
+
+
+def _scan_unread_counts(user_id, procurement_ids):
+    """Row-counting fallback for procurements without sequence numbers"""
+    from procurements.models import Procurement
+
+    unread = (
+        Q(messages__is_deleted=False)
+        & ~Q(messages__user_id=user_id)
+        & (
+            Q(my_read__last_read_message__isnull=True)
+            | Q(messages__created_at__gt=F('my_read__last_read_message__created_at'))
+        )
+    )
+    rows = (
+        Procurement.objects
+        .filter(id__in=procurement_ids)
+        .annotate(my_read=FilteredRelation('read_status', condition=Q(read_status__user_id=user_id)))
+        .values('id')
+        .annotate(unread=Count('messages', filter=unread))
+        .order_by()
+    )
+    return {row['id']: row['unread'] for row in rows}
+
+
+def own_messages_after(procurement_id, user_id, seq):
+    """Number of the user's messages in the chat with a sequence above ``seq``"""
+    from procurements.models import Procurement
+    from .models import Message
+
+    head = Procurement.objects.filter(pk=procurement_id).values_list('message_seq', flat=True).first()
+    if seq is None or head is None or seq >= head:
+        return 0
+    return Message.objects.filter(procurement_id=procurement_id, user_id=user_id, seq__gt=seq).count()
+
+
+def record_own_messages(procurement_id, user_id, count):
+    """Add ``count`` just-sent messages to the sender's own_since_read"""
+    from .models import MessageRead
+
+    if user_id is None or not count:
+        return
+    read = MessageRead.objects.filter(user_id=user_id, procurement_id=procurement_id)
+    if read.update(own_since_read=F('own_since_read') + count):
+        return
+    try:
+        with transaction.atomic():
+            MessageRead.objects.create(
+                user_id=user_id, procurement_id=procurement_id, own_since_read=count
+            )
+    except IntegrityError:
+        read.update(own_since_read=F('own_since_read') + count)
+
+
+def _generations(procurement_ids):
+    """``{procurement_id: generation}``, starting one for procurements without"""
+    keys = {_generation_key(pid): pid for pid in procurement_ids}
+    found = cache.get_many(list(keys))
+    generations = {keys[key]: generation for key, generation in found.items()}
+    for key, pid in keys.items():
+        if key not in found:
+            generation = uuid.uuid4().hex
+            if not cache.add(key, generation, None):
+                generation = cache.get(key) or generation
+            generations[pid] = generation
+    return generations
+
+
+def get_cached_unread_counts(user_id):
+    """Cached :func:`unread_counts`; cache errors fall back to the database"""
+    key = _key(user_id)
+    try:
+        cached = cache.get(key)
+        if cached is not None:
+            counts, generations = cached
+            if _generations(counts) == generations:
+                return counts
+    except Exception as e:
+        logger.warning(f"Unread cache read failed for {key}: {e}")
+
+    procurement_ids = list(_accessible_procurements(user_id).values_list('id', flat=True))
+    try:
+        # Read before counting, so a message sent meanwhile invalidates the result
+        generations = _generations(procurement_ids)
+    except Exception as e:
+        logger.warning(f"Unread cache read failed for {key}: {e}")
+        return unread_counts(user_id)
+
+    counts = unread_counts(user_id, procurement_ids)
+    try:
+        cache.set(key, (counts, generations), UNREAD_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Unread cache write failed for {key}: {e}")
+    return counts
+
+
+def _delete(keys):
+    try:
+        cache.delete_many(keys)
+    except Exception as e:
+        logger.warning(f"Unread cache invalidation failed: {e}")
+
+
+def invalidate_unread_counts(user_ids):
+    """Drop cached counts for users, now and again after commit"""
+    keys = [_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        _delete(keys)
+        transaction.on_commit(lambda: _delete(keys))
+
+
+def _bump_generations(procurement_ids):
+    try:
+        cache.set_many({_generation_key(pid): uuid.uuid4().hex for pid in procurement_ids}, None)
+    except Exception as e:
+        logger.warning(f"Unread cache invalidation failed for {procurement_ids}: {e}")
+
+
+def invalidate_procurement_unread_counts(procurement_ids):
+    """Invalidate the cached counts of everyone in these chats, now and again after commit"""
+    procurement_ids = set(procurement_ids)
+    if procurement_ids:
+        _bump_generations(procurement_ids)
+        transaction.on_commit(lambda: _bump_generations(procurement_ids))
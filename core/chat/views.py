@@ -1,13 +1,23 @@
 """
 Views for Chat API
 """
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from procurements.pagination import KeysetPagination
+from procurements.models import Procurement
+from users.models import User
 from .models import Message, MessageRead, Notification
+from .unread import (
+    get_cached_unread_counts, invalidate_procurement_unread_counts,
+    own_messages_after, record_own_messages, unread_counts,
+)
 from .serializers import (
-    MessageSerializer, CreateMessageSerializer,
+    MessageSerializer, CreateMessageSerializer, BulkMessageSerializer,
     NotificationSerializer
 )
 
@@ -18,13 +28,18 @@ class MessageViewSet(viewsets.ModelViewSet):
 
     Endpoints:
     - GET /api/chat/messages/ - list messages (requires procurement_id)
+    - GET /api/chat/messages/?procurement_id=1&cursor= - newest-first keyset pages
     - POST /api/chat/messages/ - create a message
+    - POST /api/chat/messages/bulk/ - insert a batch of messages (idempotent by client_message_id)
     - GET /api/chat/messages/{id}/ - get message details
     - POST /api/chat/messages/mark_read/ - mark messages as read
     - GET /api/chat/messages/unread_count/ - get unread message count
+    - GET /api/chat/messages/unread_counts/?user_id= - unread counts for all of a user's chats
     """
     queryset = Message.objects.filter(is_deleted=False).select_related('user')
     serializer_class = MessageSerializer
+    # ?cursor= pages backwards through history on the (procurement, created_at) index
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -55,6 +70,105 @@ class MessageViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED
         )
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Insert a batch of messages in one statement.
+
+        Messages whose client_message_id was already stored (or repeats
+        within the batch) are skipped, so senders can retry a batch after a
+        timeout without creating duplicates.  Messages for unknown
+        procurements or users are rejected individually.
+        """
+        serializer = BulkMessageSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        items = serializer.validated_data['messages']
+        client_ids = [item['client_message_id'] for item in items]
+        seen = set(
+            Message.objects.filter(client_message_id__in=client_ids)
+            .values_list('client_message_id', flat=True)
+        )
+        known_procurements = set(
+            Procurement.objects.filter(id__in={item['procurement_id'] for item in items})
+            .values_list('id', flat=True)
+        )
+        known_users = set(
+            User.objects.filter(id__in={item['user_id'] for item in items})
+            .values_list('id', flat=True)
+        )
+
+        to_create, duplicates, rejected = [], 0, []
+        for item in items:
+            client_id = item['client_message_id']
+            if client_id in seen:
+                duplicates += 1
+                continue
+            if item['procurement_id'] not in known_procurements or item['user_id'] not in known_users:
+                rejected.append({'client_message_id': client_id, 'error': 'Unknown procurement or user'})
+                continue
+            seen.add(client_id)
+            to_create.append(Message(
+                procurement_id=item['procurement_id'],
+                user_id=item['user_id'],
+                text=item['text'],
+                message_type=item['message_type'],
+                attachment_url=item.get('attachment_url', ''),
+                client_message_id=client_id,
+            ))
+
+        # The counter rows are locked (in id order) before client_message_id
+        # is checked again: a concurrent retry of the same batch has then
+        # committed and its messages count as duplicates, so sequence numbers
+        # and own-message counts are only reserved for rows that are inserted.
+        # Sequence numbers follow message order and the rows stay locked
+        # until the batch commits.
+        by_procurement = defaultdict(list)
+        try:
+            with transaction.atomic():
+                list(
+                    Procurement.objects.select_for_update()
+                    .filter(id__in={message.procurement_id for message in to_create})
+                    .order_by('id').values_list('id', flat=True)
+                )
+                stored = set(
+                    Message.objects.filter(
+                        client_message_id__in=[message.client_message_id for message in to_create]
+                    ).values_list('client_message_id', flat=True)
+                )
+                if stored:
+                    duplicates += len(stored)
+                    to_create = [m for m in to_create if m.client_message_id not in stored]
+
+                for message in to_create:
+                    by_procurement[message.procurement_id].append(message)
+                for procurement_id, messages in by_procurement.items():
+                    last = Procurement.reserve_message_seq(procurement_id, len(messages))
+                    if last is not None:
+                        for seq, message in enumerate(messages, start=last - len(messages) + 1):
+                            message.seq = seq
+                Message.objects.bulk_create(to_create)
+
+                own = Counter(
+                    (m.procurement_id, m.user_id) for m in to_create if m.seq is not None
+                )
+                for (procurement_id, user_id), count in own.items():
+                    record_own_messages(procurement_id, user_id, count)
+        except IntegrityError:
+            # A client_message_id reused for another procurement's message
+            return Response(
+                {'error': 'client_message_id already used'},
+                status=status.HTTP_409_CONFLICT
+            )
+        invalidate_procurement_unread_counts(by_procurement.keys())
+
+        return Response({
+            'received': len(items),
+            'created': len(to_create),
+            'duplicates': duplicates,
+            'rejected': rejected,
+        }, status=status.HTTP_201_CREATED)
+
     @action(detail=False, methods=['post'])
     def mark_read(self, request):
         """Mark messages as read"""
@@ -69,18 +183,21 @@ class MessageViewSet(viewsets.ModelViewSet):
             )
 
         # Get the last message if not specified
-        if not message_id:
-            last_message = Message.objects.filter(
-                procurement_id=procurement_id,
-                is_deleted=False
-            ).order_by('-created_at').first()
-            message_id = last_message.id if last_message else None
-
+        messages = Message.objects.filter(procurement_id=procurement_id)
         if message_id:
+            message = messages.filter(pk=message_id).values('id', 'seq').first()
+        else:
+            message = messages.filter(is_deleted=False).order_by('-created_at').values('id', 'seq').first()
+
+        if message:
             MessageRead.objects.update_or_create(
                 user_id=user_id,
                 procurement_id=procurement_id,
-                defaults={'last_read_message_id': message_id}
+                defaults={
+                    'last_read_message_id': message['id'],
+                    'last_read_seq': message['seq'] or 0,
+                    'own_since_read': own_messages_after(procurement_id, user_id, message['seq']),
+                }
             )
 
         return Response({'message': 'Marked as read'})
@@ -99,31 +216,37 @@ class MessageViewSet(viewsets.ModelViewSet):
 
         if procurement_id:
             # Get unread count for specific procurement
-            read_status = MessageRead.objects.filter(
-                user_id=user_id,
-                procurement_id=procurement_id
-            ).first()
-
-            if read_status and read_status.last_read_message:
-                unread_count = Message.objects.filter(
-                    procurement_id=procurement_id,
-                    is_deleted=False,
-                    created_at__gt=read_status.last_read_message.created_at
-                ).exclude(user_id=user_id).count()
-            else:
-                unread_count = Message.objects.filter(
-                    procurement_id=procurement_id,
-                    is_deleted=False
-                ).exclude(user_id=user_id).count()
+            unread_count = unread_counts(int(user_id), [int(procurement_id)]).get(int(procurement_id), 0)
 
             return Response({
                 'procurement_id': int(procurement_id),
                 'unread_count': unread_count
             })
         else:
-            # Get unread counts for all procurements
-            # This is a simplified version - in production, use raw SQL for efficiency
-            return Response({'error': 'procurement_id is recommended'})
+            counts = get_cached_unread_counts(int(user_id))
+            return Response({
+                'unread_counts': {str(pid): count for pid, count in counts.items()},
+                'total': sum(counts.values()),
+            })
+
+    @action(detail=False, methods=['get'])
+    def unread_counts(self, request):
+        """Unread message counts for every chat the user can access"""
+        user_id = request.query_params.get('user_id')
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'user_id is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        counts = get_cached_unread_counts(user_id)
+        return Response({
+            'user_id': user_id,
+            'unread_counts': {str(pid): count for pid, count in counts.items()},
+            'total': sum(counts.values()),
+        })
 
 
 class NotificationViewSet(viewsets.ModelViewSet):
@@ -0,0 +1,125 @@
+"""
+CSV / XLSX writing shared by the admin exports (admin_api.exports) and the
+procurement receipts (procurements.receipts).
+
+Rows are any iterable of value tuples, so callers can feed a
+``values_list(...).iterator(chunk_size=CHUNK_SIZE)`` and keep memory use
+independent of the number of rows.  CSV is produced line by line (streamed
+to the client or written to a temporary file); XLSX is built with openpyxl in
+write-only mode, rows going straight to a temporary file.  Values are made
+safe for spreadsheet apps: datetimes in local time and formula-like strings
+prefixed with a quote.
+"""
+import csv
+import json
+import re
+import tempfile
+from datetime import datetime
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+
+# openpyxl is an optional dependency; only XLSX exports need it.
+try:
+    from openpyxl import Workbook
+
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+# Rows fetched per round trip when reading an export's queryset
+CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Cells starting with these are evaluated as formulas by spreadsheet apps;
+# plain numbers such as phone numbers are left alone
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+NUMBER_RE = re.compile(r'^[+-]?[\d\s().-]+$')
+
+
+class CSVRenderer(BaseRenderer):
+    """Accepts ``?format=csv``; exports produce their own response body"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only JSON responses (errors, queued jobs) reach the renderer
+        return json.dumps(data).encode()
+
+
+class XLSXRenderer(CSVRenderer):
+    """Accepts ``?format=xlsx``; exports produce their own response body"""
+    media_type = XLSX_CONTENT_TYPE
+    format = 'xlsx'
+    charset = None
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) and not NUMBER_RE.match(value):
+        return "'" + value
+    return value
+
+
+def _xlsx_value(value):
+    if isinstance(value, datetime):
+        # Excel has no time zones
+        return timezone.localtime(value).replace(tzinfo=None)
+    return _csv_value(value)
+
+
+def csv_lines(headers, rows):
+    """Yield ``rows`` as CSV lines, headed by ``headers``"""
+    writer = csv.writer(_Echo())
+    # BOM so spreadsheet apps detect UTF-8 (Cyrillic names)
+    yield '\ufeff' + writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def xlsx_file(headers, rows, sheet_title):
+    """Write ``rows`` to an XLSX temporary file, rewound for reading"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title)
+    sheet.append(headers)
+    for row in rows:
+        sheet.append([_xlsx_value(value) for value in row])
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def attachment_response(headers, rows, filename, export_format, sheet_title):
+    """Download of ``rows`` as CSV (streamed) or XLSX (from a temporary file)"""
+    if export_format == 'xlsx':
+        return FileResponse(
+            xlsx_file(headers, rows, sheet_title),
+            as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE,
+        )
+    response = StreamingHttpResponse(
+        csv_lines(headers, rows), content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def csv_file(headers, rows):
+    """Write ``rows`` to a CSV temporary file, rewound for reading"""
+    output = tempfile.TemporaryFile()
+    for line in csv_lines(headers, rows):
+        output.write(line.encode('utf-8'))
+    output.seek(0)
+    return output
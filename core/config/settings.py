@@ -26,6 +26,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # Third party
     'rest_framework',
     'corsheaders',
@@ -98,6 +99,9 @@ CACHES = {
     }
 }
 
+# Seconds a user lookup stays in the cache (entries are also invalidated on write)
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '300'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
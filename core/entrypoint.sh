@@ -13,9 +13,52 @@
 #   DJANGO_SUPERUSER_USERNAME  – admin username  (default: admin)
 #   DJANGO_SUPERUSER_PASSWORD  – admin password  (required for auto-creation)
 #   DJANGO_SUPERUSER_EMAIL     – admin email     (default: admin@localhost)
+#
+# Started as "entrypoint.sh worker" (the django-worker service), the container
+# skips the setup below, waits until the django-admin container has applied
+# the migrations and runs the background workers instead of Gunicorn.  Each
+# worker is a long-running management command restarted when it exits.
 
 set -e
 
+if [ "${1:-}" = "worker" ]; then
+    echo "==> Waiting for migrations..."
+    until python manage.py migrate --check >/dev/null 2>&1; do
+        sleep 5
+    done
+
+    run_forever() {
+        (
+            while true; do
+                echo "==> Starting worker: $*"
+                python manage.py "$@" || echo "==> Worker exited: $*"
+                sleep 5
+            done
+        ) &
+    }
+
+    # Applies the payment webhooks the endpoints store (payments.webhooks)
+    run_forever run_payment_webhooks
+    # Fans out the bulk notifications send_bulk queues (chat.bulk_notifications)
+    run_forever run_notification_jobs --interval 5
+    # Writes the admin exports the export endpoints queue (admin_api.export_jobs)
+    run_forever run_export_jobs --interval 5
+    # Keeps the dashboard / analytics rollups current (admin_api.rollups)
+    run_forever build_rollups --interval 300
+    # Delivers the supplier documents send_to_supplier queues
+    # (procurements.supplier_jobs)
+    run_forever run_supplier_jobs
+    # Resolves pending Tochka payments whose webhook was lost
+    # (payments.reconciliation); needs the Cyclops settings
+    if [ -n "${TOCHKA_NOMINAL_ACCOUNT:-}" ]; then
+        run_forever reconcile_tochka_payments
+    else
+        echo "==> TOCHKA_NOMINAL_ACCOUNT not set — skipping reconcile_tochka_payments."
+    fi
+    wait
+    exit 0
+fi
+
 echo "==> Generating any pending model migrations..."
 python manage.py makemigrations --noinput
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Payment, Transaction
+from .models import Payment, Transaction, WebhookEvent
 
 
 @admin.register(Payment)
@@ -16,3 +16,11 @@ class TransactionAdmin(admin.ModelAdmin):
     list_filter = ['transaction_type', 'created_at']
     search_fields = ['user__first_name', 'description']
     readonly_fields = ['created_at']
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'provider', 'event_type', 'event_id', 'status', 'attempts', 'payment', 'received_at']
+    list_filter = ['provider', 'status', 'event_type']
+    search_fields = ['event_id']
+    readonly_fields = ['received_at', 'processed_at']
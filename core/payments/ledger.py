@@ -0,0 +1,55 @@
+"""
+Balance ledger.
+
+Every change of ``User.balance`` goes through :func:`post_entry`: in one
+transaction it moves the balance with an ``F()`` update (the row lock taken by
+the UPDATE serializes concurrent entries for the same user), reads the new
+balance back and appends a Transaction with it as ``balance_after``.  Saving
+the Transaction updates the user's LedgerTotals, so the balance and summary
+endpoints read single rows.
+
+``manage.py verify_ledger`` replays the ledger user by user and reports
+entries whose ``balance_after`` does not follow from the previous one,
+balances that differ from the last entry and drifted totals.
+"""
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from users.cache import invalidate_user
+from users.models import User
+
+from .models import LedgerTotals, Transaction
+
+
+def post_entry(user_id, transaction_type, amount, payment=None, procurement=None, description=''):
+    """Apply ``amount`` to the user's balance and append the Transaction; returns it"""
+    amount = Decimal(amount)
+    with db_transaction.atomic():
+        users = User.objects.filter(pk=user_id)
+        if not users.update(balance=F('balance') + amount, updated_at=timezone.now()):
+            raise User.DoesNotExist(f"User {user_id} does not exist")
+        balance = users.values_list('balance', flat=True).get()
+        entry = Transaction.objects.create(
+            user_id=user_id,
+            transaction_type=transaction_type,
+            amount=amount,
+            balance_after=balance,
+            payment=payment,
+            procurement=procurement,
+            description=description,
+        )
+        invalidate_user(user_id)
+    return entry
+
+
+def adjustment_type(amount):
+    """Transaction type of a manual balance adjustment"""
+    return Transaction.TransactionType.BONUS if amount > 0 else Transaction.TransactionType.WITHDRAWAL
+
+
+def get_totals(user_id):
+    """The user's LedgerTotals, or an unsaved zero row if they have no entries"""
+    return LedgerTotals.objects.filter(user_id=user_id).first() or LedgerTotals(user_id=user_id)
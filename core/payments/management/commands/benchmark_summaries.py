@@ -0,0 +1,194 @@
+"""
+Management command benchmarking the summary endpoints' queries.
+
+Run with:
+    python manage.py benchmark_summaries --seed 1000000
+
+Times each summary variant --repeat times and reports its query count and
+median / worst latency:
+
+- admin payment summary: the previous total aggregate plus two GROUP BYs
+  against payments.summaries.payment_summary (one conditional-aggregation
+  query) and a cached_payment_summary hit
+- transaction summary of one user: the previous three aggregates, count and
+  user fetch against a single conditional-aggregation query and the
+  LedgerTotals row the endpoint reads
+
+--seed N first inserts N payments and N transactions of one benchmark user
+(in batches, bypassing the ledger) and rolls them back when done, so it can
+run against a development database.  Without it the existing rows are used.
+"""
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.test.utils import CaptureQueriesContext
+
+from payments.models import LedgerTotals, Payment, Transaction
+from payments.summaries import bump_summary_version, cached_payment_summary, payment_summary
+from users.models import User
+
+SEED_BATCH = 10000
+SPENT_TYPES = [Transaction.TransactionType.WITHDRAWAL, Transaction.TransactionType.PROCUREMENT_JOIN]
+
+
+def payment_summary_before(queryset):
+    total = queryset.aggregate(count=Count('id'), total_amount=Sum('amount'))
+    by_status = {
+        row['status']: {'count': row['count'], 'total': row['total']}
+        for row in queryset.values('status').annotate(count=Count('id'), total=Sum('amount'))
+    }
+    by_type = {
+        row['payment_type']: {'count': row['count'], 'total': row['total']}
+        for row in queryset.values('payment_type').annotate(count=Count('id'), total=Sum('amount'))
+    }
+    return total, by_status, by_type
+
+
+def transaction_summary_before(user_id):
+    transactions = Transaction.objects.filter(user_id=user_id)
+    deposits = transactions.filter(
+        transaction_type=Transaction.TransactionType.DEPOSIT
+    ).aggregate(total=Sum('amount'))['total']
+    withdrawals = transactions.filter(transaction_type__in=SPENT_TYPES).aggregate(total=Sum('amount'))['total']
+    refunds = transactions.filter(
+        transaction_type=Transaction.TransactionType.PROCUREMENT_REFUND
+    ).aggregate(total=Sum('amount'))['total']
+    user = User.objects.filter(id=user_id).first()
+    return user, deposits, withdrawals, refunds, transactions.count()
+
+
+def transaction_summary_conditional(user_id):
+    return Transaction.objects.filter(user_id=user_id).aggregate(
+        deposited=Sum('amount', filter=Q(transaction_type=Transaction.TransactionType.DEPOSIT)),
+        spent=Sum('amount', filter=Q(transaction_type__in=SPENT_TYPES)),
+        refunded=Sum('amount', filter=Q(transaction_type=Transaction.TransactionType.PROCUREMENT_REFUND)),
+        count=Count('id'),
+    )
+
+
+def transaction_summary_ledger(user_id):
+    user = User.objects.filter(id=user_id).select_related('ledger_totals').first()
+    return user, getattr(user, 'ledger_totals', None)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare query counts and latency of the summary endpoints before and after"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Payments and transactions to insert (rolled back afterwards)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Timed runs per variant",
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            help="User whose transaction summary is timed (default: the seeded user or the busiest one)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user_id = options["user"]
+                if options["seed"]:
+                    user_id = user_id or self._seed(options["seed"])
+                user_id = user_id or self._busiest_user()
+                self._run(user_id, options["repeat"])
+                if options["seed"]:
+                    raise Rollback
+        except Rollback:
+            # Drop the summary cached from the seeded rows
+            bump_summary_version()
+            self.stdout.write("Seeded rows rolled back.")
+
+        self.stdout.write(self.style.SUCCESS("\nDone."))
+
+    def _run(self, user_id, repeat):
+        payments = Payment.objects.all()
+        cached_payment_summary(payments, {})
+
+        variants = [
+            ('payment summary: before', lambda: payment_summary_before(payments)),
+            ('payment summary: conditional', lambda: payment_summary(payments)),
+            ('payment summary: cached', lambda: cached_payment_summary(payments, {})),
+        ]
+        if user_id:
+            variants += [
+                ('transaction summary: before', lambda: transaction_summary_before(user_id)),
+                ('transaction summary: conditional', lambda: transaction_summary_conditional(user_id)),
+                ('transaction summary: ledger row', lambda: transaction_summary_ledger(user_id)),
+            ]
+
+        self.stdout.write(f"{'variant':<36} {'queries':>7} {'median ms':>10} {'max ms':>10}")
+        for name, run in variants:
+            with CaptureQueriesContext(connection) as ctx:
+                run()
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(
+                f"{name:<36} {len(ctx.captured_queries):>7} "
+                f"{statistics.median(timings):>10.2f} {max(timings):>10.2f}"
+            )
+
+    def _busiest_user(self):
+        return (
+            Transaction.objects.values('user_id').annotate(n=Count('id'))
+            .order_by('-n').values_list('user_id', flat=True).first()
+        )
+
+    def _seed(self, count):
+        user = User.objects.create(platform_user_id=f'benchmark-{uuid.uuid4().hex}')
+        statuses = Payment.Status.values
+        payment_types = Payment.PaymentType.values
+        transaction_types = Transaction.TransactionType.values
+
+        for offset in range(0, count, SEED_BATCH):
+            size = min(SEED_BATCH, count - offset)
+            Payment.objects.bulk_create(
+                Payment(
+                    user=user,
+                    payment_type=payment_types[i % len(payment_types)],
+                    status=statuses[i % len(statuses)],
+                    amount=Decimal(100 + i % 900),
+                )
+                for i in range(offset, offset + size)
+            )
+            Transaction.objects.bulk_create(
+                Transaction(
+                    user=user,
+                    transaction_type=transaction_types[i % len(transaction_types)],
+                    amount=Decimal(i % 500 - 250),
+                    balance_after=Decimal('0'),
+                )
+                for i in range(offset, offset + size)
+            )
+            self.stdout.write(f"  ...seeded {offset + size} of {count}")
+
+        totals = transaction_summary_conditional(user.id)
+        LedgerTotals.objects.create(
+            user=user,
+            deposited=totals['deposited'] or 0,
+            spent=totals['spent'] or 0,
+            refunded=totals['refunded'] or 0,
+            transaction_count=totals['count'],
+        )
+        return user.id
@@ -0,0 +1,79 @@
+"""
+Management command reconciling pending Tochka payments with the bank.
+
+Run with:
+    python manage.py reconcile_tochka_payments
+
+Checks due pending payments in batches, oldest first, querying Cyclops
+concurrently under a rate limit and applying status changes (see
+payments.reconciliation).  A payment's next check is pushed back as it ages.
+Polls every --poll-interval seconds when nothing is due; use --once to check
+what is due and exit (e.g. from cron).
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.reconciliation import BATCH_SIZE, CONCURRENCY, RATE_PER_SECOND, reconcile_batch
+from payments.tochka_client import AIOHTTP_AVAILABLE, AsyncTochkaCyclopsClient
+
+
+class Command(BaseCommand):
+    help = "Refresh pending Tochka payments from the bank"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Payments checked per round",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=CONCURRENCY,
+            help="Status requests in flight",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=RATE_PER_SECOND,
+            help="Status requests started per second",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5.0,
+            help="Seconds to wait when no payment is due",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no payment is due",
+        )
+
+    def handle(self, *args, **options):
+        if not AIOHTTP_AVAILABLE:
+            raise CommandError("aiohttp is required")
+        client = AsyncTochkaCyclopsClient()
+        if not client.is_configured:
+            raise CommandError("Tochka Cyclops is not configured")
+
+        checked, changed = 0, 0
+        try:
+            while True:
+                payments, updated = reconcile_batch(
+                    client, options["batch_size"], options["concurrency"], options["rate"]
+                )
+                if not payments:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+                checked += len(payments)
+                changed += len(updated)
+                self.stdout.write(f"  ...{len(payments)} payments: {len(updated)} changed")
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted.")
+
+        self.stdout.write(self.style.SUCCESS(f"\nDone. Checked {checked} payments, {changed} changed."))
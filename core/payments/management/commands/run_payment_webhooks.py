@@ -0,0 +1,66 @@
+"""
+Management command draining the payment webhook inbox.
+
+Run with:
+    python manage.py run_payment_webhooks
+
+The webhook endpoints only store provider notifications; this worker applies
+them to payments and balances in batches (see payments.webhooks).  Batches
+are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several workers can
+run side by side.  Polls every --poll-interval seconds when the inbox is
+empty; use --once to drain it and exit (e.g. from cron).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.models import WebhookEvent
+from payments.webhooks import BATCH_SIZE, process_batch
+
+
+class Command(BaseCommand):
+    help = "Apply pending payment webhook events"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Events applied per transaction",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the inbox is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the inbox is empty",
+        )
+
+    def handle(self, *args, **options):
+        counts = {status: 0 for status in WebhookEvent.Status.values}
+
+        try:
+            while True:
+                events = process_batch(options["batch_size"])
+                if not events:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+                for event in events:
+                    counts[event.status] += 1
+                self.stdout.write(f"  ...{len(events)} events")
+                if options["once"] and all(event.status == WebhookEvent.Status.PENDING for event in events):
+                    # Only failing events left; they are retried on the next run
+                    break
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\nDone. Processed {counts['processed']}, ignored {counts['ignored']}, "
+            f"failed {counts['failed']}, retrying {counts['pending']}."
+        ))
@@ -0,0 +1,122 @@
+"""
+Management command verifying the balance ledger.
+
+Run with:
+    python manage.py verify_ledger
+
+Replays every user's transactions in id order, --chunk-size users at a time
+(one streamed query per chunk), and reports:
+
+- chain: an entry whose balance_after is not the previous entry's
+  balance_after plus its amount
+- balance: a user whose balance differs from their last balance_after
+- totals: LedgerTotals that differ from the replayed running totals
+
+Use --fix to rewrite drifted LedgerTotals from the replay; balances and
+entries are only reported.
+"""
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from payments.models import LedgerTotals, Transaction
+from users.models import User
+
+TOTAL_FIELDS = ('deposited', 'spent', 'refunded', 'transaction_count', 'last_transaction_id')
+
+
+class Command(BaseCommand):
+    help = "Replay the balance ledger and report mismatches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Users replayed per query",
+        )
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Rewrite LedgerTotals that differ from the replay",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        counts = {'users': 0, 'entries': 0, 'chain': 0, 'balance': 0, 'totals': 0, 'fixed': 0}
+
+        last_user_id = 0
+        while True:
+            balances = dict(
+                User.objects.filter(id__gt=last_user_id).order_by('id')
+                .values_list('id', 'balance')[:chunk_size]
+            )
+            if not balances:
+                break
+            last_user_id = max(balances)
+            counts['users'] += len(balances)
+            self._verify_chunk(balances, counts, options["fix"])
+
+        self.stdout.write(
+            f"Replayed {counts['entries']} entries of {counts['users']} users: "
+            f"{counts['chain']} chain, {counts['balance']} balance, "
+            f"{counts['totals']} totals mismatches."
+        )
+        suffix = f" Fixed {counts['fixed']} totals." if options["fix"] else ""
+        self.stdout.write(self.style.SUCCESS(f"\nDone.{suffix}"))
+
+    def _verify_chunk(self, balances, counts, fix):
+        replayed = {}
+        last_balance = {}
+        entries = (
+            Transaction.objects.filter(user_id__in=balances).order_by('user_id', 'id')
+            .values_list('id', 'user_id', 'transaction_type', 'amount', 'balance_after')
+            .iterator(chunk_size=2000)
+        )
+        for entry_id, user_id, transaction_type, amount, balance_after in entries:
+            counts['entries'] += 1
+            previous = last_balance.get(user_id)
+            if previous is not None and previous + amount != balance_after:
+                counts['chain'] += 1
+                self.stdout.write(
+                    f"  chain: transaction {entry_id} of user {user_id}: "
+                    f"{previous} + {amount} != {balance_after}"
+                )
+            last_balance[user_id] = balance_after
+
+            totals = replayed.setdefault(user_id, LedgerTotals(
+                user_id=user_id, deposited=Decimal('0'), spent=Decimal('0'), refunded=Decimal('0'),
+            ))
+            totals.transaction_count += 1
+            totals.last_transaction_id = entry_id
+            column = LedgerTotals.COLUMNS.get(transaction_type)
+            if column:
+                setattr(totals, column, getattr(totals, column) + amount)
+
+        for user_id, balance in last_balance.items():
+            if balance != balances[user_id]:
+                counts['balance'] += 1
+                self.stdout.write(
+                    f"  balance: user {user_id} has {balances[user_id]}, ledger ends at {balance}"
+                )
+
+        stored = {totals.user_id: totals for totals in LedgerTotals.objects.filter(user_id__in=balances)}
+        drifted = []
+        for user_id in balances:
+            expected = replayed.get(user_id)
+            current = stored.get(user_id)
+            if expected is None and current is None:
+                continue
+            expected = expected or LedgerTotals(user_id=user_id)
+            if current is not None and all(
+                getattr(current, field) == getattr(expected, field) for field in TOTAL_FIELDS
+            ):
+                continue
+            counts['totals'] += 1
+            self.stdout.write(f"  totals: user {user_id} drifted")
+            drifted.append(expected)
+
+        if fix and drifted:
+            LedgerTotals.objects.filter(user_id__in=[totals.user_id for totals in drifted]).delete()
+            LedgerTotals.objects.bulk_create(drifted)
+            counts['fixed'] += len(drifted)
@@ -0,0 +1,62 @@
+"""
+Migration: 0004_webhook_inbox
+Adds the payment webhook inbox (payment_webhook_events), deduplicated on
+(provider, event_id), and indexes payments.order_id for Tochka webhook
+lookups.
+"""
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_payment_paid_at_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='order_id',
+            field=models.CharField(
+                blank=True, db_index=True, help_text='Order ID for Tochka Cyclops', max_length=100
+            ),
+        ),
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(
+                    choices=[('tochka', 'Tochka Bank (Cyclops)'), ('yookassa', 'YooKassa (Legacy)')],
+                    max_length=50,
+                )),
+                ('event_id', models.CharField(max_length=255)),
+                ('event_type', models.CharField(blank=True, max_length=100)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(
+                    choices=[
+                        ('pending', 'Pending'), ('processed', 'Processed'),
+                        ('ignored', 'Ignored'), ('failed', 'Failed'),
+                    ],
+                    db_index=True, default='pending', max_length=20,
+                )),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error_message', models.TextField(blank=True, default='')),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('payment', models.ForeignKey(
+                    blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL,
+                    related_name='webhook_events', to='payments.payment',
+                )),
+            ],
+            options={
+                'db_table': 'payment_webhook_events',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='webhookevent',
+            constraint=models.UniqueConstraint(
+                fields=('provider', 'event_id'), name='webhook_event_provider_uniq'
+            ),
+        ),
+    ]
@@ -0,0 +1,66 @@
+"""
+Migration: 0005_ledger_totals
+Adds per-user running ledger totals (ledger_totals), maintained by
+Transaction.save(), and fills them from the existing transactions with one
+grouped query.
+"""
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+# Transaction type -> running total column (LedgerTotals.COLUMNS)
+COLUMNS = {
+    'deposit': 'deposited',
+    'withdrawal': 'spent',
+    'procurement_join': 'spent',
+    'procurement_refund': 'refunded',
+}
+
+
+def backfill_totals(apps, schema_editor):
+    Transaction = apps.get_model('payments', 'Transaction')
+    LedgerTotals = apps.get_model('payments', 'LedgerTotals')
+
+    totals = {}
+    grouped = (
+        Transaction.objects.order_by().values_list('user_id', 'transaction_type')
+        .annotate(total=Sum('amount'), count=Count('id'), last_id=Max('id'))
+    )
+    for user_id, transaction_type, total, count, last_id in grouped:
+        row = totals.setdefault(user_id, LedgerTotals(user_id=user_id, last_transaction_id=last_id))
+        row.transaction_count += count
+        row.last_transaction_id = max(row.last_transaction_id, last_id)
+        column = COLUMNS.get(transaction_type)
+        if column:
+            setattr(row, column, getattr(row, column) + total)
+    LedgerTotals.objects.bulk_create(totals.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_webhook_inbox'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerTotals',
+            fields=[
+                ('user', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE, primary_key=True,
+                    related_name='ledger_totals', serialize=False, to='users.user',
+                )),
+                ('deposited', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('spent', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunded', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('last_transaction_id', models.BigIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'ledger_totals',
+            },
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
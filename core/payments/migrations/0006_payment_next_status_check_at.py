@@ -0,0 +1,26 @@
+"""
+Migration: 0006_payment_next_status_check_at
+Adds the schedule of the pending-payment reconciliation worker, with a
+(status, next_status_check_at) index for selecting due payments.
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_ledger_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='next_status_check_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        # Kept out of Payment.Meta.indexes, whose names must match 0001 (issue #204)
+        migrations.RunSQL(
+            'CREATE INDEX payments_status_check_idx ON payments (status, next_status_check_at)',
+            'DROP INDEX payments_status_check_idx',
+        ),
+    ]
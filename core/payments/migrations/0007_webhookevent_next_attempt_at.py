@@ -0,0 +1,21 @@
+"""
+Migration: 0007_webhookevent_next_attempt_at
+Adds the retry schedule of webhook inbox events, so an event that failed is
+retried with exponential backoff instead of at the head of every batch.
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_payment_next_status_check_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookevent',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -2,7 +2,9 @@
 Payment models for GroupBuy Bot
 Supports Tochka Bank Cyclops and YooKassa (legacy) integration
 """
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
 from users.models import User
 from procurements.models import Procurement
 
@@ -35,7 +37,10 @@ class Payment(models.Model):
     external_id = models.CharField(max_length=100, unique=True, blank=True, null=True)
     provider = models.CharField(max_length=50, choices=Provider.choices, default=Provider.TOCHKA)
     confirmation_url = models.URLField(blank=True)
-    order_id = models.CharField(max_length=100, blank=True, help_text='Order ID for Tochka Cyclops')
+    # Indexed: Tochka webhooks look payments up by order ID
+    order_id = models.CharField(
+        max_length=100, blank=True, db_index=True, help_text='Order ID for Tochka Cyclops'
+    )
 
     # Related procurement (if payment is for procurement)
     procurement = models.ForeignKey(
@@ -47,6 +52,9 @@ class Payment(models.Model):
     metadata = models.JSONField(default=dict)
 
     paid_at = models.DateTimeField(null=True, blank=True)
+    # When the reconciliation worker next asks the provider about this
+    # pending payment; pushed back as the payment ages (payments.reconciliation)
+    next_status_check_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -62,6 +70,17 @@ class Payment(models.Model):
     def __str__(self):
         return f"{self.payment_type} - {self.amount} - {self.status}"
 
+    def save(self, *args, **kwargs):
+        from .summaries import bump_summary_version
+        super().save(*args, **kwargs)
+        bump_summary_version()
+
+    def delete(self, *args, **kwargs):
+        from .summaries import bump_summary_version
+        result = super().delete(*args, **kwargs)
+        bump_summary_version()
+        return result
+
     @property
     def status_display(self):
         return dict(self.Status.choices).get(self.status, self.status)
@@ -106,3 +125,112 @@ class Transaction(models.Model):
     def __str__(self):
         sign = '+' if self.amount > 0 else ''
         return f"{self.user} {sign}{self.amount} ({self.transaction_type})"
+
+    def save(self, *args, **kwargs):
+        # The ledger is append-only: only new entries move the running totals
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                LedgerTotals.record(self)
+
+
+class LedgerTotals(models.Model):
+    """Running totals of a user's ledger, maintained by Transaction.save().
+
+    Each new Transaction adds its amount to the column of its type with an
+    F() update, so balance and summary endpoints read one row instead of
+    aggregating the user's history.  Amounts keep their sign (spending is
+    usually negative); readers report absolute values.
+    ``manage.py verify_ledger`` replays the ledger and repairs drift.
+    """
+
+    # Transaction type -> running total column
+    COLUMNS = {
+        'deposit': 'deposited',
+        'withdrawal': 'spent',
+        'procurement_join': 'spent',
+        'procurement_refund': 'refunded',
+    }
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name='ledger_totals'
+    )
+    deposited = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunded = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+    # Newest Transaction included in the totals
+    last_transaction_id = models.BigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ledger_totals'
+
+    def __str__(self):
+        return f"Ledger totals of {self.user_id}"
+
+    @classmethod
+    def record(cls, entry):
+        """Add one new Transaction to its user's totals"""
+        column = cls.COLUMNS.get(entry.transaction_type)
+        deltas = {
+            'transaction_count': F('transaction_count') + 1,
+            'last_transaction_id': entry.pk,
+            'updated_at': timezone.now(),
+        }
+        if column:
+            deltas[column] = F(column) + entry.amount
+        totals = cls.objects.filter(user_id=entry.user_id)
+        if totals.update(**deltas):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    user_id=entry.user_id, transaction_count=1, last_transaction_id=entry.pk,
+                    **({column: entry.amount} if column else {}),
+                )
+        except IntegrityError:
+            totals.update(**deltas)
+
+
+class WebhookEvent(models.Model):
+    """Payment provider notification waiting in the webhook inbox.
+
+    The webhook endpoints only store the event (INSERT ... ON CONFLICT DO
+    NOTHING on provider + event_id, so provider retries are dropped) and
+    acknowledge; ``manage.py run_payment_webhooks`` applies it to the payment
+    (see payments.webhooks).  An event that fails, or whose payment is not
+    found yet, stays pending until ``next_attempt_at``.
+    Status flow: pending → processed | ignored | failed
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        PROCESSED = 'processed', 'Processed'
+        IGNORED = 'ignored', 'Ignored'
+        FAILED = 'failed', 'Failed'
+
+    provider = models.CharField(max_length=50, choices=Payment.Provider.choices)
+    event_id = models.CharField(max_length=255)
+    event_type = models.CharField(max_length=100, blank=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    error_message = models.TextField(blank=True, default='')
+    payment = models.ForeignKey(
+        Payment, on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='webhook_events'
+    )
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'payment_webhook_events'
+        constraints = [
+            models.UniqueConstraint(fields=['provider', 'event_id'], name='webhook_event_provider_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.provider} {self.event_type} {self.event_id} [{self.status}]"
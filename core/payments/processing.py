@@ -0,0 +1,78 @@
+"""
+Balance side effects of payment status changes.
+
+Shared by the API (simulate_success, status polling) and the webhook inbox
+worker (payments.webhooks).  Each function runs in one transaction: the
+payment row and the ledger entry (payments.ledger) change together.
+"""
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from .ledger import post_entry
+from .models import Payment, Transaction
+
+
+def process_successful_payment(payment, payment_object):
+    """Mark the payment succeeded and credit the user's balance"""
+    with db_transaction.atomic():
+        payment.status = Payment.Status.SUCCEEDED
+        payment.paid_at = timezone.now()
+        payment.save(update_fields=['status', 'paid_at', 'updated_at'])
+
+        post_entry(
+            payment.user_id, Transaction.TransactionType.DEPOSIT, payment.amount,
+            payment=payment, description=f'Deposit: {payment.description}',
+        )
+
+
+def process_refund(payment, refund_object):
+    """Mark the payment refunded and debit the refunded amount"""
+    with db_transaction.atomic():
+        # Get refund amount from object
+        if 'amount' in refund_object:
+            if isinstance(refund_object['amount'], dict):
+                refund_amount = Decimal(str(refund_object['amount'].get('value', 0)))
+            else:
+                refund_amount = Decimal(str(refund_object['amount']))
+        else:
+            refund_amount = payment.amount
+
+        payment.status = Payment.Status.REFUNDED
+        payment.save(update_fields=['status', 'updated_at'])
+
+        post_entry(
+            payment.user_id, Transaction.TransactionType.WITHDRAWAL, -refund_amount,
+            payment=payment, description=f'Refund: {payment.description}',
+        )
+
+
+def cancel_payment(payment):
+    """Mark the payment cancelled"""
+    payment.status = Payment.Status.CANCELLED
+    payment.save()
+
+
+def apply_provider_status(payment, new_status, payment_object):
+    """Move the payment to the status reported by the provider.
+
+    Call with the payment row locked (select_for_update).  Returns '' when
+    the transition was applied, otherwise why it was skipped: reports for a
+    payment that is already past that state are not applied twice.
+    """
+    if new_status == Payment.Status.SUCCEEDED:
+        if payment.status in (Payment.Status.SUCCEEDED, Payment.Status.REFUNDED):
+            return f'Payment already {payment.status}'
+        process_successful_payment(payment, payment_object)
+    elif new_status == Payment.Status.CANCELLED:
+        if payment.status not in (Payment.Status.PENDING, Payment.Status.WAITING_FOR_CAPTURE):
+            return f'Payment already {payment.status}'
+        cancel_payment(payment)
+    elif new_status == Payment.Status.REFUNDED:
+        if payment.status != Payment.Status.SUCCEEDED:
+            return f'Cannot refund a {payment.status} payment'
+        process_refund(payment, payment_object)
+    else:
+        return f'Payment is {new_status} at the provider'
+    return ''
@@ -0,0 +1,139 @@
+"""
+Reconciliation of pending Tochka payments with the bank.
+
+``PaymentViewSet.status`` only reads the database; ``manage.py
+reconcile_tochka_payments`` keeps pending Tochka payments current instead.
+Each round the worker:
+
+1. claims due payments (``next_status_check_at`` unset or passed), oldest
+   first, with ``SELECT ... FOR UPDATE SKIP LOCKED`` and pushes their next
+   check back by :func:`check_interval` of their age, so young payments are
+   polled often and old ones rarely; the new time also leases the payment
+   against other workers
+2. asks Cyclops for their status concurrently through
+   ``AsyncTochkaCyclopsClient``, at most ``TOCHKA_RECONCILE_CONCURRENCY``
+   requests in flight and ``TOCHKA_RECONCILE_RATE`` started per second
+   (no database access while waiting on the bank)
+3. applies changed statuses with ``processing.apply_provider_status`` under a
+   row lock, so a webhook handled meanwhile is not applied twice
+"""
+import asyncio
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Payment
+from .processing import apply_provider_status
+from .tochka_client import TochkaCyclopsError
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'TOCHKA_RECONCILE_BATCH_SIZE', 100)
+CONCURRENCY = getattr(settings, 'TOCHKA_RECONCILE_CONCURRENCY', 8)
+RATE_PER_SECOND = getattr(settings, 'TOCHKA_RECONCILE_RATE', 10)
+MIN_INTERVAL = timedelta(seconds=getattr(settings, 'TOCHKA_RECONCILE_MIN_INTERVAL_SECONDS', 30))
+MAX_INTERVAL = timedelta(seconds=getattr(settings, 'TOCHKA_RECONCILE_MAX_INTERVAL_SECONDS', 3600))
+
+
+def check_interval(age):
+    """Delay before re-checking a payment created ``age`` ago: a quarter of its age, clamped"""
+    return min(max(age / 4, MIN_INTERVAL), MAX_INTERVAL)
+
+
+def due_payments(now=None):
+    """Pending Tochka payments whose status should be checked now"""
+    now = now or timezone.now()
+    return Payment.objects.filter(
+        Q(next_status_check_at__isnull=True) | Q(next_status_check_at__lte=now),
+        status=Payment.Status.PENDING,
+        provider=Payment.Provider.TOCHKA,
+        external_id__isnull=False,
+    ).exclude(external_id='')
+
+
+def claim_payments(limit):
+    """Schedule the next check of up to ``limit`` due payments and return them"""
+    now = timezone.now()
+    with transaction.atomic():
+        payments = list(
+            due_payments(now).select_for_update(skip_locked=True).order_by('created_at')[:limit]
+        )
+        for payment in payments:
+            payment.next_status_check_at = now + check_interval(now - payment.created_at)
+        Payment.objects.bulk_update(payments, ['next_status_check_at'])
+    return payments
+
+
+class RateLimiter:
+    """Spaces call starts at least ``1 / rate`` seconds apart"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+async def fetch_statuses(client, external_ids, concurrency=CONCURRENCY, rate=RATE_PER_SECOND):
+    """{external_id: status result or None on error}, fetched concurrently"""
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate)
+
+    async def fetch(external_id):
+        async with semaphore:
+            await limiter.wait()
+            try:
+                return external_id, await client.aget_payment_status(external_id)
+            except TochkaCyclopsError as e:
+                logger.warning(f"Tochka status check of {external_id} failed: {e}")
+                return external_id, None
+
+    return dict(await asyncio.gather(*(fetch(external_id) for external_id in external_ids)))
+
+
+def apply_statuses(payments, results):
+    """Apply the statuses reported by the bank; returns the payments changed"""
+    changed = []
+    for payment in payments:
+        result = results.get(payment.external_id)
+        if result is None or result['status'] == Payment.Status.PENDING:
+            continue
+        with transaction.atomic():
+            locked = Payment.objects.select_for_update().get(pk=payment.pk)
+            note = apply_provider_status(locked, result['status'], result['raw'])
+        if note:
+            logger.info(f"Reconciliation skipped payment {payment.id}: {note}")
+        else:
+            logger.info(f"Reconciled Tochka payment {payment.id}: {result['status']}")
+            changed.append(locked)
+    return changed
+
+
+def reconcile_batch(client, limit=BATCH_SIZE, concurrency=CONCURRENCY, rate=RATE_PER_SECOND):
+    """One round; returns (payments checked, payments changed)"""
+    payments = claim_payments(limit)
+    if not payments:
+        return [], []
+
+    async def fetch():
+        # The aiohttp session belongs to this round's event loop
+        try:
+            return await fetch_statuses(
+                client, [payment.external_id for payment in payments], concurrency, rate
+            )
+        finally:
+            await client.aclose()
+
+    return payments, apply_statuses(payments, asyncio.run(fetch()))
@@ -0,0 +1,114 @@
+"""
+Payment summaries for the admin API.
+
+:func:`payment_summary` computes the totals and the per-status and per-type
+breakdowns of a payment queryset in one conditional-aggregation query
+(``Count``/``Sum`` with ``filter=Q(...)`` per choice) instead of a total
+aggregate plus one GROUP BY per breakdown.
+
+:func:`cached_payment_summary` keeps the result for
+``PAYMENT_SUMMARY_CACHE_TTL`` seconds under the current summary version,
+which ``Payment.save`` / ``Payment.delete`` replace (now and again after
+commit), so an admin sees a payment change on the next request.  Queryset
+``update()`` calls skip that; the TTL bounds how long they go unseen.
+
+The per-user balance and transaction summaries read the user's
+``LedgerTotals`` row (payments.ledger) and need no aggregation.
+
+``manage.py benchmark_summaries`` compares both against the previous
+multi-query versions.
+"""
+import hashlib
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .models import Payment
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_CACHE_TTL = getattr(settings, 'PAYMENT_SUMMARY_CACHE_TTL', 30)
+VERSION_KEY = 'payments:summary:version'
+
+# (response key, model field, choices) of each breakdown
+BREAKDOWNS = (
+    ('by_status', 'status', Payment.Status.values),
+    ('by_type', 'payment_type', Payment.PaymentType.values),
+)
+
+
+def _aggregates():
+    aggregates = {'count': Count('id'), 'total_amount': Sum('amount')}
+    for _, field, values in BREAKDOWNS:
+        for value in values:
+            match = Q(**{field: value})
+            aggregates[f'{field}:{value}:count'] = Count('id', filter=match)
+            aggregates[f'{field}:{value}:total'] = Sum('amount', filter=match)
+    return aggregates
+
+
+def payment_summary(queryset):
+    """Totals plus per-status and per-type breakdowns of ``queryset``, in one query"""
+    row = queryset.aggregate(**_aggregates())
+    summary = {'total_count': row['count'], 'total_amount': row['total_amount'] or 0}
+    for key, field, values in BREAKDOWNS:
+        # Like a GROUP BY, only values that occur are listed
+        summary[key] = {
+            value: {'count': row[f'{field}:{value}:count'], 'total': row[f'{field}:{value}:total']}
+            for value in values
+            if row[f'{field}:{value}:count']
+        }
+    return summary
+
+
+def _set_version():
+    try:
+        cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+    except Exception as e:
+        logger.warning(f"Payment summary cache invalidation failed: {e}")
+
+
+def bump_summary_version():
+    """Start a new summary version, now and again after commit"""
+    _set_version()
+    transaction.on_commit(_set_version)
+
+
+def summary_version():
+    """Current summary version token"""
+    try:
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not cache.add(VERSION_KEY, version, None):
+                version = cache.get(VERSION_KEY) or version
+        return version
+    except Exception as e:
+        logger.warning(f"Payment summary cache read failed: {e}")
+        return None
+
+
+def cached_payment_summary(queryset, filters):
+    """payment_summary of ``queryset``, cached per summary version and ``filters`` (the params that built it)"""
+    version = summary_version()
+    if version is None:
+        return payment_summary(queryset)
+
+    digest = hashlib.md5(repr(sorted(filters.items())).encode()).hexdigest()
+    key = f'payments:summary:{version}:{digest}'
+    try:
+        summary = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Payment summary cache read failed for {key}: {e}")
+        summary = None
+    if summary is None:
+        summary = payment_summary(queryset)
+        try:
+            cache.set(key, summary, SUMMARY_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Payment summary cache write failed for {key}: {e}")
+    return summary
@@ -5,10 +5,23 @@ Cyclops is Tochka Bank's service for nominal accounts used by online platforms.
 This client handles payment operations through the Cyclops API.
 
 Documentation: https://docs.tochka.com/cyclops
+
+All threads share the client's keep-alive ``requests.Session`` (connection
+pool of ``TOCHKA_POOL_SIZE``), so API calls after the first skip the TCP/TLS
+handshake.  GETs are retried with jittered exponential backoff; POSTs are
+never retried.  Call latencies are counted per endpoint in an in-process
+histogram (:func:`latency_stats`).  ``AsyncTochkaCyclopsClient`` offers
+aiohttp coroutines for the bot and workers.
 """
+import asyncio
+import base64
 import json
 import logging
+import random
+import threading
+import time
 import uuid
+from bisect import bisect_left
 from datetime import datetime
 from decimal import Decimal
 from typing import Optional, Dict
@@ -18,9 +31,67 @@ from django.conf import settings
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.backends import default_backend
+from requests.adapters import HTTPAdapter
+
+# aiohttp is optional; only AsyncTochkaCyclopsClient needs it.
+try:
+    import aiohttp
+
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+POOL_SIZE = getattr(settings, 'TOCHKA_POOL_SIZE', 10)
+TIMEOUT = getattr(settings, 'TOCHKA_TIMEOUT', 30)
+# GETs are retried on connection errors and these statuses; POSTs never are,
+# since Cyclops may have acted on a request whose response was lost
+GET_RETRIES = getattr(settings, 'TOCHKA_GET_RETRIES', 2)
+RETRY_BACKOFF_SECONDS = getattr(settings, 'TOCHKA_RETRY_BACKOFF_SECONDS', 0.2)
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+_latency_lock = threading.Lock()
+_latency = {}
+
+
+def record_latency(endpoint, seconds):
+    """Count one call of ``endpoint`` in its latency histogram"""
+    with _latency_lock:
+        stats = _latency.setdefault(endpoint, {'count': 0, 'total': 0.0, 'buckets': [0] * len(LATENCY_BUCKETS)})
+        stats['count'] += 1
+        stats['total'] += seconds
+        stats['buckets'][bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+
+def latency_stats():
+    """Per-endpoint call counts, mean and bucketed latency of this process"""
+    with _latency_lock:
+        return {
+            endpoint: {
+                'count': stats['count'],
+                'mean_seconds': round(stats['total'] / stats['count'], 4),
+                'buckets': {
+                    ('+Inf' if bound == float('inf') else str(bound)): count
+                    for bound, count in zip(LATENCY_BUCKETS, stats['buckets'])
+                },
+            }
+            for endpoint, stats in _latency.items()
+        }
+
+
+def reset_latency_stats():
+    with _latency_lock:
+        _latency.clear()
+
+
+def retry_delay(attempt):
+    """Jittered exponential backoff before retry number ``attempt`` (1-based)"""
+    return RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+
 
 class TochkaCyclopsError(Exception):
     """Exception for Tochka Cyclops API errors"""
@@ -47,8 +118,10 @@ class TochkaCyclopsClient:
         self.nominal_account = getattr(settings, 'TOCHKA_NOMINAL_ACCOUNT', '')
         self.platform_id = getattr(settings, 'TOCHKA_PLATFORM_ID', '')
         self.private_key_path = getattr(settings, 'TOCHKA_PRIVATE_KEY_PATH', '')
-        self.timeout = 30
+        self.timeout = TIMEOUT
         self._private_key = None
+        self._session = None
+        self._session_lock = threading.Lock()
 
     @property
     def is_configured(self) -> bool:
@@ -82,55 +155,94 @@ class TochkaCyclopsClient:
             padding.PKCS1v15(),
             hashes.SHA256()
         )
-        import base64
         return base64.b64encode(signature).decode('utf-8')
 
     def _generate_request_id(self) -> str:
         """Generate unique request ID"""
         return str(uuid.uuid4())
 
-    def _make_request(self, method: str, endpoint: str, data: Dict = None) -> Dict:
-        """Make authenticated request to Cyclops API"""
+    @property
+    def session(self) -> requests.Session:
+        """Keep-alive session shared by all threads (urllib3 pools are thread-safe)"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def _prepare_request(self, endpoint: str, data: Dict = None):
+        """URL, headers and signed body of an API request"""
         if not self.is_configured:
             raise TochkaCyclopsError("Tochka Cyclops is not configured")
 
-        url = f"{self.api_url}/{endpoint}"
-        request_id = self._generate_request_id()
-
         headers = {
             'Content-Type': 'application/json',
-            'X-Request-Id': request_id,
+            'X-Request-Id': self._generate_request_id(),
             'X-Platform-Id': self.platform_id,
         }
 
         body = json.dumps(data) if data else ''
         if body:
             headers['X-Signature'] = self._sign_request(body)
+        return f"{self.api_url}/{endpoint}", headers, body
 
+    @staticmethod
+    def _parse_response(status_code: int, content: bytes) -> Dict:
+        """Decoded response body; raises TochkaCyclopsError for API errors"""
         try:
-            response = requests.request(
-                method=method,
-                url=url,
-                headers=headers,
-                data=body if body else None,
-                timeout=self.timeout
+            payload = json.loads(content) if content else {}
+        except ValueError:
+            if status_code < 400:
+                raise TochkaCyclopsError("Invalid JSON in Tochka API response")
+            payload = {'raw': content[:500].decode('utf-8', 'replace')}
+        if status_code >= 400:
+            raise TochkaCyclopsError(
+                message=payload.get('message', 'API error'),
+                code=payload.get('code'),
+                details=payload
             )
+        return payload
 
-            logger.info(f"Tochka API request: {method} {endpoint}, status: {response.status_code}")
+    def _make_request(self, method: str, endpoint: str, data: Dict = None, name: str = None) -> Dict:
+        """Make authenticated request to Cyclops API
 
-            if response.status_code >= 400:
-                error_data = response.json() if response.content else {}
-                raise TochkaCyclopsError(
-                    message=error_data.get('message', 'API error'),
-                    code=error_data.get('code'),
-                    details=error_data
-                )
-
-            return response.json() if response.content else {}
+        ``name`` labels the latency histogram (default: ``endpoint`` without
+        its query string); pass a template such as ``payments/{id}`` for
+        endpoints containing IDs.
+        """
+        url, headers, body = self._prepare_request(endpoint, data)
+        name = f"{method} {name or endpoint.split('?')[0]}"
+        retries = GET_RETRIES if method == 'GET' else 0
 
-        except requests.RequestException as e:
-            logger.error(f"Tochka API request failed: {e}")
-            raise TochkaCyclopsError(f"Request failed: {e}")
+        for attempt in range(retries + 1):
+            started = time.monotonic()
+            try:
+                response = self.session.request(
+                    method=method,
+                    url=url,
+                    headers=headers,
+                    data=body if body else None,
+                    timeout=self.timeout
+                )
+            except requests.RequestException as e:
+                record_latency(name, time.monotonic() - started)
+                if attempt < retries:
+                    logger.warning(f"Tochka API request {name} failed, retrying: {e}")
+                    time.sleep(retry_delay(attempt + 1))
+                    continue
+                logger.error(f"Tochka API request failed: {e}")
+                raise TochkaCyclopsError(f"Request failed: {e}")
+
+            record_latency(name, time.monotonic() - started)
+            logger.info(f"Tochka API request: {method} {endpoint}, status: {response.status_code}")
+            if response.status_code in RETRY_STATUSES and attempt < retries:
+                time.sleep(retry_delay(attempt + 1))
+                continue
+            return self._parse_response(response.status_code, response.content)
 
     # ==========================================
     # Virtual Account Operations
@@ -168,32 +280,22 @@ class TochkaCyclopsClient:
 
     def get_virtual_account_balance(self, virtual_account_id: str) -> Decimal:
         """Get virtual account balance"""
-        result = self._make_request('GET', f'virtual-accounts/{virtual_account_id}/balance')
+        result = self._make_request(
+            'GET', f'virtual-accounts/{virtual_account_id}/balance', name='virtual-accounts/{id}/balance'
+        )
         return Decimal(str(result.get('availableBalance', 0)))
 
     # ==========================================
     # Payment Operations
     # ==========================================
 
-    def create_deposit_link(
-        self,
-        user_id: int,
-        amount: Decimal,
-        description: str = '',
-        return_url: str = ''
-    ) -> Dict:
-        """
-        Create a payment link for user to deposit funds
-
-        Returns a URL where user can make the payment.
-        """
-        order_id = f"DEP-{user_id}-{int(datetime.now().timestamp())}"
-
-        data = {
+    def _deposit_request(self, user_id: int, amount: Decimal, description: str, return_url: str) -> Dict:
+        """Request body of a deposit link"""
+        return {
             "nominalAccountNumber": self.nominal_account,
             "amount": str(amount),
             "currency": "RUB",
-            "orderId": order_id,
+            "orderId": f"DEP-{user_id}-{int(datetime.now().timestamp())}",
             "description": description or f"Deposit {amount} RUB",
             "participant": {
                 "externalId": str(user_id)
@@ -201,20 +303,34 @@ class TochkaCyclopsClient:
             "returnUrl": return_url or ""
         }
 
-        result = self._make_request('POST', 'payments/deposits', data)
-
+    @staticmethod
+    def _deposit_result(data: Dict, result: Dict) -> Dict:
         return {
             'payment_id': result.get('paymentId'),
-            'order_id': order_id,
+            'order_id': data['orderId'],
             'confirmation_url': result.get('paymentUrl'),
             'status': 'pending'
         }
 
-    def get_payment_status(self, payment_id: str) -> Dict:
-        """Get payment status from Cyclops"""
-        result = self._make_request('GET', f'payments/{payment_id}')
+    def create_deposit_link(
+        self,
+        user_id: int,
+        amount: Decimal,
+        description: str = '',
+        return_url: str = ''
+    ) -> Dict:
+        """
+        Create a payment link for user to deposit funds
 
-        # Map Cyclops status to our internal status
+        Returns a URL where user can make the payment.
+        """
+        data = self._deposit_request(user_id, amount, description, return_url)
+        result = self._make_request('POST', 'payments/deposits', data)
+        return self._deposit_result(data, result)
+
+    @staticmethod
+    def _payment_status(payment_id: str, result: Dict) -> Dict:
+        """Map a Cyclops payment to our internal status"""
         cyclops_status = result.get('status', '').lower()
         status_map = {
             'pending': 'pending',
@@ -234,6 +350,11 @@ class TochkaCyclopsClient:
             'raw': result
         }
 
+    def get_payment_status(self, payment_id: str) -> Dict:
+        """Get payment status from Cyclops"""
+        result = self._make_request('GET', f'payments/{payment_id}', name='payments/{id}')
+        return self._payment_status(payment_id, result)
+
     # ==========================================
     # Payout Operations
     # ==========================================
@@ -336,5 +457,81 @@ class TochkaCyclopsClient:
         return True
 
 
+class AsyncTochkaCyclopsClient(TochkaCyclopsClient):
+    """
+    Cyclops client with coroutine variants (``a``-prefixed) of the calls
+    used by the bot and the payment workers.
+
+    Requires aiohttp.  Holds one ``aiohttp.ClientSession`` (keep-alive pool of
+    ``TOCHKA_POOL_SIZE`` connections) bound to the event loop it was first
+    used in; close it with :meth:`aclose`.  Retries and latency histograms
+    work as in the synchronous client.
+    """
+
+    def __init__(self):
+        if not AIOHTTP_AVAILABLE:
+            raise TochkaCyclopsError("AsyncTochkaCyclopsClient requires aiohttp")
+        super().__init__()
+        self._async_session = None
+
+    def _get_async_session(self):
+        if self._async_session is None or self._async_session.closed:
+            self._async_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=POOL_SIZE),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._async_session
+
+    async def aclose(self):
+        if self._async_session is not None:
+            await self._async_session.close()
+            self._async_session = None
+
+    async def _amake_request(self, method: str, endpoint: str, data: Dict = None, name: str = None) -> Dict:
+        """Coroutine variant of _make_request"""
+        url, headers, body = self._prepare_request(endpoint, data)
+        name = f"{method} {name or endpoint.split('?')[0]}"
+        retries = GET_RETRIES if method == 'GET' else 0
+        session = self._get_async_session()
+
+        for attempt in range(retries + 1):
+            started = time.monotonic()
+            try:
+                async with session.request(method, url, headers=headers, data=body or None) as response:
+                    status_code, content = response.status, await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                record_latency(name, time.monotonic() - started)
+                if attempt < retries:
+                    logger.warning(f"Tochka API request {name} failed, retrying: {e}")
+                    await asyncio.sleep(retry_delay(attempt + 1))
+                    continue
+                logger.error(f"Tochka API request failed: {e}")
+                raise TochkaCyclopsError(f"Request failed: {e}")
+
+            record_latency(name, time.monotonic() - started)
+            logger.info(f"Tochka API request: {method} {endpoint}, status: {status_code}")
+            if status_code in RETRY_STATUSES and attempt < retries:
+                await asyncio.sleep(retry_delay(attempt + 1))
+                continue
+            return self._parse_response(status_code, content)
+
+    async def acreate_deposit_link(
+        self, user_id: int, amount: Decimal, description: str = '', return_url: str = ''
+    ) -> Dict:
+        data = self._deposit_request(user_id, amount, description, return_url)
+        result = await self._amake_request('POST', 'payments/deposits', data)
+        return self._deposit_result(data, result)
+
+    async def aget_payment_status(self, payment_id: str) -> Dict:
+        result = await self._amake_request('GET', f'payments/{payment_id}', name='payments/{id}')
+        return self._payment_status(payment_id, result)
+
+    async def aget_virtual_account_balance(self, virtual_account_id: str) -> Decimal:
+        result = await self._amake_request(
+            'GET', f'virtual-accounts/{virtual_account_id}/balance', name='virtual-accounts/{id}/balance'
+        )
+        return Decimal(str(result.get('availableBalance', 0)))
+
+
 # Singleton instance
 tochka_client = TochkaCyclopsClient()
@@ -6,20 +6,20 @@ import logging
 from decimal import Decimal
 from datetime import datetime
 
-from django.db import models
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.conf import settings
-from django.db import transaction as db_transaction
-from django.utils import timezone
 
-from .models import Payment, Transaction
+from .models import LedgerTotals, Payment, Transaction
+from .processing import process_refund, process_successful_payment
 from .serializers import (
     PaymentSerializer, CreatePaymentSerializer,
     TransactionSerializer
 )
+from .webhooks import record_event, tochka_event_id, yookassa_event_id
 from users.models import User
+from procurements.pagination import KeysetPagination
 
 logger = logging.getLogger(__name__)
 
@@ -132,19 +132,14 @@ class PaymentViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def status(self, request, pk=None):
-        """Get payment status"""
-        payment = self.get_object()
+        """Get payment status
 
-        # For Tochka payments, try to fetch fresh status from API
-        if payment.provider == Payment.Provider.TOCHKA and payment.status == Payment.Status.PENDING:
-            try:
-                from .tochka_client import tochka_client
-                if tochka_client.is_configured and payment.external_id:
-                    result = tochka_client.get_payment_status(payment.external_id)
-                    if result['status'] != payment.status:
-                        self._update_payment_status(payment, result['status'], result.get('paid_at'))
-            except Exception as e:
-                logger.warning(f"Failed to fetch Tochka payment status: {e}")
+        A pure database read: pending Tochka payments are refreshed from the
+        bank by `manage.py reconcile_tochka_payments` (see
+        payments.reconciliation; run by the django-worker service) and by
+        webhooks.
+        """
+        payment = self.get_object()
 
         return Response({
             'id': payment.id,
@@ -156,17 +151,13 @@ class PaymentViewSet(viewsets.ModelViewSet):
             'created_at': payment.created_at
         })
 
-    def _update_payment_status(self, payment, new_status: str, paid_at=None):
-        """Update payment status and process if succeeded"""
-        if new_status == Payment.Status.SUCCEEDED and payment.status != Payment.Status.SUCCEEDED:
-            self._process_successful_payment(payment, {})
-        elif new_status == Payment.Status.CANCELLED:
-            payment.status = Payment.Status.CANCELLED
-            payment.save()
-
     @action(detail=False, methods=['post'], url_path='webhook/tochka')
     def webhook_tochka(self, request):
-        """Handle Tochka Bank Cyclops webhook"""
+        """Handle Tochka Bank Cyclops webhook
+
+        The event is stored in the webhook inbox and applied by
+        `manage.py run_payment_webhooks` (see payments.webhooks).
+        """
         try:
             from .tochka_client import tochka_client
 
@@ -181,36 +172,17 @@ class PaymentViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_401_UNAUTHORIZED
                 )
 
-            event_type = request.data.get('eventType', '')
             payment_data = request.data.get('payment', {})
-            order_id = payment_data.get('orderId')
-
-            if not order_id:
+            if not payment_data.get('orderId'):
                 return Response(
                     {'error': 'Missing order ID'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            payment = Payment.objects.filter(order_id=order_id).first()
-            if not payment:
-                logger.warning(f"Payment not found for order {order_id}")
-                return Response(
-                    {'error': 'Payment not found'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-
-            # Process based on event type
-            if event_type in ['payment.completed', 'payment.succeeded']:
-                self._process_successful_payment(payment, payment_data)
-                logger.info(f"Tochka payment {payment.id} succeeded")
-            elif event_type in ['payment.failed', 'payment.cancelled']:
-                payment.status = Payment.Status.CANCELLED
-                payment.save()
-                logger.info(f"Tochka payment {payment.id} cancelled")
-            elif event_type == 'payment.refunded':
-                self._process_refund(payment, payment_data)
-                logger.info(f"Tochka payment {payment.id} refunded")
-
+            record_event(
+                Payment.Provider.TOCHKA, tochka_event_id(request.data),
+                request.data.get('eventType', ''), request.data,
+            )
             return Response({'status': 'ok'})
 
         except Exception as e:
@@ -222,33 +194,22 @@ class PaymentViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'], url_path='webhook/yookassa')
     def webhook_yookassa(self, request):
-        """Handle YooKassa webhook (legacy)"""
+        """Handle YooKassa webhook (legacy)
+
+        Stored in the webhook inbox like Tochka events.
+        """
         try:
-            event_type = request.data.get('event')
             payment_object = request.data.get('object', {})
-            external_id = payment_object.get('id')
-
-            if not external_id:
+            if not payment_object.get('id'):
                 return Response(
                     {'error': 'Missing payment ID'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            payment = Payment.objects.filter(external_id=external_id).first()
-            if not payment:
-                return Response(
-                    {'error': 'Payment not found'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-
-            if event_type == 'payment.succeeded':
-                self._process_successful_payment(payment, payment_object)
-            elif event_type == 'payment.canceled':
-                payment.status = Payment.Status.CANCELLED
-                payment.save()
-            elif event_type == 'refund.succeeded':
-                self._process_refund(payment, payment_object)
-
+            record_event(
+                Payment.Provider.YOOKASSA, yookassa_event_id(request.data),
+                request.data.get('event', ''), request.data,
+            )
             return Response({'status': 'ok'})
 
         except Exception as e:
@@ -288,63 +249,11 @@ class PaymentViewSet(viewsets.ModelViewSet):
 
     def _process_successful_payment(self, payment, payment_object):
         """Process a successful payment"""
-        from django.db.models import F
-        with db_transaction.atomic():
-            payment.status = Payment.Status.SUCCEEDED
-            payment.paid_at = timezone.now()
-            payment.save(update_fields=['status', 'paid_at', 'updated_at'])
-
-            # Update user balance atomically using F() to avoid race conditions
-            from users.models import User as UserModel
-            UserModel.objects.filter(pk=payment.user_id).update(
-                balance=F('balance') + payment.amount
-            )
-            # Refresh from DB to get the updated balance
-            user = UserModel.objects.get(pk=payment.user_id)
-
-            # Create transaction record
-            Transaction.objects.create(
-                user=user,
-                transaction_type=Transaction.TransactionType.DEPOSIT,
-                amount=payment.amount,
-                balance_after=user.balance,
-                payment=payment,
-                description=f'Deposit: {payment.description}'
-            )
+        process_successful_payment(payment, payment_object)
 
     def _process_refund(self, payment, refund_object):
         """Process a refund"""
-        from django.db.models import F
-        with db_transaction.atomic():
-            # Get refund amount from object
-            if 'amount' in refund_object:
-                if isinstance(refund_object['amount'], dict):
-                    refund_amount = Decimal(str(refund_object['amount'].get('value', 0)))
-                else:
-                    refund_amount = Decimal(str(refund_object['amount']))
-            else:
-                refund_amount = payment.amount
-
-            payment.status = Payment.Status.REFUNDED
-            payment.save(update_fields=['status', 'updated_at'])
-
-            # Update user balance atomically using F() to avoid race conditions
-            from users.models import User as UserModel
-            UserModel.objects.filter(pk=payment.user_id).update(
-                balance=F('balance') - refund_amount
-            )
-            # Refresh from DB to get the updated balance
-            user = UserModel.objects.get(pk=payment.user_id)
-
-            # Create transaction record
-            Transaction.objects.create(
-                user=user,
-                transaction_type=Transaction.TransactionType.WITHDRAWAL,
-                amount=-refund_amount,
-                balance_after=user.balance,
-                payment=payment,
-                description=f'Refund: {payment.description}'
-            )
+        process_refund(payment, refund_object)
 
 
 class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
@@ -352,12 +261,14 @@ class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
     ViewSet for viewing transactions.
 
     Endpoints:
-    - GET /api/payments/transactions/ - list transactions
+    - GET /api/payments/transactions/ - list transactions (?cursor= for keyset pages)
     - GET /api/payments/transactions/{id}/ - get transaction details
     - GET /api/payments/transactions/summary/ - get transaction summary
     """
     queryset = Transaction.objects.select_related('user', 'payment', 'procurement')
     serializer_class = TransactionSerializer
+    # ?cursor= switches the list to keyset pagination over (user, created_at)
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -383,31 +294,15 @@ class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        transactions = self.get_queryset().filter(user_id=user_id)
-
-        # Calculate totals
-        deposits = transactions.filter(
-            transaction_type=Transaction.TransactionType.DEPOSIT
-        ).aggregate(total=models.Sum('amount'))['total'] or 0
-
-        withdrawals = transactions.filter(
-            transaction_type__in=[
-                Transaction.TransactionType.WITHDRAWAL,
-                Transaction.TransactionType.PROCUREMENT_JOIN
-            ]
-        ).aggregate(total=models.Sum('amount'))['total'] or 0
-
-        refunds = transactions.filter(
-            transaction_type=Transaction.TransactionType.PROCUREMENT_REFUND
-        ).aggregate(total=models.Sum('amount'))['total'] or 0
-
-        user = User.objects.filter(id=user_id).first()
+        # One row: running totals maintained by the ledger (LedgerTotals)
+        user = User.objects.filter(id=user_id).select_related('ledger_totals').first()
+        totals = getattr(user, 'ledger_totals', None) or LedgerTotals()
 
         return Response({
             'user_id': int(user_id),
             'current_balance': str(user.balance) if user else '0',
-            'total_deposited': str(abs(deposits)),
-            'total_withdrawn': str(abs(withdrawals)),
-            'total_refunded': str(abs(refunds)),
-            'transaction_count': transactions.count()
+            'total_deposited': str(abs(totals.deposited)),
+            'total_withdrawn': str(abs(totals.spent)),
+            'total_refunded': str(abs(totals.refunded)),
+            'transaction_count': totals.transaction_count
         })
@@ -0,0 +1,142 @@
+"""
+Payment webhook inbox (see WebhookEvent).
+
+The webhook endpoints verify the request, store it with :func:`record_event`
+and acknowledge; the insert is ``INSERT ... ON CONFLICT DO NOTHING`` on
+(provider, event_id), so a notification the provider retries is stored once.
+``manage.py run_payment_webhooks`` workers drain the inbox with
+:func:`process_batch`: a batch of pending events is locked with
+``SELECT ... FOR UPDATE SKIP LOCKED`` and each event is applied in a savepoint
+together with its status change, so it affects the balance exactly once even
+with several workers.  Events for payments that already reached the target
+status are marked ``ignored`` (see processing.apply_provider_status).
+
+An event that raises, or whose payment is not found (the webhook can arrive
+before the payment row is committed or replicated), stays pending with
+``next_attempt_at`` pushed back exponentially (``PAYMENT_WEBHOOK_BACKOFF_SECONDS``
+doubling per attempt, capped at ``PAYMENT_WEBHOOK_BACKOFF_MAX_SECONDS``) until
+``PAYMENT_WEBHOOK_MAX_ATTEMPTS``, then it is marked ``failed``.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Payment, WebhookEvent
+from .processing import apply_provider_status
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, 'PAYMENT_WEBHOOK_MAX_ATTEMPTS', 5)
+BATCH_SIZE = getattr(settings, 'PAYMENT_WEBHOOK_BATCH_SIZE', 100)
+BACKOFF_SECONDS = getattr(settings, 'PAYMENT_WEBHOOK_BACKOFF_SECONDS', 10)
+BACKOFF_MAX_SECONDS = getattr(settings, 'PAYMENT_WEBHOOK_BACKOFF_MAX_SECONDS', 600)
+
+Status = WebhookEvent.Status
+
+# Provider event type -> payment status it reports
+TOCHKA_EVENTS = {
+    'payment.completed': Payment.Status.SUCCEEDED,
+    'payment.succeeded': Payment.Status.SUCCEEDED,
+    'payment.failed': Payment.Status.CANCELLED,
+    'payment.cancelled': Payment.Status.CANCELLED,
+    'payment.refunded': Payment.Status.REFUNDED,
+}
+YOOKASSA_EVENTS = {
+    'payment.succeeded': Payment.Status.SUCCEEDED,
+    'payment.canceled': Payment.Status.CANCELLED,
+    'refund.succeeded': Payment.Status.REFUNDED,
+}
+
+
+class RetryEvent(Exception):
+    """The event cannot be applied yet; retry it later"""
+
+
+def backoff(attempts):
+    """Delay before the next attempt after ``attempts`` failed attempts"""
+    return timedelta(seconds=min(BACKOFF_SECONDS * 2 ** max(attempts - 1, 0), BACKOFF_MAX_SECONDS))
+
+
+def tochka_event_id(data):
+    """Provider event ID of a Tochka notification"""
+    payment_data = data.get('payment') or {}
+    return str(data.get('eventId') or f"{data.get('eventType', '')}:{payment_data.get('orderId')}")
+
+
+def yookassa_event_id(data):
+    """YooKassa sends no event ID; an event happens once per object"""
+    return f"{data.get('event', '')}:{(data.get('object') or {}).get('id')}"
+
+
+def record_event(provider, event_id, event_type, payload):
+    """Store a notification; one already received is silently dropped"""
+    WebhookEvent.objects.bulk_create(
+        [WebhookEvent(provider=provider, event_id=event_id, event_type=event_type, payload=payload)],
+        ignore_conflicts=True,
+    )
+
+
+def _event_payment(event):
+    """(payment row locked for update or None, provider's payment object)"""
+    payments = Payment.objects.select_for_update()
+    if event.provider == Payment.Provider.TOCHKA:
+        payment_data = event.payload.get('payment') or {}
+        return payments.filter(order_id=payment_data.get('orderId')).first(), payment_data
+    payment_object = event.payload.get('object') or {}
+    return payments.filter(external_id=payment_object.get('id')).first(), payment_object
+
+
+def apply_event(event):
+    """Apply one event to its payment; returns (status, note)"""
+    events = TOCHKA_EVENTS if event.provider == Payment.Provider.TOCHKA else YOOKASSA_EVENTS
+    target = events.get(event.event_type)
+    if target is None:
+        return Status.IGNORED, f'Unhandled event type {event.event_type}'
+
+    payment, payment_object = _event_payment(event)
+    if payment is None:
+        # Possibly not committed or replicated yet
+        raise RetryEvent('Payment not found')
+    event.payment = payment
+
+    note = apply_provider_status(payment, target, payment_object)
+    if note:
+        return Status.IGNORED, note
+    logger.info(f"{event.provider} payment {payment.id} {target} (webhook {event.event_id})")
+    return Status.PROCESSED, ''
+
+
+def process_batch(limit=BATCH_SIZE):
+    """Apply up to ``limit`` due pending events; returns the events handled"""
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            WebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now), status=Status.PENDING)
+            .order_by('id')[:limit]
+        )
+        for event in events:
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    event.status, event.error_message = apply_event(event)
+            except Exception as e:
+                event.payment = None
+                event.error_message = str(e)[:1000]
+                if event.attempts >= MAX_ATTEMPTS:
+                    event.status = Status.FAILED
+                else:
+                    event.next_attempt_at = now + backoff(event.attempts)
+                log = logger.warning if isinstance(e, RetryEvent) else logger.error
+                log(f"Webhook event {event.id} failed (attempt {event.attempts}/{MAX_ATTEMPTS}): {e}")
+            if event.status != Status.PENDING:
+                event.next_attempt_at = None
+                event.processed_at = timezone.now()
+            event.save(update_fields=[
+                'status', 'attempts', 'next_attempt_at', 'error_message', 'payment', 'processed_at',
+            ])
+    return events
@@ -0,0 +1,51 @@
+"""
+Chat access change notifications.
+
+The WebSocket chat server caches ``(user_id, procurement_id) -> access``
+decisions in-process.  Whenever a participation is activated or deactivated
+the Core API publishes ``{"procurement_id": ..., "user_ids": [...]}`` on the
+``chat:access`` Redis channel so the chat server drops those entries instead
+of waiting for their TTL to expire.  The users' cached unread counts
+(chat.unread) are dropped as well, since their set of chats changed.
+"""
+import json
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+CHAT_ACCESS_CHANNEL = 'chat:access'
+
+_client = None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        import redis
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5
+        )
+    return _client
+
+
+def _publish(procurement_id, user_ids):
+    try:
+        _get_client().publish(
+            CHAT_ACCESS_CHANNEL,
+            json.dumps({'procurement_id': procurement_id, 'user_ids': user_ids}),
+        )
+    except Exception as e:
+        # Best effort: the chat server's cache entries still expire by TTL
+        logger.warning(f"Failed to publish chat access change: {e}")
+
+
+def publish_access_changed(procurement_id, user_ids):
+    """Notify chat servers after commit that these users' access changed"""
+    user_ids = list(user_ids)
+    if user_ids:
+        from chat.unread import invalidate_unread_counts
+        invalidate_unread_counts(user_ids)
+        transaction.on_commit(lambda: _publish(procurement_id, user_ids))
@@ -14,7 +14,7 @@ class ProcurementAdmin(admin.ModelAdmin):
     list_display = ['id', 'title', 'organizer', 'category', 'status', 'target_amount', 'current_amount', 'deadline']
     list_filter = ['status', 'category', 'city', 'is_featured']
     search_fields = ['title', 'description', 'city']
-    readonly_fields = ['current_amount', 'created_at', 'updated_at']
+    readonly_fields = ['current_amount', 'active_participant_count', 'created_at', 'updated_at']
     date_hierarchy = 'created_at'
 
 
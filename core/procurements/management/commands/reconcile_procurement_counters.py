@@ -0,0 +1,94 @@
+"""
+Management command to repair drift in the denormalized procurement counters.
+
+Run with:
+    python manage.py reconcile_procurement_counters
+
+Recomputes ``active_participant_count`` and ``current_amount`` for every
+procurement from the participants table and rewrites only the rows whose
+stored values disagree.  Use --dry-run to report drift without fixing it and
+--procurement-id to limit the check to a single procurement.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from procurements.models import Participant, Procurement
+
+
+def expected_counters():
+    """Return ``(count, amount)`` expressions computed from active participants."""
+    active = Participant.objects.filter(procurement=OuterRef("pk"), is_active=True).order_by()
+    count = Coalesce(
+        Subquery(active.values("procurement").annotate(c=Count("id")).values("c")),
+        Value(0),
+    )
+    amount = Coalesce(
+        Subquery(active.values("procurement").annotate(s=Sum("amount")).values("s")),
+        Value(0),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+    return count, amount
+
+
+class Command(BaseCommand):
+    help = "Recompute denormalized participant counters on procurements"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report procurements whose counters have drifted",
+        )
+        parser.add_argument(
+            "--procurement-id",
+            type=int,
+            help="Reconcile a single procurement",
+        )
+
+    def handle(self, *args, **options):
+        queryset = Procurement.objects.all()
+        if options["procurement_id"]:
+            queryset = queryset.filter(pk=options["procurement_id"])
+
+        expected_count, expected_amount = expected_counters()
+        drifted = queryset.annotate(
+            expected_count=expected_count,
+            expected_amount=expected_amount,
+        ).filter(
+            ~Q(active_participant_count=F("expected_count"))
+            | ~Q(current_amount=F("expected_amount"))
+        )
+
+        ids = []
+        for row in drifted.values(
+            "id", "active_participant_count", "expected_count",
+            "current_amount", "expected_amount",
+        ).iterator():
+            ids.append(row["id"])
+            self.stdout.write(
+                f"  Procurement {row['id']}: "
+                f"count {row['active_participant_count']} -> {row['expected_count']}, "
+                f"amount {row['current_amount']} -> {row['expected_amount']}"
+            )
+
+        if not ids:
+            self.stdout.write(self.style.SUCCESS("All procurement counters are consistent."))
+            return
+
+        if options["dry_run"]:
+            self.stdout.write(
+                self.style.WARNING(f"\n{len(ids)} procurements have drifted (dry run, nothing changed).")
+            )
+            return
+
+        # Single bulk UPDATE ... SET col = (subquery) for the drifted rows
+        expected_count, expected_amount = expected_counters()
+        updated = Procurement.objects.filter(pk__in=ids).update(
+            active_participant_count=expected_count,
+            current_amount=expected_amount,
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"\nDone. Repaired {updated} procurements."))
@@ -0,0 +1,71 @@
+"""
+Management command running the supplier document delivery worker.
+
+Run with:
+    python manage.py run_supplier_jobs
+
+Claims due jobs (pending, failed_retry whose next_attempt_at has passed, or
+stale processing) in batches with SELECT ... FOR UPDATE SKIP LOCKED, so any
+number of workers can run side by side, and delivers each batch concurrently
+over a pooled HTTP session (see procurements.supplier_jobs).  Polls every
+--poll-interval seconds when idle; use --once to deliver what is due and exit
+(e.g. from cron).
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from procurements.models import SupplierDocumentJob
+from procurements.supplier_jobs import CONCURRENCY, make_session, process_batch
+
+
+class Command(BaseCommand):
+    help = "Deliver pending supplier document jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=CONCURRENCY,
+            help="Parallel deliveries (threads and pooled connections)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Jobs claimed per batch (default: --concurrency)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait when no job is due",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no job is due",
+        )
+
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"]
+        batch_size = options["batch_size"] or concurrency
+        sent, failed = 0, 0
+
+        with make_session(concurrency) as session, ThreadPoolExecutor(max_workers=concurrency) as executor:
+            try:
+                while True:
+                    jobs = process_batch(session, executor, batch_size)
+                    if not jobs:
+                        if options["once"]:
+                            break
+                        time.sleep(options["poll_interval"])
+                        continue
+                    batch_sent = sum(1 for job in jobs if job.status == SupplierDocumentJob.Status.SENT)
+                    sent += batch_sent
+                    failed += len(jobs) - batch_sent
+                    self.stdout.write(f"  ...{len(jobs)} jobs: {batch_sent} sent")
+            except KeyboardInterrupt:
+                self.stdout.write("Interrupted.")
+
+        self.stdout.write(self.style.SUCCESS(f"\nDone. Sent {sent} jobs, {failed} failed."))
@@ -0,0 +1,40 @@
+"""
+Migration: 0005_procurement_active_participant_count
+Adds the denormalized active_participant_count counter to Procurement and
+backfills it (together with current_amount) from the participants table.
+"""
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Procurement = apps.get_model('procurements', 'Procurement')
+    Participant = apps.get_model('procurements', 'Participant')
+
+    active = Participant.objects.filter(procurement=OuterRef('pk'), is_active=True)
+    count_sq = active.order_by().values('procurement').annotate(c=Count('id')).values('c')
+    amount_sq = active.order_by().values('procurement').annotate(s=Sum('amount')).values('s')
+
+    Procurement.objects.update(
+        active_participant_count=Coalesce(Subquery(count_sq), Value(0)),
+        current_amount=Coalesce(
+            Subquery(amount_sq), Value(0), output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurements', '0004_supplierdocumentjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='procurement',
+            name='active_participant_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+"""
+Migration: 0006_participant_procurement_created_idx
+Adds a (procurement, created_at) index on participants so keyset (cursor)
+pagination of a procurement's participant list is an index range scan.
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurements', '0005_procurement_active_participant_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='participant',
+            index=models.Index(fields=['procurement', 'created_at'], name='participant_proc_created_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+"""
+Migration: 0007_procurement_search_vector
+Adds the full-text search_vector column to Procurement.  On PostgreSQL it also
+enables pg_trgm, creates the GIN indexes used by procurements.search (tsvector,
+title trigram, UPPER(city) trigram for case-insensitive prefixes) and backfills
+the vectors.  Other backends only get the column.
+"""
+import django.contrib.postgres.search
+from django.db import migrations
+
+CREATE_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS procurement_search_gin_idx '
+    'ON procurements USING gin (search_vector)',
+    'CREATE INDEX IF NOT EXISTS procurement_title_trgm_idx '
+    'ON procurements USING gin (title gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS procurement_city_trgm_idx '
+    'ON procurements USING gin (UPPER(city) gin_trgm_ops)',
+]
+
+DROP_SQL = [
+    'DROP INDEX IF EXISTS procurement_city_trgm_idx',
+    'DROP INDEX IF EXISTS procurement_title_trgm_idx',
+    'DROP INDEX IF EXISTS procurement_search_gin_idx',
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from procurements.search import search_vector_expression
+
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+    Procurement = apps.get_model('procurements', 'Procurement')
+    Procurement.objects.update(search_vector=search_vector_expression())
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurements', '0006_participant_procurement_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='procurement',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
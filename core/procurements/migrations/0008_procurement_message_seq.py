@@ -0,0 +1,27 @@
+"""
+Migration: 0008_procurement_message_seq
+Adds the per-procurement chat message sequence counter.  Existing rows are
+left NULL (numbering disabled) until `manage.py backfill_message_seq` has
+numbered their messages; new procurements start at 0.
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurements', '0007_procurement_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='procurement',
+            name='message_seq',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='procurement',
+            name='message_seq',
+            field=models.BigIntegerField(default=0, editable=False, null=True),
+        ),
+    ]
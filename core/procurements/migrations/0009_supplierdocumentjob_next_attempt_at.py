@@ -0,0 +1,25 @@
+"""
+Migration: 0009_supplierdocumentjob_next_attempt_at
+Adds the retry schedule column used by the run_supplier_jobs worker, with a
+(status, next_attempt_at) index for claiming due jobs.
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurements', '0008_procurement_message_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplierdocumentjob',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='supplierdocumentjob',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='sdj_status_next_attempt_idx'),
+        ),
+    ]
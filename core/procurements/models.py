@@ -2,10 +2,15 @@
 Procurement models for GroupBuy Bot
 Supports group purchases with organizers, participants, and suppliers
 """
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
 from django.utils import timezone
 from users.models import User
 
+from .access_events import publish_access_changed
+
 
 class Category(models.Model):
     """Product category for procurements"""
@@ -58,7 +63,11 @@ class Procurement(models.Model):
 
     # Financial
     target_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    # Denormalized counters maintained incrementally by Participant.save()/delete()
+    # via apply_participant_delta(); `manage.py reconcile_procurement_counters`
+    # repairs drift from bulk writes that bypass the model.
     current_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    active_participant_count = models.PositiveIntegerField(default=0)
     stop_at_amount = models.DecimalField(
         max_digits=12, decimal_places=2, null=True, blank=True,
         help_text='Stop accepting when this amount is reached'
@@ -85,6 +94,22 @@ class Procurement(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Full-text search document over title/description/city, refreshed by
+    # save() when one of those fields changes (PostgreSQL only; GIN-indexed
+    # together with pg_trgm indexes in migration 0007).  See procurements.search.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Sequence number of the newest chat message, allocated atomically by
+    # reserve_message_seq().  NULL until `manage.py backfill_message_seq` has
+    # numbered the procurement's pre-existing messages.
+    message_seq = models.BigIntegerField(null=True, default=0, editable=False)
+
+    SEARCH_FIELDS = ('title', 'description', 'city')
+    # Columns only ever written with F()/expression updates or explicit
+    # update_fields; full saves leave them alone so a stale in-memory value
+    # cannot roll them back
+    DB_MANAGED_FIELDS = ('message_seq', 'current_amount', 'active_participant_count', 'search_vector')
+
     class Meta:
         db_table = 'procurements'
         indexes = [
@@ -100,6 +125,41 @@ class Procurement(models.Model):
     def __str__(self):
         return f"{self.title} ({self.status})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_search_text = instance._search_text()
+        return instance
+
+    def _search_text(self):
+        return tuple(self.__dict__.get(field) for field in self.SEARCH_FIELDS)
+
+    def save(self, *args, **kwargs):
+        if (
+            kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+            and not self._state.adding
+        ):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.DB_MANAGED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not set(self.SEARCH_FIELDS) & set(update_fields):
+            return
+        search_text = self._search_text()
+        if search_text != getattr(self, '_saved_search_text', None):
+            self.update_search_vector()
+            self._saved_search_text = search_text
+
+    def update_search_vector(self):
+        """Recompute search_vector in the database for this procurement"""
+        from .search import search_vector_expression, uses_postgres_search
+
+        if uses_postgres_search():
+            Procurement.objects.filter(pk=self.pk).update(search_vector=search_vector_expression())
+
     @property
     def progress(self):
         """Calculate progress percentage"""
@@ -109,8 +169,8 @@ class Procurement(models.Model):
 
     @property
     def participant_count(self):
-        """Get number of participants"""
-        return self.participants.count()
+        """Get number of active participants (denormalized, no query)"""
+        return self.active_participant_count
 
     @property
     def days_left(self):
@@ -125,24 +185,163 @@ class Procurement(models.Model):
     @property
     def can_join(self):
         """Check if new participants can join"""
+        return self._accepts_amount(self.current_amount)
+
+    @classmethod
+    def reserve_message_seq(cls, procurement_id, count=1):
+        """Allocate ``count`` chat sequence numbers and return the last one.
+
+        The UPDATE holds the procurement row lock until the surrounding
+        transaction commits, so concurrent senders are serialized and the
+        numbers are gap-free in commit order.  Returns None while the
+        procurement is not backfilled yet (message_seq IS NULL).
+        """
+        with transaction.atomic():
+            updated = cls.objects.filter(pk=procurement_id, message_seq__isnull=False).update(
+                message_seq=F('message_seq') + count
+            )
+            if not updated:
+                return None
+            return cls.objects.filter(pk=procurement_id).values_list('message_seq', flat=True).get()
+
+    @classmethod
+    def apply_participant_delta(cls, procurement_id, count_delta=0, amount_delta=0):
+        """Apply an incremental change to the participant counters.
+
+        Issues a single ``UPDATE ... SET current_amount = current_amount + %s``
+        that also moves an active procurement to STOPPED when the new amount
+        reaches stop_at_amount.  All right-hand expressions see the pre-update
+        row, so concurrent writers never overwrite each other.
+        """
+        if not count_delta and not amount_delta:
+            return 0
+        new_amount = F('current_amount') + amount_delta
+        return cls.objects.filter(pk=procurement_id).update(
+            active_participant_count=F('active_participant_count') + count_delta,
+            current_amount=new_amount,
+            status=Case(
+                When(
+                    Q(status=cls.Status.ACTIVE, stop_at_amount__isnull=False, stop_at_amount__lte=new_amount),
+                    then=Value(cls.Status.STOPPED),
+                ),
+                default=F('status'),
+            ),
+            updated_at=timezone.now(),
+        )
+
+    def admit_participants(self, entries):
+        """Atomically admit a batch of users into this procurement.
+
+        ``entries`` is a list of dicts with ``user_id``, ``amount`` and optional
+        ``quantity`` / ``notes``.  The procurement row is locked with
+        SELECT ... FOR UPDATE, so concurrent admissions are serialized and the
+        can_join / stop_at_amount checks see every previously admitted amount:
+        once a join reaches stop_at_amount nobody else gets in.  Users with an
+        inactive participation are re-activated in place instead of inserting a
+        duplicate (ON CONFLICT DO UPDATE semantics).
+
+        Returns ``(admitted, rejected)`` where ``admitted`` is a list of
+        Participant instances and ``rejected`` a list of
+        ``{'user_id': ..., 'error': ...}`` dicts.
+        """
+        from .receipts import bump_receipt_version
+
+        admitted, rejected = [], []
+        with transaction.atomic():
+            locked = Procurement.objects.select_for_update().get(pk=self.pk)
+            user_ids = [entry['user_id'] for entry in entries]
+            existing = {
+                p.user_id: p
+                for p in Participant.objects.select_for_update().filter(
+                    procurement_id=self.pk, user_id__in=user_ids
+                )
+            }
+            known_users = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+
+            running_amount = locked.current_amount
+            new_rows, reactivated = [], []
+            seen = set()
+            for entry in entries:
+                user_id = entry['user_id']
+                current = existing.get(user_id)
+                if user_id in seen or (current and current.is_active):
+                    rejected.append({'user_id': user_id, 'error': 'Already participating in this procurement'})
+                    continue
+                if user_id not in known_users:
+                    rejected.append({'user_id': user_id, 'error': 'User not found'})
+                    continue
+                if not locked._accepts_amount(running_amount):
+                    rejected.append({'user_id': user_id, 'error': 'Cannot join this procurement'})
+                    continue
+
+                seen.add(user_id)
+                fields = {
+                    'quantity': entry.get('quantity', 1),
+                    'amount': entry['amount'],
+                    'notes': entry.get('notes', ''),
+                    'status': Participant.Status.PENDING,
+                    'is_active': True,
+                }
+                if current:
+                    for name, value in fields.items():
+                        setattr(current, name, value)
+                    current.updated_at = timezone.now()
+                    reactivated.append(current)
+                else:
+                    new_rows.append(Participant(procurement_id=self.pk, user_id=user_id, **fields))
+                running_amount += entry['amount']
+
+            # Counters are applied once for the whole batch below, so write the
+            # rows without going through Participant.save()'s accounting.
+            if new_rows:
+                Participant.objects.bulk_create(new_rows)
+            if reactivated:
+                Participant.objects.bulk_update(
+                    reactivated, ['quantity', 'amount', 'notes', 'status', 'is_active', 'updated_at']
+                )
+            admitted = new_rows + reactivated
+            for participant in admitted:
+                participant._remember_contribution()
+
+            Procurement.apply_participant_delta(
+                self.pk, len(admitted), sum((p.amount for p in admitted), 0)
+            )
+            publish_access_changed(self.pk, [p.user_id for p in admitted])
+            bump_receipt_version(self.pk)
+
+        self.refresh_from_db(fields=['active_participant_count', 'current_amount', 'status', 'updated_at'])
+        return admitted, rejected
+
+    def _accepts_amount(self, current_amount):
+        """Same rules as can_join, evaluated against a running amount."""
         if self.status != self.Status.ACTIVE:
             return False
         if self.deadline < timezone.now():
             return False
-        if self.stop_at_amount and self.current_amount >= self.stop_at_amount:
+        if self.stop_at_amount and current_amount >= self.stop_at_amount:
             return False
         return True
 
     def update_current_amount(self):
-        """Recalculate current amount from participants"""
-        total = self.participants.filter(is_active=True).aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
-        self.current_amount = total
-        self.save(update_fields=['current_amount', 'updated_at'])
+        """Recalculate the participant counters from scratch.
+
+        Used to repair drift for a single procurement; participant writes use
+        apply_participant_delta() instead.
+        """
+        totals = self.participants.filter(is_active=True).aggregate(
+            count=models.Count('id'),
+            total=models.Sum('amount'),
+        )
+        self.active_participant_count = totals['count']
+        self.current_amount = totals['total'] or 0
+        self.save(update_fields=['active_participant_count', 'current_amount', 'updated_at'])
 
         # Check if stop amount is reached
-        if self.stop_at_amount and self.current_amount >= self.stop_at_amount:
+        if (
+            self.status == self.Status.ACTIVE
+            and self.stop_at_amount
+            and self.current_amount >= self.stop_at_amount
+        ):
             self.status = self.Status.STOPPED
             self.save(update_fields=['status', 'updated_at'])
 
@@ -175,15 +374,69 @@ class Participant(models.Model):
         indexes = [
             models.Index(fields=['procurement', 'status'], name='participant_procure_s9t0u1_idx'),
             models.Index(fields=['user'], name='participant_user_id_v2w3x4_idx'),
+            models.Index(fields=['procurement', 'created_at'], name='participant_proc_created_idx'),
         ]
 
     def __str__(self):
         return f"{self.user} in {self.procurement.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_contribution()
+        return instance
+
+    def _remember_contribution(self):
+        """Snapshot the (is_active, amount) pair last written to the database."""
+        self._saved_is_active = self.__dict__.get('is_active')
+        self._saved_amount = self.__dict__.get('amount')
+
+    def _saved_contribution(self):
+        """Return (count, amount) this row currently adds to the procurement totals."""
+        if self._state.adding or not getattr(self, '_saved_is_active', None):
+            return 0, 0
+        return 1, self._saved_amount or 0
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update procurement totals
-        self.procurement.update_current_amount()
+        from .receipts import bump_receipt_version
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {'amount', 'is_active'} & set(update_fields):
+            # Status/notes-only saves cannot change the procurement totals
+            super().save(*args, **kwargs)
+            bump_receipt_version(self.procurement_id)
+            return
+
+        old_count, old_amount = self._saved_contribution()
+        if update_fields is not None:
+            # Fields left out of update_fields keep their stored value
+            is_active = self.is_active if 'is_active' in update_fields else self._saved_is_active
+            amount = self.amount if 'amount' in update_fields else self._saved_amount
+        else:
+            is_active, amount = self.is_active, self.amount
+        new_count, new_amount = (1, amount) if is_active else (0, 0)
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            Procurement.apply_participant_delta(
+                self.procurement_id, new_count - old_count, new_amount - old_amount
+            )
+            if new_count != old_count:
+                publish_access_changed(self.procurement_id, [self.user_id])
+            bump_receipt_version(self.procurement_id)
+        self._saved_is_active, self._saved_amount = is_active, amount
+
+    def delete(self, *args, **kwargs):
+        from .receipts import bump_receipt_version
+
+        count, amount = self._saved_contribution()
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Procurement.apply_participant_delta(self.procurement_id, -count, -amount)
+            if count:
+                publish_access_changed(self.procurement_id, [self.user_id])
+            bump_receipt_version(self.procurement_id)
+        return result
 
 
 class SupplierVote(models.Model):
@@ -249,6 +502,8 @@ class SupplierDocumentJob(models.Model):
     """Tracks document export jobs sent to suppliers.
 
     Status machine: pending → processing → sent | failed_retry | fatal_error
+    Jobs are delivered by ``manage.py run_supplier_jobs``; failed_retry jobs
+    become due again at ``next_attempt_at``.
     Idempotency: unique (procurement, job_type, idempotency_key) prevents duplicate sends.
     Full request/response payloads are stored in JSONB for audit and debugging.
     """
@@ -280,6 +535,9 @@ class SupplierDocumentJob(models.Model):
     response_payload = models.JSONField(null=True, blank=True)
     error_message = models.TextField(blank=True, default='')
     last_attempt_at = models.DateTimeField(null=True, blank=True)
+    # Earliest time a worker may (re)try the job; pushed back exponentially
+    # after each failed attempt (see procurements.supplier_jobs)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
     sent_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -290,6 +548,7 @@ class SupplierDocumentJob(models.Model):
         indexes = [
             models.Index(fields=['status'], name='sdj_status_idx'),
             models.Index(fields=['procurement'], name='sdj_procurement_idx'),
+            models.Index(fields=['status', 'next_attempt_at'], name='sdj_status_next_attempt_idx'),
         ]
 
     def __str__(self):
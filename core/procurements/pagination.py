@@ -0,0 +1,82 @@
+"""
+Shared pagination classes for the Core API.
+
+Page-number pagination issues a ``COUNT(*)`` and an ``OFFSET`` scan for every
+page, so deep pages of large tables get linearly slower.  ``KeysetPagination``
+keeps the page-number behaviour by default and switches to keyset (cursor)
+pagination when the request carries a ``cursor`` query parameter, e.g.
+``GET /api/chat/messages/?procurement_id=1&cursor=`` for the newest page and
+then the ``next`` link for older ones.
+"""
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class _CreatedAtCursorPagination(CursorPagination):
+    """Cursor pagination over an indexed timestamp, tie-broken by primary key."""
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+
+    def get_ordering(self, request, queryset, view):
+        # Honour an explicit ?ordering= from OrderingFilter; without one the
+        # filter returns None, which CursorPagination would reject.
+        if request.query_params.get(OrderingFilter.ordering_param):
+            for backend in getattr(view, 'filter_backends', []):
+                if issubclass(backend, OrderingFilter):
+                    ordering = backend().get_ordering(request, queryset, view)
+                    if ordering:
+                        return self._with_tiebreak(ordering)
+        return self._with_tiebreak(self.ordering)
+
+    @staticmethod
+    def _with_tiebreak(ordering):
+        ordering = (ordering,) if isinstance(ordering, str) else tuple(ordering)
+        tiebreak = '-pk' if ordering[0].startswith('-') else 'pk'
+        if tiebreak.lstrip('-') in {field.lstrip('-') for field in ordering}:
+            return ordering
+        return ordering + (tiebreak,)
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page-number pagination with opt-in keyset pagination.
+
+    Requests with ``?cursor=`` (empty for the first page) are paginated by the
+    view's ``cursor_ordering`` (``-created_at`` by default) and return
+    ``{"next", "previous", "results"}`` without a total count.  All other
+    requests keep the regular ``{"count", "next", "previous", "results"}``
+    page-number response.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    default_cursor_ordering = '-created_at'
+
+    def __init__(self):
+        self._cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            ordering = getattr(view, 'cursor_ordering', self.default_cursor_ordering)
+            self._cursor_paginator = _CreatedAtCursorPagination(ordering)
+            return self._cursor_paginator.paginate_queryset(queryset, request, view)
+        self._cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self._cursor_paginator is not None:
+            return self._cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['required'] = ['results']
+        return response_schema
+
+    def to_html(self):
+        if self._cursor_paginator is not None:
+            return self._cursor_paginator.to_html()
+        return super().to_html()
@@ -0,0 +1,167 @@
+"""
+Receipt table of a procurement: the confirmed/paid participants with their
+order details that the organizer sends to the supplier.
+
+``receipt_table`` and ``send_to_supplier`` share :func:`get_receipt`.  Totals
+are aggregated in SQL and kept as ``Decimal``; participant rows are read with
+``values_list(...).iterator()`` so large procurements never instantiate model
+objects.  The finished snapshot is cached under the procurement's participant
+version:
+
+- ``receipts:version:<procurement_id>`` holds a random token that
+  ``Participant.save()`` / ``delete()`` and batch admissions replace via
+  :func:`bump_receipt_version`, so any participant change starts a new key
+- ``receipts:snapshot:<procurement_id>:<token>:<updated_at>`` holds the
+  snapshot; the procurement's ``updated_at`` covers edits of its own fields
+
+A lost version token only costs a rebuild.  Changes to participants' names or
+phones are picked up when ``RECEIPT_CACHE_TTL`` expires.
+"""
+import logging
+import uuid
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from common.exports import CHUNK_SIZE, attachment_response
+
+from .models import Participant
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_CACHE_TTL = getattr(settings, 'RECEIPT_CACHE_TTL', 600)
+RECEIPT_STATUSES = (Participant.Status.CONFIRMED, Participant.Status.PAID)
+CENTS = Decimal('0.01')
+
+RECEIPT_HEADERS = ['user_id', 'full_name', 'phone', 'city', 'quantity', 'amount', 'status', 'notes']
+
+
+def _version_key(procurement_id):
+    return f'receipts:version:{procurement_id}'
+
+
+def _snapshot_key(procurement, version):
+    return f'receipts:snapshot:{procurement.pk}:{version}:{procurement.updated_at.timestamp()}'
+
+
+def _cache_get(key):
+    try:
+        return cache.get(key)
+    except Exception as e:
+        logger.warning(f"Receipt cache read failed for {key}: {e}")
+        return None
+
+
+def _cache_set(key, value, timeout):
+    try:
+        cache.set(key, value, timeout)
+    except Exception as e:
+        logger.warning(f"Receipt cache write failed for {key}: {e}")
+
+
+def _set_versions(procurement_ids):
+    try:
+        cache.set_many({_version_key(pk): uuid.uuid4().hex for pk in procurement_ids}, None)
+    except Exception as e:
+        logger.warning(f"Receipt cache invalidation failed for {procurement_ids}: {e}")
+
+
+def bump_receipt_version(*procurement_ids):
+    """Start a new participant version, now and again after commit"""
+    procurement_ids = set(procurement_ids)
+    _set_versions(procurement_ids)
+    transaction.on_commit(lambda: _set_versions(procurement_ids))
+
+
+def receipt_version(procurement_id):
+    """Current participant version token of a procurement"""
+    key = _version_key(procurement_id)
+    version = _cache_get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        try:
+            if not cache.add(key, version, None):
+                version = cache.get(key) or version
+        except Exception as e:
+            logger.warning(f"Receipt cache read failed for {key}: {e}")
+    return version
+
+
+def receipt_participants(procurement):
+    """Participants listed on the receipt"""
+    return Participant.objects.filter(
+        procurement_id=procurement.pk, is_active=True, status__in=RECEIPT_STATUSES,
+    )
+
+
+def build_receipt(procurement):
+    """Build the receipt snapshot from the database"""
+    participants = receipt_participants(procurement)
+    totals = participants.aggregate(count=Count('id'), amount=Sum('amount'))
+    total_amount = (totals['amount'] or Decimal('0')).quantize(CENTS)
+    commission = (procurement.commission_percent * total_amount / 100).quantize(CENTS, ROUND_HALF_UP)
+
+    rows = [
+        {
+            'user_id': user_id,
+            'full_name': f"{first_name} {last_name}".strip(),
+            'phone': phone,
+            'city': procurement.city,
+            'quantity': str(quantity),
+            'amount': str(amount),
+            'status': participant_status,
+            'notes': notes,
+        }
+        for user_id, first_name, last_name, phone, quantity, amount, participant_status, notes
+        in participants.order_by('id').values_list(
+            'user_id', 'user__first_name', 'user__last_name', 'user__phone',
+            'quantity', 'amount', 'status', 'notes',
+        ).iterator(chunk_size=CHUNK_SIZE)
+    ]
+
+    # Money stays Decimal and is serialized as strings, like Payment.amount
+    return {
+        'procurement_id': procurement.id,
+        'procurement_title': procurement.title,
+        'supplier_id': procurement.supplier_id,
+        'unit': procurement.unit,
+        'total_participants': totals['count'],
+        'total_amount': str(total_amount),
+        'commission_percent': str(procurement.commission_percent),
+        'commission_amount': str(commission),
+        'rows': rows,
+    }
+
+
+def get_receipt(procurement):
+    """Cached receipt snapshot for the procurement's current participants"""
+    key = _snapshot_key(procurement, receipt_version(procurement.pk))
+    receipt = _cache_get(key)
+    if receipt is None:
+        receipt = build_receipt(procurement)
+        _cache_set(key, receipt, RECEIPT_CACHE_TTL)
+    return receipt
+
+
+def receipt_lines(receipt):
+    """Spreadsheet rows of a receipt, closed by the totals"""
+    for row in receipt['rows']:
+        yield [
+            row['user_id'], row['full_name'], row['phone'], row['city'],
+            Decimal(row['quantity']), Decimal(row['amount']), row['status'], row['notes'],
+        ]
+    # str(): snapshots cached before totals were strings hold floats
+    yield ['', 'Total', '', '', '', Decimal(str(receipt['total_amount'])).quantize(CENTS), '', '']
+    yield [
+        '', f"Commission {receipt['commission_percent']}%", '', '', '',
+        Decimal(str(receipt['commission_amount'])).quantize(CENTS), '', '',
+    ]
+
+
+def receipt_response(receipt, export_format):
+    """Receipt as a CSV or XLSX download for the supplier"""
+    filename = f"receipt-{receipt['procurement_id']}.{export_format}"
+    return attachment_response(RECEIPT_HEADERS, receipt_lines(receipt), filename, export_format, 'receipt')
@@ -0,0 +1,91 @@
+"""
+Procurement search.
+
+On PostgreSQL procurements are matched against the ``search_vector`` tsvector
+column (Russian and English configs, GIN-indexed), typo-tolerant trigram word
+similarity on the title and a case-insensitive city prefix (both pg_trgm GIN
+indexes), and ranked by ts_rank plus title similarity.  Other backends fall
+back to ``icontains`` matching ordered by recency so tests and local SQLite
+setups keep working.
+"""
+from django.db import connection
+from django.db.models import F, Q
+from rest_framework.filters import SearchFilter
+
+SEARCH_CONFIGS = ('russian', 'english')
+
+
+def search_vector_expression():
+    """Weighted tsvector over title (A), description (B) and city (C)."""
+    from django.contrib.postgres.search import SearchVector
+
+    vector = None
+    for config in SEARCH_CONFIGS:
+        part = (
+            SearchVector('title', weight='A', config=config)
+            + SearchVector('description', weight='B', config=config)
+        )
+        vector = part if vector is None else vector + part
+    return vector + SearchVector('city', weight='C', config='simple')
+
+
+def uses_postgres_search():
+    return connection.vendor == 'postgresql'
+
+
+def search_procurements(queryset, query, extra=None):
+    """
+    Filter and rank ``queryset`` by the free-text ``query``.
+
+    ``extra`` is an optional ``Q`` OR-ed into the match condition (e.g. the
+    admin panel also matches the organizer's name).  Results are ordered by
+    relevance on PostgreSQL and by ``-created_at`` elsewhere.
+    """
+    query = (query or '').strip()
+    if not query:
+        return queryset
+
+    if not uses_postgres_search():
+        match = (
+            Q(title__icontains=query)
+            | Q(description__icontains=query)
+            | Q(city__icontains=query)
+        )
+        if extra is not None:
+            match |= extra
+        return queryset.filter(match).order_by('-created_at')
+
+    from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+
+    ts_query = None
+    for config in SEARCH_CONFIGS:
+        part = SearchQuery(query, config=config, search_type='websearch')
+        ts_query = part if ts_query is None else ts_query | part
+
+    # Each branch is served by its own GIN index (search_vector, title
+    # trigram, UPPER(city) trigram) and combined with a BitmapOr.
+    match = (
+        Q(search_vector=ts_query)
+        | Q(title__trigram_word_similar=query)
+        | Q(city__istartswith=query)
+    )
+    if extra is not None:
+        match |= extra
+
+    return (
+        queryset.filter(match)
+        .annotate(
+            rank=SearchRank(F('search_vector'), ts_query)
+            + TrigramWordSimilarity(query, 'title')
+        )
+        .order_by('-rank', '-created_at')
+    )
+
+
+class ProcurementSearchFilter(SearchFilter):
+    """``?search=`` backed by :func:`search_procurements` instead of ILIKE scans."""
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        return search_procurements(queryset, query)
+
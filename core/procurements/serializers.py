@@ -113,6 +113,12 @@ class JoinProcurementSerializer(serializers.Serializer):
     notes = serializers.CharField(required=False, allow_blank=True)
 
 
+class JoinBatchSerializer(serializers.Serializer):
+    """Serializer for admitting many users to a procurement in one transaction"""
+    participants = JoinProcurementSerializer(many=True, allow_empty=False, max_length=500)
+    organizer_id = serializers.IntegerField(required=False)
+
+
 class AddParticipantSerializer(serializers.Serializer):
     """Serializer for adding another user to a procurement (organizer action)"""
     user_id = serializers.IntegerField()
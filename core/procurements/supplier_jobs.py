@@ -0,0 +1,139 @@
+"""
+Delivery of supplier document jobs (see SupplierDocumentJob).
+
+``send_to_supplier`` only records a pending job; ``manage.py run_supplier_jobs``
+workers deliver them.  A worker claims a batch of due jobs with
+``SELECT ... FOR UPDATE SKIP LOCKED`` (so several workers never pick the same
+job), marks them ``processing`` and POSTs the payloads concurrently through a
+pooled ``requests`` session, then records each outcome.  A failed attempt
+moves the job to ``failed_retry`` with ``next_attempt_at`` pushed back
+exponentially (``SUPPLIER_JOB_BACKOFF_SECONDS`` doubling per attempt, capped at
+``SUPPLIER_JOB_BACKOFF_MAX_SECONDS``) until ``max_retries`` is reached.
+
+Jobs left ``processing`` by a worker that died are claimed again after
+``SUPPLIER_JOB_STALE_MINUTES``.
+"""
+import logging
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .models import SupplierDocumentJob
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = getattr(settings, 'SUPPLIER_JOB_CONCURRENCY', 8)
+HTTP_TIMEOUT = getattr(settings, 'SUPPLIER_JOB_TIMEOUT', 30)
+BACKOFF_SECONDS = getattr(settings, 'SUPPLIER_JOB_BACKOFF_SECONDS', 30)
+BACKOFF_MAX_SECONDS = getattr(settings, 'SUPPLIER_JOB_BACKOFF_MAX_SECONDS', 3600)
+STALE_AFTER = timedelta(minutes=getattr(settings, 'SUPPLIER_JOB_STALE_MINUTES', 10))
+
+Status = SupplierDocumentJob.Status
+
+
+def backoff(retry_count):
+    """Delay before the next attempt after ``retry_count`` failed attempts"""
+    return timedelta(seconds=min(BACKOFF_SECONDS * 2 ** max(retry_count - 1, 0), BACKOFF_MAX_SECONDS))
+
+
+def due_jobs(now=None):
+    """Jobs a worker may claim now"""
+    now = now or timezone.now()
+    return SupplierDocumentJob.objects.filter(
+        (
+            Q(status__in=[Status.PENDING, Status.FAILED_RETRY])
+            & (Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+        )
+        | Q(status=Status.PROCESSING, last_attempt_at__lt=now - STALE_AFTER)
+    )
+
+
+def claim_jobs(limit):
+    """Mark up to ``limit`` due jobs processing and return them"""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            due_jobs(now).select_for_update(skip_locked=True)
+            .order_by('next_attempt_at', 'id')[:limit]
+        )
+        SupplierDocumentJob.objects.filter(id__in=[job.id for job in jobs]).update(
+            status=Status.PROCESSING, last_attempt_at=now, updated_at=now,
+        )
+    for job in jobs:
+        job.status = Status.PROCESSING
+        job.last_attempt_at = now
+    return jobs
+
+
+def make_session(pool_size=None):
+    """HTTP session whose connection pool is shared by the delivery threads"""
+    pool_size = pool_size or CONCURRENCY
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def deliver(session, job):
+    """POST the job's payload; returns ``(ok, response_payload, error_message)``
+
+    Runs in a delivery thread, so it does not touch the database.
+    """
+    if not job.supplier_api_url:
+        # No supplier API URL configured — local delivery / webhook
+        return True, {'note': 'No supplier_api_url provided; payload stored locally'}, ''
+    try:
+        resp = session.post(job.supplier_api_url, json=job.request_payload, timeout=HTTP_TIMEOUT)
+    except Exception as exc:
+        return False, None, str(exc)[:1000]
+
+    try:
+        resp_payload = resp.json()
+    except Exception:
+        resp_payload = {'raw': resp.text[:2000]}
+    if resp.ok:
+        return True, resp_payload, ''
+    return False, resp_payload, f'HTTP {resp.status_code}: {resp.text[:500]}'
+
+
+def record_result(job, ok, response_payload, error_message):
+    """Store the outcome of one delivery attempt"""
+    now = timezone.now()
+    job.response_payload = response_payload
+    if ok:
+        job.status = Status.SENT
+        job.sent_at = now
+        job.next_attempt_at = None
+        job.error_message = ''
+    else:
+        job.retry_count += 1
+        job.error_message = error_message
+        if job.retry_count >= job.max_retries:
+            job.status = Status.FATAL_ERROR
+            job.next_attempt_at = None
+        else:
+            job.status = Status.FAILED_RETRY
+            job.next_attempt_at = now + backoff(job.retry_count)
+        logger.error(
+            f"Supplier job {job.id} failed (attempt {job.retry_count}/{job.max_retries}): {error_message}"
+        )
+    job.save(update_fields=['status', 'retry_count', 'response_payload', 'error_message',
+                            'sent_at', 'next_attempt_at', 'updated_at'])
+
+
+def process_batch(session, executor, limit):
+    """Claim and deliver one batch of due jobs on ``executor``; returns the jobs processed"""
+    jobs = claim_jobs(limit)
+    if not jobs:
+        return []
+    results = executor.map(lambda job: deliver(session, job), jobs)
+    for job, result in zip(jobs, results):
+        record_result(job, *result)
+    return jobs
+
@@ -9,14 +9,21 @@ from django.utils import timezone
 from django.db.models import Count
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
+from common.exports import OPENPYXL_AVAILABLE, CSVRenderer, XLSXRenderer
+
+from .pagination import KeysetPagination
+from .receipts import get_receipt, receipt_response
+from .search import ProcurementSearchFilter, search_procurements
 from .models import Category, Procurement, Participant, SupplierVote, VoteCloseRequest, SupplierDocumentJob
 from .serializers import (
     CategorySerializer, ProcurementListSerializer, ProcurementDetailSerializer,
     ProcurementCreateSerializer, ParticipantSerializer, JoinProcurementSerializer,
     SupplierVoteSerializer, CastVoteSerializer, AddParticipantSerializer,
-    InviteUserSerializer,
+    InviteUserSerializer, JoinBatchSerializer,
 )
 
 logger = logging.getLogger(__name__)
@@ -43,13 +50,15 @@ class ProcurementViewSet(viewsets.ModelViewSet):
     ViewSet for managing procurements.
 
     Endpoints:
-    - GET /api/procurements/ - list all procurements (with filters)
+    - GET /api/procurements/ - list all procurements (with filters, ?cursor= for keyset pages)
     - POST /api/procurements/ - create new procurement
+    - GET /api/procurements/search/?q= - ranked full-text search
     - GET /api/procurements/{id}/ - get procurement details
     - PUT /api/procurements/{id}/ - update procurement
     - DELETE /api/procurements/{id}/ - delete procurement
     - GET /api/procurements/{id}/participants/ - list participants
     - POST /api/procurements/{id}/join/ - join a procurement
+    - POST /api/procurements/{id}/join_batch/ - admit many users in one transaction
     - POST /api/procurements/{id}/leave/ - leave a procurement
     - GET /api/procurements/user/{user_id}/ - get user's procurements
     - POST /api/procurements/{id}/check_access/ - check user access
@@ -62,9 +71,11 @@ class ProcurementViewSet(viewsets.ModelViewSet):
     - POST /api/procurements/{id}/close/ - organizer closes completed procurement
     """
     queryset = Procurement.objects.select_related('category', 'organizer')
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [ProcurementSearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'description', 'city']
     ordering_fields = ['created_at', 'deadline', 'target_amount', 'current_amount']
+    # ?cursor= switches the list to keyset pagination over created_at
+    pagination_class = KeysetPagination
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -130,30 +141,54 @@ class ProcurementViewSet(viewsets.ModelViewSet):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        user_id = serializer.validated_data['user_id']
-
-        # Check if already participating
-        if procurement.participants.filter(user_id=user_id, is_active=True).exists():
+        # Admission re-checks can_join under a row lock (see admit_participants)
+        admitted, rejected = procurement.admit_participants([serializer.validated_data])
+        if rejected:
             return Response(
-                {'error': 'Already participating in this procurement'},
+                {'error': rejected[0]['error']},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Create participant
-        participant = Participant.objects.create(
-            procurement=procurement,
-            user_id=user_id,
-            quantity=serializer.validated_data['quantity'],
-            amount=serializer.validated_data['amount'],
-            notes=serializer.validated_data.get('notes', ''),
-            status=Participant.Status.PENDING
-        )
-
         return Response(
-            ParticipantSerializer(participant).data,
+            ParticipantSerializer(admitted[0]).data,
             status=status.HTTP_201_CREATED
         )
 
+    @action(detail=True, methods=['post'])
+    def join_batch(self, request, pk=None):
+        """Admit many users into a procurement in one transaction.
+
+        Used by messenger adapters to flush queued joins and by the organizer
+        to add several participants at once (pass ``organizer_id``).  Every
+        entry is admitted or rejected atomically under the same row lock as
+        join(), so stop_at_amount is never overshot by concurrent batches.
+        """
+        procurement = self.get_object()
+
+        serializer = JoinBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        organizer_id = serializer.validated_data.get('organizer_id')
+        if organizer_id is not None and procurement.organizer_id != organizer_id:
+            return Response(
+                {'error': 'Only the organizer can add participants to this procurement'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        admitted, rejected = procurement.admit_participants(serializer.validated_data['participants'])
+        admitted = list(
+            Participant.objects.filter(pk__in=[p.pk for p in admitted]).select_related('user').order_by('id')
+        )
+
+        return Response({
+            'admitted': ParticipantSerializer(admitted, many=True).data,
+            'rejected': rejected,
+            'status': procurement.status,
+            'current_amount': str(procurement.current_amount),
+            'participant_count': procurement.active_participant_count,
+        }, status=status.HTTP_201_CREATED if admitted else status.HTTP_400_BAD_REQUEST)
+
     @action(detail=True, methods=['post'])
     def add_participant(self, request, pk=None):
         """Add another user to a procurement (organizer only).
@@ -182,23 +217,15 @@ class ProcurementViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if procurement.participants.filter(user_id=user_id, is_active=True).exists():
+        admitted, rejected = procurement.admit_participants([serializer.validated_data])
+        if rejected:
             return Response(
-                {'error': 'User is already participating in this procurement'},
+                {'error': rejected[0]['error']},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        participant = Participant.objects.create(
-            procurement=procurement,
-            user_id=user_id,
-            quantity=serializer.validated_data['quantity'],
-            amount=serializer.validated_data['amount'],
-            notes=serializer.validated_data.get('notes', ''),
-            status=Participant.Status.PENDING,
-        )
-
         return Response(
-            ParticipantSerializer(participant).data,
+            ParticipantSerializer(admitted[0]).data,
             status=status.HTTP_201_CREATED,
         )
 
@@ -223,10 +250,29 @@ class ProcurementViewSet(viewsets.ModelViewSet):
 
         participant.is_active = False
         participant.status = Participant.Status.CANCELLED
-        participant.save()
+        participant.save(update_fields=['is_active', 'status', 'updated_at'])
 
         return Response({'message': 'Successfully left the procurement'})
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Ranked full-text search (combinable with the list filters, e.g. status)"""
+        query = request.query_params.get('q', '').strip()
+        if len(query) < 2:
+            return Response(
+                {'error': 'Search query must be at least 2 characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = search_procurements(self.get_queryset(), query)
+        # Relevance order must survive paging, so keyset pages do not apply here
+        paginator = PageNumberPagination()
+        paginator.page_size_query_param = 'page_size'
+        paginator.max_page_size = 100
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = ProcurementListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(detail=False, methods=['get'], url_path='user/(?P<user_id>[^/.]+)')
     def user_procurements(self, request, user_id=None):
         """Get procurements for a specific user"""
@@ -520,48 +566,29 @@ class ProcurementViewSet(viewsets.ModelViewSet):
             'participants': serializer.data,
         })
 
-    @action(detail=True, methods=['get'])
+    @action(
+        detail=True, methods=['get'],
+        renderer_classes=api_settings.DEFAULT_RENDERER_CLASSES + [CSVRenderer, XLSXRenderer],
+    )
     def receipt_table(self, request, pk=None):
         """Generate receipt table for the supplier.
 
         Returns a list of confirmed/paid participants with their order details
         so the organizer can send the summary spreadsheet to the supplier.
+        ``?format=csv`` or ``?format=xlsx`` downloads it as a spreadsheet.
         """
         procurement = self.get_object()
-
-        participants = procurement.participants.filter(
-            is_active=True,
-            status__in=[Participant.Status.CONFIRMED, Participant.Status.PAID],
-        ).select_related('user')
-
-        rows = []
-        total_amount = 0
-        for p in participants:
-            rows.append({
-                'user_id': p.user_id,
-                'full_name': p.user.full_name,
-                'phone': p.user.phone,
-                'city': procurement.city,
-                'quantity': str(p.quantity),
-                'amount': str(p.amount),
-                'status': p.status,
-                'notes': p.notes,
-            })
-            total_amount += float(p.amount)
-
-        commission = float(procurement.commission_percent) / 100 * total_amount
-
-        return Response({
-            'procurement_id': procurement.id,
-            'procurement_title': procurement.title,
-            'supplier_id': procurement.supplier_id,
-            'unit': procurement.unit,
-            'total_participants': len(rows),
-            'total_amount': round(total_amount, 2),
-            'commission_percent': str(procurement.commission_percent),
-            'commission_amount': round(commission, 2),
-            'rows': rows,
-        })
+        receipt = get_receipt(procurement)
+
+        export_format = request.accepted_renderer.format
+        if export_format in ('csv', 'xlsx'):
+            if export_format == 'xlsx' and not OPENPYXL_AVAILABLE:
+                return Response(
+                    {'error': 'XLSX export requires openpyxl'},
+                    status=status.HTTP_501_NOT_IMPLEMENTED
+                )
+            return receipt_response(receipt, export_format)
+        return Response(receipt)
 
     @action(detail=True, methods=['post'])
     def send_to_supplier(self, request, pk=None):
@@ -573,12 +600,10 @@ class ProcurementViewSet(viewsets.ModelViewSet):
         Status flow: pending → processing → sent | failed_retry | fatal_error
         Full request/response payloads are logged to supplier_document_jobs for audit.
 
-        The actual HTTP call to the supplier API happens here synchronously (for simplicity).
-        In a high-load production system, move the HTTP call to a Celery/BullMQ worker that
-        reads from pending/failed_retry jobs.
+        The job is only enqueued here (202 Accepted); the HTTP call to the supplier API is
+        made by the `manage.py run_supplier_jobs` worker in the django-worker service
+        (see procurements.supplier_jobs).
         """
-        import requests as http_requests  # lazy import to avoid top-level side-effects
-
         procurement = self.get_object()
 
         organizer_id = request.data.get('organizer_id')
@@ -592,39 +617,8 @@ class ProcurementViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        # Build the document payload (snapshot at time of job creation)
-        participants = procurement.participants.filter(
-            is_active=True,
-            status__in=[Participant.Status.CONFIRMED, Participant.Status.PAID],
-        ).select_related('user')
-
-        rows = []
-        total_amount = 0
-        for p in participants:
-            rows.append({
-                'user_id': p.user_id,
-                'full_name': p.user.full_name,
-                'phone': p.user.phone,
-                'city': procurement.city,
-                'quantity': str(p.quantity),
-                'amount': str(p.amount),
-                'status': p.status,
-                'notes': p.notes,
-            })
-            total_amount += float(p.amount)
-
-        commission = float(procurement.commission_percent) / 100 * total_amount
-        doc_payload = {
-            'procurement_id': procurement.id,
-            'procurement_title': procurement.title,
-            'supplier_id': procurement.supplier_id,
-            'unit': procurement.unit,
-            'total_participants': len(rows),
-            'total_amount': round(total_amount, 2),
-            'commission_percent': str(procurement.commission_percent),
-            'commission_amount': round(commission, 2),
-            'rows': rows,
-        }
+        # Document payload: the receipt snapshot at time of job creation
+        doc_payload = get_receipt(procurement)
 
         # Create or retrieve existing job (idempotency)
         with db_transaction.atomic():
@@ -638,6 +632,7 @@ class ProcurementViewSet(viewsets.ModelViewSet):
                     'supplier_api_url': supplier_api_url,
                     'request_payload': doc_payload,
                     'retry_count': 0,
+                    'next_attempt_at': timezone.now(),
                 },
             )
 
@@ -655,65 +650,18 @@ class ProcurementViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_429_TOO_MANY_REQUESTS,
             )
 
-        # Mark as processing
-        job.status = SupplierDocumentJob.Status.PROCESSING
-        job.last_attempt_at = timezone.now()
-        job.save(update_fields=['status', 'last_attempt_at', 'updated_at'])
-
-        # Attempt delivery to supplier API
-        try:
-            if supplier_api_url:
-                resp = http_requests.post(
-                    supplier_api_url,
-                    json=doc_payload,
-                    timeout=30,
-                )
-                resp_payload = {}
-                try:
-                    resp_payload = resp.json()
-                except Exception:
-                    resp_payload = {'raw': resp.text[:2000]}
-
-                if resp.ok:
-                    job.status = SupplierDocumentJob.Status.SENT
-                    job.sent_at = timezone.now()
-                    job.response_payload = resp_payload
-                else:
-                    job.retry_count += 1
-                    if job.retry_count >= job.max_retries:
-                        job.status = SupplierDocumentJob.Status.FATAL_ERROR
-                    else:
-                        job.status = SupplierDocumentJob.Status.FAILED_RETRY
-                    job.response_payload = resp_payload
-                    job.error_message = f'HTTP {resp.status_code}: {resp.text[:500]}'
-            else:
-                # No supplier API URL configured — mark as sent (local delivery / webhook)
-                job.status = SupplierDocumentJob.Status.SENT
-                job.sent_at = timezone.now()
-                job.response_payload = {'note': 'No supplier_api_url provided; payload stored locally'}
-
-        except Exception as exc:
-            job.retry_count += 1
-            if job.retry_count >= job.max_retries:
-                job.status = SupplierDocumentJob.Status.FATAL_ERROR
-            else:
-                job.status = SupplierDocumentJob.Status.FAILED_RETRY
-            job.error_message = str(exc)[:1000]
-            logger.error(
-                'send_to_supplier job %s failed (attempt %s/%s): %s',
-                job.id, job.retry_count, job.max_retries, exc,
-            )
-
-        job.save(update_fields=['status', 'retry_count', 'response_payload',
-                                'error_message', 'sent_at', 'updated_at'])
+        if not created and job.status == SupplierDocumentJob.Status.FAILED_RETRY:
+            # Explicit resubmission: retry now instead of waiting out the backoff
+            job.next_attempt_at = timezone.now()
+            job.save(update_fields=['next_attempt_at', 'updated_at'])
 
-        response_status = status.HTTP_200_OK if job.status == SupplierDocumentJob.Status.SENT else status.HTTP_202_ACCEPTED
         return Response({
-            'success': job.status == SupplierDocumentJob.Status.SENT,
+            'success': False,
             'job_id': job.id,
             'status': job.status,
             'retry_count': job.retry_count,
-        }, status=response_status)
+            'next_attempt_at': job.next_attempt_at,
+        }, status=status.HTTP_202_ACCEPTED)
 
     @action(detail=True, methods=['post'])
     def close(self, request, pk=None):
@@ -778,6 +726,8 @@ class ParticipantViewSet(viewsets.ModelViewSet):
     """ViewSet for managing participants"""
     queryset = Participant.objects.select_related('user', 'procurement')
     serializer_class = ParticipantSerializer
+    # ?cursor= switches the list to keyset pagination over (procurement, created_at)
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -807,6 +757,11 @@ class ParticipantViewSet(viewsets.ModelViewSet):
             )
 
         participant.status = new_status
-        participant.save(update_fields=['status', 'updated_at'])
+        if new_status == Participant.Status.CANCELLED and participant.is_active:
+            # Cancelling a participation deactivates it, exactly like leave()
+            participant.is_active = False
+            participant.save(update_fields=['status', 'is_active', 'updated_at'])
+        else:
+            participant.save(update_fields=['status', 'updated_at'])
 
         return Response(ParticipantSerializer(participant).data)
@@ -0,0 +1,150 @@
+"""
+Read-through cache for user lookups.
+
+The bots resolve every inbound message to a user via ``by_platform`` /
+``check_exists``, which makes ``(platform, platform_user_id) -> user`` the
+hottest query in the Core API.  Lookups go through the configured Django cache
+(Redis in production):
+
+- ``users:id:<id>`` holds the serialized user (``UserSerializer`` data)
+- ``users:platform:<platform>:<platform_user_id>`` holds the user id, or
+  ``MISSING`` for identities that are not registered (short TTL)
+
+``User.save()`` / ``delete()`` invalidate both keys, and code that changes a
+user with ``QuerySet.update()`` must call :func:`invalidate_user`.  Cache
+errors fall back to the database so Redis outages never break lookups.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_TTL = getattr(settings, 'USER_CACHE_TTL', 300)
+# Unregistered identities are re-checked quickly so a fresh registration
+# from another process is visible even if an invalidation is lost.
+MISSING_USER_TTL = 10
+MISSING = 0
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _id_key(user_id):
+    return f'users:id:{user_id}'
+
+
+def _platform_key(platform, platform_user_id):
+    return f'users:platform:{platform}:{platform_user_id}'
+
+
+def _record(hit):
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+
+
+def _cache_get(key):
+    try:
+        return cache.get(key)
+    except Exception as e:
+        logger.warning(f"User cache read failed for {key}: {e}")
+        return None
+
+
+def _cache_set(key, value, timeout):
+    try:
+        cache.set(key, value, timeout)
+    except Exception as e:
+        logger.warning(f"User cache write failed for {key}: {e}")
+
+
+def _serialize(user):
+    from .serializers import UserSerializer
+    return dict(UserSerializer(user).data)
+
+
+def _load_by_id(user_id):
+    from .models import User
+
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return None
+    data = _serialize(user)
+    _cache_set(_id_key(user.pk), data, USER_CACHE_TTL)
+    return data
+
+
+def get_cached_user(user_id):
+    """Return serialized user data for ``user_id`` or None if it does not exist"""
+    data = _cache_get(_id_key(user_id))
+    _record(data is not None)
+    if data is not None:
+        return data
+    return _load_by_id(user_id)
+
+
+def get_cached_user_by_platform(platform, platform_user_id):
+    """Return serialized user data for a messenger identity or None"""
+    from .models import User
+
+    platform_key = _platform_key(platform, platform_user_id)
+    user_id = _cache_get(platform_key)
+    if user_id == MISSING:
+        _record(True)
+        return None
+    if user_id is not None:
+        data = _cache_get(_id_key(user_id))
+        if data is not None:
+            _record(True)
+            return data
+    _record(False)
+
+    user = User.objects.filter(platform=platform, platform_user_id=platform_user_id).first()
+    if user is None:
+        _cache_set(platform_key, MISSING, MISSING_USER_TTL)
+        return None
+    data = _serialize(user)
+    _cache_set(platform_key, user.pk, USER_CACHE_TTL)
+    _cache_set(_id_key(user.pk), data, USER_CACHE_TTL)
+    return data
+
+
+def _delete(keys):
+    try:
+        cache.delete_many(keys)
+    except Exception as e:
+        logger.warning(f"User cache invalidation failed for {keys}: {e}")
+
+
+def invalidate_user(user_id, platform=None, platform_user_id=None):
+    """
+    Drop cached entries for a user.
+
+    Keys are deleted immediately and again after the surrounding transaction
+    commits, so a concurrent reader cannot re-cache the pre-commit row.
+    """
+    keys = [_id_key(user_id)]
+    if platform and platform_user_id:
+        keys.append(_platform_key(platform, platform_user_id))
+    _delete(keys)
+    transaction.on_commit(lambda: _delete(keys))
+
+
+def cache_stats():
+    """Hit/miss counters of this process since start-up"""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0.0,
+    }
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats['hits'] = _stats['misses'] = 0
@@ -51,7 +51,8 @@ class User(models.Model):
     language_code = models.CharField(max_length=10, default='ru')
     is_active = models.BooleanField(default=True)
     is_verified = models.BooleanField(default=False)
-    # Ban fields — cached in Redis (10 s TTL) to protect DB from DDoS/scraping
+    # Ban fields — exposed through the user lookup cache (users.cache) so
+    # per-message ban checks do not hit the DB; save() invalidates it
     is_banned = models.BooleanField(default=False, db_index=True)
     banned_at = models.DateTimeField(null=True, blank=True)
     ban_reason = models.TextField(blank=True, default='')
@@ -80,10 +81,31 @@ class User(models.Model):
     def role_display(self):
         return dict(self.Role.choices).get(self.role, self.role)
 
-    def update_balance(self, amount):
-        """Update user balance (positive for credit, negative for debit)"""
-        self.balance += amount
-        self.save(update_fields=['balance', 'updated_at'])
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.invalidate_cache()
+
+    def delete(self, *args, **kwargs):
+        self.invalidate_cache()
+        return super().delete(*args, **kwargs)
+
+    def invalidate_cache(self):
+        """Drop this user's entries from the lookup cache"""
+        from .cache import invalidate_user
+        invalidate_user(self.pk, self.platform, self.platform_user_id)
+
+    def update_balance(self, amount, transaction_type=None, description=''):
+        """Update user balance (positive for credit, negative for debit)
+
+        Posts a ledger entry (payments.ledger), a bonus or withdrawal unless
+        ``transaction_type`` is given, and returns the new balance.
+        """
+        from payments.ledger import adjustment_type, post_entry
+
+        entry = post_entry(
+            self.pk, transaction_type or adjustment_type(amount), amount, description=description
+        )
+        self.balance = entry.balance_after
         return self.balance
 
 
@@ -20,9 +20,9 @@ class UserSerializer(serializers.ModelSerializer):
             'id', 'platform', 'platform_user_id', 'username',
             'first_name', 'last_name', 'full_name', 'phone', 'email',
             'role', 'role_display', 'balance', 'language_code',
-            'is_active', 'is_verified', 'created_at', 'updated_at'
+            'is_active', 'is_verified', 'is_banned', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'balance', 'is_verified', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'balance', 'is_verified', 'is_banned', 'created_at', 'updated_at']
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -3,14 +3,16 @@ Views for User API
 """
 import os
 import time
+from decimal import Decimal, InvalidOperation
 
 import jwt
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.db.models import Sum
 
+from .cache import get_cached_user, get_cached_user_by_platform
 from .models import User, UserSession
 from .serializers import (
     UserSerializer, UserRegistrationSerializer, UserProfileUpdateSerializer,
@@ -36,6 +38,9 @@ class UserViewSet(viewsets.ModelViewSet):
     - GET /api/users/{id}/balance/ - get user balance
     - POST /api/users/{id}/update_balance/ - update user balance
     - GET /api/users/{id}/role/ - get user role
+
+    Single-user reads (retrieve, by_platform, check_exists, role) are served
+    from the read-through cache in users.cache.
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -57,6 +62,14 @@ class UserViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(platform=platform)
         return queryset
 
+    def retrieve(self, request, *args, **kwargs):
+        """Get user details (cached)"""
+        pk = str(kwargs.get('pk', ''))
+        data = get_cached_user(int(pk)) if pk.isdigit() else None
+        if data is None:
+            raise Http404
+        return Response(data)
+
     @action(detail=False, methods=['get'])
     def by_platform(self, request):
         """Get user by platform and platform_user_id"""
@@ -69,13 +82,10 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        user = get_object_or_404(
-            User,
-            platform=platform,
-            platform_user_id=platform_user_id
-        )
-        serializer = self.get_serializer(user)
-        return Response(serializer.data)
+        data = get_cached_user_by_platform(platform, platform_user_id)
+        if data is None:
+            raise Http404
+        return Response(data)
 
     @action(detail=False, methods=['get'])
     def by_email(self, request):
@@ -145,35 +155,23 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        exists = User.objects.filter(
-            platform=platform,
-            platform_user_id=platform_user_id
-        ).exists()
+        exists = get_cached_user_by_platform(platform, platform_user_id) is not None
 
         return Response({'exists': exists})
 
     @action(detail=True, methods=['get'])
     def balance(self, request, pk=None):
         """Get user balance with statistics"""
-        from payments.models import Transaction
+        from payments.ledger import get_totals
         user = self.get_object()
 
-        # Calculate totals from Transaction records
-        deposits = user.transactions.filter(
-            transaction_type=Transaction.TransactionType.DEPOSIT
-        ).aggregate(total=Sum('amount'))['total'] or 0
-
-        spent = user.transactions.filter(
-            transaction_type__in=[
-                Transaction.TransactionType.WITHDRAWAL,
-                Transaction.TransactionType.PROCUREMENT_JOIN,
-            ]
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        # Running totals maintained by the ledger (payments.LedgerTotals)
+        totals = get_totals(user.pk)
 
         data = {
             'balance': user.balance,
-            'total_deposited': abs(deposits),
-            'total_spent': abs(spent),
+            'total_deposited': abs(totals.deposited),
+            'total_spent': abs(totals.spent),
             'available': user.balance,
         }
         serializer = UserBalanceSerializer(data)
@@ -192,14 +190,16 @@ class UserViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            amount = float(amount)
-        except (ValueError, TypeError):
+            amount = Decimal(str(amount))
+        except InvalidOperation:
+            amount = None
+        if amount is None or not amount.is_finite():
             return Response(
                 {'error': 'amount must be a number'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        new_balance = user.update_balance(amount)
+        new_balance = user.update_balance(amount, description=request.data.get('description', ''))
         return Response({
             'balance': new_balance,
             'message': 'Balance updated successfully'
@@ -208,10 +208,12 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def role(self, request, pk=None):
         """Get user role"""
-        user = self.get_object()
+        data = get_cached_user(int(pk)) if str(pk).isdigit() else None
+        if data is None:
+            raise Http404
         return Response({
-            'role': user.role,
-            'role_display': user.role_display
+            'role': data['role'],
+            'role_display': data['role_display']
         })
 
     @action(detail=True, methods=['get'])
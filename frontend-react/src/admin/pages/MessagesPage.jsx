@@ -62,7 +62,7 @@ export default function MessagesPage() {
         notificationData.title,
         notificationData.message
       );
-      addToast(`Уведомление отправлено ${result.sent} пользователям`, 'success');
+      addToast(`Рассылка уведомления запущена (задача #${result.job_id})`, 'success');
       setNotificationModal(false);
       setNotificationData({
         title: '',
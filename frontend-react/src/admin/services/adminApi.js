@@ -241,4 +241,5 @@ export const adminApi = {
         message,
       }),
     }),
+  getNotificationJob: (jobId) => request(`/notifications/jobs/${jobId}/`),
 };
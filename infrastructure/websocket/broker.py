@@ -0,0 +1,188 @@
+"""
+Message brokers for fanning chat messages out across ChatServer replicas.
+
+Every node publishes a room's messages once to the broker and only fans out
+to its own sockets when the broker delivers the message back.  A node
+subscribes to a room while it has at least one local socket in it (the
+broker reference-counts ``join``/``leave`` calls per room).
+
+- ``InMemoryBroker`` delivers within one process; several instances sharing
+  an ``InMemoryHub`` behave like several nodes (used by tests and
+  single-replica deployments without Redis).
+- ``RedisBroker`` uses Redis pub/sub with one channel per room.
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DeliveryHandler = Callable[[int, str], Awaitable[None]]
+
+
+class Broker(ABC):
+    """Base class: room reference counting on top of subscribe/unsubscribe"""
+
+    def __init__(self):
+        self._handler: Optional[DeliveryHandler] = None
+        self._room_refs: Dict[int, int] = {}
+
+    def set_handler(self, handler: DeliveryHandler):
+        """Register the coroutine called with (room, payload) on delivery"""
+        self._handler = handler
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def join(self, room: int) -> bool:
+        """Add a local reference to ``room``; subscribes on the first one"""
+        refs = self._room_refs.get(room, 0)
+        self._room_refs[room] = refs + 1
+        if refs == 0:
+            await self._subscribe(room)
+            return True
+        return False
+
+    async def leave(self, room: int) -> bool:
+        """Drop a local reference; unsubscribes when none are left"""
+        refs = self._room_refs.get(room, 0)
+        if refs <= 1:
+            self._room_refs.pop(room, None)
+            if refs == 1:
+                await self._unsubscribe(room)
+                return True
+            return False
+        self._room_refs[room] = refs - 1
+        return False
+
+    def is_subscribed(self, room: int) -> bool:
+        return room in self._room_refs
+
+    async def _deliver(self, room: int, payload: str):
+        if self._handler is None or room not in self._room_refs:
+            return
+        try:
+            await self._handler(room, payload)
+        except Exception as e:
+            logger.error(f"Error delivering message to room {room}: {e}")
+
+    @abstractmethod
+    async def publish(self, room: int, payload: str):
+        """Send ``payload`` to every node subscribed to ``room``"""
+
+    @abstractmethod
+    async def _subscribe(self, room: int):
+        """Start receiving ``room``'s messages on this node"""
+
+    @abstractmethod
+    async def _unsubscribe(self, room: int):
+        """Stop receiving ``room``'s messages on this node"""
+
+
+class InMemoryHub:
+    """Shared routing table for InMemoryBroker instances in one process"""
+
+    def __init__(self):
+        self.rooms: Dict[int, Set['InMemoryBroker']] = {}
+
+
+class InMemoryBroker(Broker):
+    """Process-local broker; brokers sharing a hub see each other's messages"""
+
+    def __init__(self, hub: Optional[InMemoryHub] = None):
+        super().__init__()
+        self.hub = hub or InMemoryHub()
+
+    async def publish(self, room: int, payload: str):
+        for broker in list(self.hub.rooms.get(room, ())):
+            await broker._deliver(room, payload)
+
+    async def _subscribe(self, room: int):
+        self.hub.rooms.setdefault(room, set()).add(self)
+
+    async def _unsubscribe(self, room: int):
+        brokers = self.hub.rooms.get(room)
+        if brokers is not None:
+            brokers.discard(self)
+            if not brokers:
+                del self.hub.rooms[room]
+
+
+class RedisBroker(Broker):
+    """Redis pub/sub broker with one ``chat:room:<id>`` channel per room"""
+
+    CHANNEL_PREFIX = 'chat:room:'
+
+    def __init__(self, redis_url: str):
+        super().__init__()
+        self.redis_url = redis_url
+        self._redis = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+
+    def _channel(self, room: int) -> str:
+        return f'{self.CHANNEL_PREFIX}{room}'
+
+    async def start(self):
+        import redis.asyncio as aioredis
+
+        self._redis = aioredis.from_url(self.redis_url)
+        self._pubsub = self._redis.pubsub()
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def close(self):
+        if self._reader:
+            self._reader.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    async def publish(self, room: int, payload: str):
+        await self._redis.publish(self._channel(room), payload)
+
+    async def _subscribe(self, room: int):
+        await self._pubsub.subscribe(self._channel(room))
+
+    async def _unsubscribe(self, room: int):
+        await self._pubsub.unsubscribe(self._channel(room))
+
+    async def _read_loop(self):
+        """Dispatch pub/sub messages to the delivery handler"""
+        while True:
+            try:
+                if not self._pubsub.subscribed:
+                    await asyncio.sleep(0.1)
+                    continue
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+                if not message:
+                    continue
+                channel = message['channel']
+                data = message['data']
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                if isinstance(data, bytes):
+                    data = data.decode()
+                room = int(channel[len(self.CHANNEL_PREFIX):])
+                await self._deliver(room, data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Redis broker read failed: {e}")
+                await asyncio.sleep(1)
+
+
+def create_broker(redis_url: Optional[str], kind: Optional[str] = None) -> Broker:
+    """Pick the broker from CHAT_BROKER ('redis' / 'memory'); Redis if a URL is set"""
+    kind = (kind or ('redis' if redis_url else 'memory')).lower()
+    if kind == 'redis':
+        if not redis_url:
+            raise ValueError('CHAT_BROKER=redis requires REDIS_URL')
+        return RedisBroker(redis_url)
+    return InMemoryBroker()
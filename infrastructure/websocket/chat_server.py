@@ -6,13 +6,21 @@ import asyncio
 import json
 import logging
 import os
+import time
+import uuid
+from collections import OrderedDict, deque
 from datetime import datetime
-from typing import Dict, Set, Optional
+from typing import Deque, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
 
 import aiohttp
 from aiohttp import web
 import jwt
 
+from broker import Broker, create_broker
+from fanout import FanOut
+from message_writer import MessageWriter
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -20,6 +28,167 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Redis channel on which the Core API announces participation changes
+# (see core/procurements/access_events.py)
+CHAT_ACCESS_CHANNEL = 'chat:access'
+
+
+class AccessCache:
+    """
+    In-process TTL + LRU cache of chat access decisions.
+
+    Granted and denied decisions have separate TTLs so a user who joins a
+    procurement right after being refused is not locked out for long.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0, negative_ttl: float = 5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[Hashable, Tuple[bool, float]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[bool]:
+        """Return the cached decision, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        allowed, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return allowed
+
+    def set(self, key: Hashable, allowed: bool):
+        ttl = self.ttl if allowed else self.negative_ttl
+        self._entries[key] = (allowed, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class HistoryBuffer:
+    """
+    Bounded per-room chat history.
+
+    Each room keeps at most ``maxlen`` recent messages in a deque together
+    with the keyset cursor of the persisted page just older than them.  Rooms
+    untouched for ``idle_ttl`` seconds are evicted by :meth:`evict_idle`, and
+    the least recently used room is dropped beyond ``max_rooms``, so memory
+    is O(active rooms x maxlen).
+    """
+
+    def __init__(self, maxlen: int = 50, idle_ttl: float = 600.0, max_rooms: int = 10000):
+        self.maxlen = maxlen
+        self.idle_ttl = idle_ttl
+        self.max_rooms = max_rooms
+        self._rooms: "OrderedDict[int, Deque[dict]]" = OrderedDict()
+        self._cursors: Dict[int, Optional[str]] = {}
+        self._touched: Dict[int, float] = {}
+
+    def __contains__(self, room: int) -> bool:
+        return room in self._rooms
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def _touch(self, room: int):
+        self._rooms.move_to_end(room)
+        self._touched[room] = time.monotonic()
+
+    def load(self, room: int, messages: Iterable[dict], cursor: Optional[str]):
+        """Seed a room from a persisted page (oldest first)"""
+        self._rooms[room] = deque(messages, maxlen=self.maxlen)
+        self._cursors[room] = cursor
+        self._touch(room)
+        while len(self._rooms) > self.max_rooms:
+            self.drop(next(iter(self._rooms)))
+
+    def append(self, room: int, message: dict) -> bool:
+        """Record a live message; ignored for rooms that were never loaded"""
+        history = self._rooms.get(room)
+        if history is None:
+            return False
+        if len(history) == history.maxlen:
+            # The oldest buffered message falls out, so the stored cursor no
+            # longer borders the buffer (and None, the start of the chat, is
+            # no longer buffered); '' restarts scroll-back from the newest
+            # persisted page instead
+            self._cursors[room] = ''
+        history.append(message)
+        self._touch(room)
+        return True
+
+    def recent(self, room: int) -> List[dict]:
+        history = self._rooms.get(room)
+        if history is None:
+            return []
+        self._touch(room)
+        return list(history)
+
+    def cursor(self, room: int) -> Optional[str]:
+        """Cursor of the next older page; None once the chat's start is buffered"""
+        return self._cursors.get(room)
+
+    def drop(self, room: int):
+        self._rooms.pop(room, None)
+        self._cursors.pop(room, None)
+        self._touched.pop(room, None)
+
+    def evict_idle(self, keep: Iterable[int] = ()) -> int:
+        """Drop rooms idle for longer than idle_ttl, except those in ``keep``"""
+        keep = set(keep)
+        deadline = time.monotonic() - self.idle_ttl
+        idle = [room for room, touched in self._touched.items()
+                if touched < deadline and room not in keep]
+        for room in idle:
+            self.drop(room)
+        return len(idle)
+
+
+class HeartbeatWheel:
+    """
+    Timing wheel that spreads heartbeats over one ping interval.
+
+    Sockets are placed in the slot the wheel points at when they connect and
+    come due one full revolution (``slots`` ticks) later, and again every
+    revolution after that.  A single task advances the wheel once per tick,
+    so the per-socket cost is a set entry instead of a sleeping task.
+    """
+
+    def __init__(self, slots: int = 30):
+        self.slots = slots
+        self._buckets: List[Set[Hashable]] = [set() for _ in range(slots)]
+        self._slot_of: Dict[Hashable, int] = {}
+        self._position = 0
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._slot_of
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def add(self, item: Hashable):
+        self.remove(item)
+        self._buckets[self._position].add(item)
+        self._slot_of[item] = self._position
+
+    def remove(self, item: Hashable):
+        slot = self._slot_of.pop(item, None)
+        if slot is not None:
+            self._buckets[slot].discard(item)
+
+    def advance(self) -> List[Hashable]:
+        """Move to the next slot and return the items due in it"""
+        self._position = (self._position + 1) % self.slots
+        return list(self._buckets[self._position])
+
 
 class ChatServer:
     """WebSocket server for procurement chats"""
@@ -28,6 +197,28 @@ class ChatServer:
     PING_INTERVAL = 30
     # Number of consecutive missed pongs before a connection is considered dead
     MAX_MISSED_PONGS = 2
+    # Heartbeat wheel resolution: ticks per PING_INTERVAL
+    HEARTBEAT_SLOTS = 30
+    # Messages per history page sent on connect / per scroll-back request,
+    # also the size of each room's in-memory ring buffer
+    HISTORY_PAGE_SIZE = int(os.getenv('CHAT_HISTORY_SIZE', '50'))
+    # Seconds between sweeps for idle history buffers
+    HISTORY_SWEEP_INTERVAL = 60
+    # Upper bound on concurrent HTTP connections to the Core API
+    HTTP_POOL_SIZE = int(os.getenv('CORE_API_POOL_SIZE', '50'))
+    # Outbound frames a client may lag behind before the slow-consumer
+    # policy applies ('disconnect' closes it, 'drop' skips frames)
+    SEND_QUEUE_SIZE = int(os.getenv('CHAT_SEND_QUEUE_SIZE', '256'))
+    SLOW_CONSUMER_POLICY = os.getenv('CHAT_SLOW_CONSUMER_POLICY', 'disconnect')
+    # Collapse queued typing indicators of the same user into the latest one
+    COALESCE_TYPING = os.getenv('CHAT_COALESCE_TYPING', '1') == '1'
+    # Write-behind persistence: messages per bulk insert and the longest a
+    # message waits (seconds) before its batch is flushed
+    PERSIST_BATCH_SIZE = int(os.getenv('CHAT_PERSIST_BATCH_SIZE', '100'))
+    PERSIST_FLUSH_INTERVAL = float(os.getenv('CHAT_PERSIST_FLUSH_INTERVAL', '0.2'))
+    # Unsaved messages held while the Core API is unreachable; beyond this
+    # new messages are refused
+    PERSIST_MAX_PENDING = int(os.getenv('CHAT_PERSIST_MAX_PENDING', '10000'))
 
     def __init__(self, host: str = '0.0.0.0', port: int = 8765):
         self.host = host
@@ -41,8 +232,18 @@ class ChatServer:
         # Tracks missed pong count per websocket to detect dead connections
         self._missed_pongs: Dict[web.WebSocketResponse, int] = {}
 
-        # Message history (in production, use Redis)
-        self.message_history: Dict[int, list] = {}
+        # Every socket is pinged from one wheel-driven task (see _heartbeat_loop)
+        self.heartbeats = HeartbeatWheel(self.HEARTBEAT_SLOTS)
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self.heartbeat_stats = {'pings': 0, 'reaped': 0}
+
+        # Recent messages per room, seeded from the Core API (chat_messages)
+        # on first use so history survives restarts and matches other replicas
+        self.message_history = HistoryBuffer(
+            maxlen=self.HISTORY_PAGE_SIZE,
+            idle_ttl=float(os.getenv('CHAT_HISTORY_IDLE_TTL', '600')),
+        )
+        self._history_sweeper: Optional[asyncio.Task] = None
 
         # Core API URL
         self.core_api_url = os.getenv('CORE_API_URL', 'http://localhost:8000/api')
@@ -50,18 +251,137 @@ class ChatServer:
         # JWT secret (in production, use env var)
         self.jwt_secret = os.getenv('JWT_SECRET', 'your-secret-key')
 
+        # Cached (user_id, procurement_id) -> access decisions; entries are
+        # dropped early when the Core API publishes on CHAT_ACCESS_CHANNEL
+        self.access_cache = AccessCache(
+            maxsize=int(os.getenv('ACCESS_CACHE_SIZE', '10000')),
+            ttl=float(os.getenv('ACCESS_CACHE_TTL', '60')),
+            negative_ttl=float(os.getenv('ACCESS_CACHE_NEGATIVE_TTL', '5')),
+        )
+        self.redis_url = os.getenv('REDIS_URL')
+
+        # Room fan-out across replicas: each message is published once to the
+        # broker and every node delivers it to its own sockets only
+        self.node_id = uuid.uuid4().hex
+        self.broker: Broker = create_broker(self.redis_url, os.getenv('CHAT_BROKER'))
+        self.broker.set_handler(self._deliver_local)
+
+        # Per-socket bounded send queues; broadcasts never wait on a client
+        self.fanout = FanOut(
+            max_queue=self.SEND_QUEUE_SIZE,
+            policy=self.SLOW_CONSUMER_POLICY,
+            on_broken=self._drop_socket,
+        )
+
+        # Single client session shared by all Core API calls
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._access_listener: Optional[asyncio.Task] = None
+
+        # Messages are broadcast immediately and persisted in batches
+        self.message_writer = MessageWriter(
+            self._post_message_batch,
+            batch_size=self.PERSIST_BATCH_SIZE,
+            flush_interval=self.PERSIST_FLUSH_INTERVAL,
+            max_pending=self.PERSIST_MAX_PENDING,
+        )
+
+        self.app.on_startup.append(self._on_startup)
+        self.app.on_cleanup.append(self._on_cleanup)
+
     def setup_routes(self):
         """Setup HTTP and WebSocket routes"""
         self.app.router.add_get('/health', self.health_check)
         self.app.router.add_get('/ws/procurement/{procurement_id}/', self.websocket_handler)
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared Core API session, creating it lazily"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.HTTP_POOL_SIZE),
+                timeout=aiohttp.ClientTimeout(total=10),
+            )
+        return self._session
+
+    async def _on_startup(self, app):
+        await self.broker.start()
+        self.message_writer.start()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        self._history_sweeper = asyncio.create_task(self._sweep_history())
+        if self.redis_url:
+            self._access_listener = asyncio.create_task(self._listen_access_changes())
+
+    async def _on_cleanup(self, app):
+        if self._access_listener:
+            self._access_listener.cancel()
+        if self._history_sweeper:
+            self._history_sweeper.cancel()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+        await self.message_writer.close()
+        await self.broker.close()
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    async def _sweep_history(self):
+        """Periodically evict history of rooms without recent activity"""
+        while True:
+            await asyncio.sleep(self.HISTORY_SWEEP_INTERVAL)
+            evicted = self.message_history.evict_idle(keep=self.connections.keys())
+            if evicted:
+                logger.info(f"Evicted history of {evicted} idle chats")
+
+    def handle_access_change(self, payload: str):
+        """Drop cached access decisions named in a CHAT_ACCESS_CHANNEL message"""
+        try:
+            data = json.loads(payload)
+            procurement_id = int(data['procurement_id'])
+            user_ids = [int(user_id) for user_id in data.get('user_ids', [])]
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Ignoring malformed access change: {payload!r}")
+            return
+        for user_id in user_ids:
+            self.access_cache.invalidate((user_id, procurement_id))
+
+    async def _listen_access_changes(self):
+        """Subscribe to CHAT_ACCESS_CHANNEL, reconnecting with backoff"""
+        import redis.asyncio as aioredis
+
+        delay = 1
+        while True:
+            try:
+                client = aioredis.from_url(self.redis_url)
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(CHAT_ACCESS_CHANNEL)
+                    delay = 1
+                    async for message in pubsub.listen():
+                        if message.get('type') == 'message':
+                            data = message['data']
+                            self.handle_access_change(
+                                data.decode() if isinstance(data, bytes) else data
+                            )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Access change subscription failed: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
     async def health_check(self, request):
         """Health check endpoint"""
-        return web.json_response({'status': 'healthy'})
+        return web.json_response({
+            'status': 'healthy',
+            'connections': len(self.heartbeats),
+            'heartbeat': dict(self.heartbeat_stats),
+            'fanout': dict(self.fanout.stats),
+            'persistence': dict(self.message_writer.stats, pending=len(self.message_writer)),
+        })
 
     async def websocket_handler(self, request):
         """Handle WebSocket connections"""
-        ws = web.WebSocketResponse()
+        # autoping=False hands PING/PONG frames to the loop below; with
+        # aiohttp's default autoping they never reach it and the missed-pong
+        # counter is never reset
+        ws = web.WebSocketResponse(autoping=False)
         await ws.prepare(request)
 
         procurement_id = int(request.match_info['procurement_id'])
@@ -97,6 +417,8 @@ class ChatServer:
             async for msg in ws:
                 if msg.type == aiohttp.WSMsgType.TEXT:
                     await self.handle_message(procurement_id, user_id, msg.data, ws)
+                elif msg.type == aiohttp.WSMsgType.PING:
+                    await ws.pong(msg.data)
                 elif msg.type == aiohttp.WSMsgType.PONG:
                     # Client is alive — reset the missed-pong counter
                     self._missed_pongs[ws] = 0
@@ -131,45 +453,75 @@ class ChatServer:
 
     async def check_procurement_access(self, user_id: int, procurement_id: int) -> bool:
         """Check if user has access to procurement chat"""
+        key = (user_id, procurement_id)
+        cached = self.access_cache.get(key)
+        if cached is not None:
+            return cached
+
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f'{self.core_api_url}/procurements/{procurement_id}/check_access/',
-                    json={'user_id': user_id}
-                ) as response:
-                    return response.status == 200
+            async with self._get_session().post(
+                f'{self.core_api_url}/procurements/{procurement_id}/check_access/',
+                json={'user_id': user_id}
+            ) as response:
+                if response.status == 200:
+                    self.access_cache.set(key, True)
+                    return True
+                if response.status in (403, 404):
+                    self.access_cache.set(key, False)
+                # Other errors are transient and not cached
+                return False
         except Exception as e:
             logger.error(f"Error checking access: {e}")
             return False
 
-    async def _heartbeat_loop(self, ws: web.WebSocketResponse, procurement_id: int):
-        """Send periodic pings and terminate connections that miss too many pongs.
+    async def _heartbeat_loop(self):
+        """Advance the heartbeat wheel once per tick and ping the sockets due.
 
-        aiohttp's WebSocketResponse automatically tracks pong responses; we count
-        how many consecutive intervals pass without a pong and close stale sockets.
+        Each socket is pinged once per PING_INTERVAL; a PONG resets its
+        counter (see websocket_handler) and sockets that miss more than
+        MAX_MISSED_PONGS pings in a row are closed.
         """
-        try:
-            while not ws.closed:
-                await asyncio.sleep(self.PING_INTERVAL)
-                if ws.closed:
-                    break
+        tick = self.PING_INTERVAL / self.heartbeats.slots
+        while True:
+            await asyncio.sleep(tick)
+            due = self.heartbeats.advance()
+            if due:
+                await self._heartbeat(due)
+
+    async def _heartbeat(self, sockets: List[web.WebSocketResponse]):
+        """Ping one slot of sockets concurrently and reap the stale ones"""
+        stale, alive = [], []
+        for ws in sockets:
+            missed = self._missed_pongs.get(ws, 0) + 1
+            self._missed_pongs[ws] = missed
+            if ws.closed or missed > self.MAX_MISSED_PONGS:
+                stale.append(ws)
+            else:
+                alive.append(ws)
+
+        results = await asyncio.gather(*(ws.ping() for ws in alive), return_exceptions=True)
+        for ws, result in zip(alive, results):
+            if isinstance(result, Exception):
+                logger.debug(f"Heartbeat ping failed: {result}")
+                stale.append(ws)
+            else:
+                self.heartbeat_stats['pings'] += 1
+
+        for ws in stale:
+            # Stop pinging now; unregister_connection runs when the handler exits
+            self.heartbeats.remove(ws)
+            if not ws.closed:
+                logger.warning(
+                    f"No pong from user {getattr(ws, 'user_id', '?')} after "
+                    f"{self.MAX_MISSED_PONGS} pings — closing."
+                )
                 try:
-                    await ws.ping()
-                    # Give the client one interval to reply before incrementing counter
-                    # aiohttp resets pong tracking on each ping; we maintain our own counter
-                    self._missed_pongs[ws] = self._missed_pongs.get(ws, 0) + 1
-                    if self._missed_pongs[ws] > self.MAX_MISSED_PONGS:
-                        logger.warning(
-                            f"No pong from user {getattr(ws, 'user_id', '?')} in "
-                            f"chat {procurement_id} after {self.MAX_MISSED_PONGS} pings — closing."
-                        )
-                        await ws.close(code=1001, message=b'Ping timeout')
-                        break
+                    await ws.close(code=1001, message=b'Ping timeout')
                 except Exception as e:
-                    logger.debug(f"Heartbeat ping failed: {e}")
-                    break
-        except asyncio.CancelledError:
-            pass
+                    logger.debug(f"Error closing stale socket: {e}")
+        if stale:
+            self.heartbeat_stats['reaped'] += len(stale)
+            logger.info(f"Reaped {len(stale)} stale connections")
 
     async def register_connection(
         self,
@@ -181,13 +533,17 @@ class ChatServer:
         if procurement_id not in self.connections:
             self.connections[procurement_id] = set()
 
-        # Store user_id on the websocket object
+        # Store user_id and room on the websocket object
         ws.user_id = user_id
+        ws.procurement_id = procurement_id
         self.connections[procurement_id].add(ws)
         self._missed_pongs[ws] = 0
 
-        # Start per-connection heartbeat task
-        asyncio.ensure_future(self._heartbeat_loop(ws, procurement_id))
+        # Subscribes this node to the room on its first local socket
+        await self.broker.join(procurement_id)
+
+        # First ping one PING_INTERVAL from now
+        self.heartbeats.add(ws)
 
         logger.info(f"User {user_id} connected to chat {procurement_id}")
 
@@ -206,6 +562,13 @@ class ChatServer:
                 del self.connections[procurement_id]
 
         self._missed_pongs.pop(ws, None)
+        self.heartbeats.remove(ws)
+        self.fanout.discard(ws)
+
+        if await self.broker.leave(procurement_id):
+            # No local sockets left: this node stops receiving the room's
+            # messages, so its buffered history would go stale
+            self.message_history.drop(procurement_id)
 
         logger.info(f"User {user_id} disconnected from chat {procurement_id}")
 
@@ -215,14 +578,75 @@ class ChatServer:
         ws: web.WebSocketResponse
     ):
         """Send message history to a new connection"""
-        if procurement_id in self.message_history:
-            # Send last 50 messages
-            history = self.message_history[procurement_id][-50:]
-            for msg in history:
-                try:
-                    await ws.send_json(msg)
-                except Exception as e:
-                    logger.error(f"Error sending history: {e}")
+        if procurement_id not in self.message_history:
+            # Nothing buffered since start-up: load the newest page from the
+            # Core API so reconnecting clients still see recent history
+            messages, next_cursor = await self.fetch_history_page(procurement_id)
+            self.message_history.load(procurement_id, messages, next_cursor)
+
+        for msg in self.message_history.recent(procurement_id):
+            try:
+                await ws.send_json(msg)
+            except Exception as e:
+                logger.error(f"Error sending history: {e}")
+
+    async def fetch_history_page(
+        self,
+        procurement_id: int,
+        cursor: str = ''
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Load one page of persisted messages via keyset pagination.
+
+        Returns the messages oldest-first in the same shape as live messages,
+        plus the cursor for the next (older) page or None at the beginning.
+        """
+        try:
+            async with self._get_session().get(
+                f'{self.core_api_url}/chat/messages/',
+                params={
+                    'procurement_id': procurement_id,
+                    'cursor': cursor,
+                    'page_size': self.HISTORY_PAGE_SIZE,
+                }
+            ) as response:
+                if response.status != 200:
+                    return [], None
+                data = await response.json()
+        except Exception as e:
+            logger.error(f"Error loading history: {e}")
+            return [], None
+
+        messages = [
+            {
+                'type': 'message',
+                'user_id': item.get('user'),
+                'text': item.get('text', ''),
+                'timestamp': item.get('created_at'),
+                'message_id': item.get('client_message_id') or item.get('id'),
+            }
+            for item in reversed(data.get('results', []))
+        ]
+        next_url = data.get('next')
+        next_cursor = parse_qs(urlparse(next_url).query).get('cursor', [None])[0] if next_url else None
+        return messages, next_cursor
+
+    async def send_older_history(
+        self,
+        procurement_id: int,
+        ws: web.WebSocketResponse,
+        cursor: Optional[str]
+    ):
+        """Answer a client scroll-back request with the next older page.
+
+        An empty cursor returns the newest persisted page (clients
+        de-duplicate by message_id); None means there is nothing older.
+        """
+        if cursor is None:
+            await ws.send_json({'type': 'history', 'messages': [], 'next_cursor': None})
+            return
+        messages, next_cursor = await self.fetch_history_page(procurement_id, cursor)
+        await ws.send_json({'type': 'history', 'messages': messages, 'next_cursor': next_cursor})
 
     async def handle_message(
         self,
@@ -241,25 +665,39 @@ class ChatServer:
                 if not text:
                     return
 
-                # Create message object
+                # Create message object; message_id doubles as the
+                # client_message_id that keeps persistence idempotent
                 message = {
                     'type': 'message',
                     'user_id': user_id,
                     'text': text,
                     'timestamp': datetime.now().isoformat(),
-                    'message_id': f"{user_id}_{datetime.now().timestamp()}"
+                    'message_id': uuid.uuid4().hex
                 }
 
-                # Save to history
-                if procurement_id not in self.message_history:
-                    self.message_history[procurement_id] = []
-                self.message_history[procurement_id].append(message)
+                # Queue for the next bulk insert via API; a message that
+                # cannot be saved is not shown to anyone
+                if not await self.save_message_to_db(
+                    procurement_id, user_id, text, message['message_id']
+                ):
+                    await sender_ws.send_json({
+                        'type': 'error',
+                        'message_id': message['message_id'],
+                        'error': 'Message could not be saved, try again later',
+                    })
+                    return
 
-                # Broadcast to all participants
+                # Broadcast to all participants (history is appended on
+                # delivery so every subscribed node records it)
                 await self.broadcast_message(procurement_id, message)
 
-                # Save to database via API
-                await self.save_message_to_db(procurement_id, user_id, text)
+            elif message_type == 'history':
+                # Scroll-back: 'before' is a next_cursor from a previous page;
+                # without one, continue from the page loaded on connect
+                cursor = data.get('before')
+                if cursor is None:
+                    cursor = self.message_history.cursor(procurement_id)
+                await self.send_older_history(procurement_id, sender_ws, cursor)
 
             elif message_type == 'typing':
                 # Broadcast typing indicator
@@ -285,22 +723,47 @@ class ChatServer:
         message: dict,
         exclude_ws: web.WebSocketResponse = None
     ):
-        """Broadcast message to all connections in a chat"""
-        if procurement_id not in self.connections:
-            return
-
-        message_json = json.dumps(message)
+        """Publish a message to every node serving the chat
 
-        for ws in list(self.connections[procurement_id]):
-            if ws is exclude_ws:
-                continue
-
-            try:
-                await ws.send_str(message_json)
-            except Exception as e:
-                logger.error(f"Error broadcasting message: {e}")
-                # Remove broken connection
-                self.connections[procurement_id].discard(ws)
+        The message is serialized once here and carried as a string, so
+        receiving nodes forward it to their sockets without re-encoding.
+        """
+        envelope = json.dumps({
+            'origin': self.node_id,
+            'exclude': id(exclude_ws) if exclude_ws is not None else None,
+            'type': message.get('type'),
+            'user_id': message.get('user_id'),
+            'message': json.dumps(message),
+        })
+        try:
+            await self.broker.publish(procurement_id, envelope)
+        except Exception as e:
+            logger.error(f"Error publishing message to chat {procurement_id}: {e}")
+
+    async def _deliver_local(self, procurement_id: int, payload: str):
+        """Queue a brokered message for this node's sockets in the chat"""
+        envelope = json.loads(payload)
+        message_json = envelope['message']
+        message_type = envelope.get('type')
+        if message_type == 'message':
+            self.message_history.append(procurement_id, json.loads(message_json))
+
+        # exclude_ws only identifies a socket on the publishing node
+        exclude = envelope.get('exclude') if envelope.get('origin') == self.node_id else None
+        sockets = self.connections.get(procurement_id, ())
+        if exclude is not None:
+            sockets = [ws for ws in sockets if id(ws) != exclude]
+
+        coalesce_key = None
+        if message_type == 'typing' and self.COALESCE_TYPING:
+            coalesce_key = ('typing', envelope.get('user_id'))
+        self.fanout.broadcast(sockets, message_json, coalesce_key)
+
+    def _drop_socket(self, ws: web.WebSocketResponse):
+        """Stop fanning out to a socket whose send failed or that lagged too far"""
+        sockets = self.connections.get(getattr(ws, 'procurement_id', None))
+        if sockets is not None:
+            sockets.discard(ws)
 
     async def broadcast_system_message(
         self,
@@ -320,21 +783,41 @@ class ChatServer:
         self,
         procurement_id: int,
         user_id: int,
-        text: str
-    ):
-        """Save message to database via Core API"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                await session.post(
-                    f'{self.core_api_url}/chat/messages/',
-                    json={
-                        'procurement_id': procurement_id,
-                        'user_id': user_id,
-                        'text': text
-                    }
+        text: str,
+        client_message_id: str
+    ) -> bool:
+        """Queue a message for the next bulk insert into the Core API; False if the queue is full"""
+        return self.message_writer.enqueue({
+            'procurement_id': procurement_id,
+            'user_id': user_id,
+            'text': text,
+            'client_message_id': client_message_id,
+        })
+
+    async def _post_message_batch(self, batch: List[dict]) -> bool:
+        """Store a batch via POST /chat/messages/bulk/; False means retry later"""
+        async with self._get_session().post(
+            f'{self.core_api_url}/chat/messages/bulk/',
+            json={'messages': batch}
+        ) as response:
+            if response.status >= 500:
+                logger.warning(f"Bulk message insert failed with {response.status}, will retry")
+                return False
+            if response.status >= 400:
+                # Retrying a rejected payload cannot succeed
+                logger.error(
+                    f"Bulk message insert rejected ({response.status}): {await response.text()}"
                 )
-        except Exception as e:
-            logger.error(f"Failed to save message to DB: {e}")
+                return True
+            result = await response.json()
+            stats = self.message_writer.stats
+            # Repeats of an earlier, timed-out attempt come back as duplicates
+            stats['created'] += result.get('created', 0)
+            stats['duplicates'] += result.get('duplicates', 0)
+            for rejected in result.get('rejected', []):
+                stats['rejected'] += 1
+                logger.warning(f"Message not stored: {rejected}")
+            return True
 
     async def run(self):
         """Run the WebSocket server"""
@@ -346,7 +829,10 @@ class ChatServer:
         logger.info(f"Chat server started on {self.host}:{self.port}")
 
         # Keep running
-        await asyncio.Event().wait()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
 
 
 async def main():
@@ -0,0 +1,156 @@
+"""
+Concurrent fan-out of pre-serialized frames to WebSocket clients.
+
+Each socket gets a bounded outbound queue drained by its own short-lived
+writer task (started when the queue becomes non-empty, finished when it is
+drained), so a broadcast only appends the already-serialized payload to every
+queue and never waits for a slow client.
+
+A consumer whose queue exceeds ``max_queue`` frames is either disconnected
+(``policy='disconnect'``, close code 1013) or loses the new frame
+(``policy='drop'``).  Frames sent with a ``coalesce_key`` (e.g. typing
+indicators per user) replace a still-queued frame with the same key instead
+of queueing behind it.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+POLICY_DISCONNECT = 'disconnect'
+POLICY_DROP = 'drop'
+
+
+class _Outbox:
+    __slots__ = ('frames', 'keyed', 'writer')
+
+    def __init__(self):
+        # Each frame is a mutable [coalesce_key, payload] cell so a coalesced
+        # frame can be replaced in place
+        self.frames: Deque[List[Any]] = deque()
+        self.keyed: Dict[Hashable, List[Any]] = {}
+        self.writer: Optional[asyncio.Task] = None
+
+
+class FanOut:
+    """Per-socket bounded outbound queues with slow-consumer handling"""
+
+    def __init__(
+        self,
+        max_queue: int = 256,
+        policy: str = POLICY_DISCONNECT,
+        on_broken: Optional[Callable[[Any], None]] = None,
+    ):
+        if policy not in (POLICY_DISCONNECT, POLICY_DROP):
+            raise ValueError(f'Unknown slow consumer policy: {policy}')
+        self.max_queue = max_queue
+        self.policy = policy
+        # Called with a socket whose send failed or that was disconnected
+        self.on_broken = on_broken
+        self._outboxes: Dict[Any, _Outbox] = {}
+        # Close tasks of disconnected slow consumers, referenced until done
+        # (the event loop only keeps weak references to tasks)
+        self._closing: Set[asyncio.Task] = set()
+        self.stats = {'sent': 0, 'coalesced': 0, 'dropped': 0, 'disconnected': 0, 'failed': 0}
+
+    def pending(self, ws) -> int:
+        outbox = self._outboxes.get(ws)
+        return len(outbox.frames) if outbox else 0
+
+    def broadcast(
+        self,
+        sockets: Iterable[Any],
+        payload: str,
+        coalesce_key: Optional[Hashable] = None,
+    ) -> int:
+        """Queue ``payload`` for every socket; returns how many accepted it"""
+        return sum(self.send(ws, payload, coalesce_key) for ws in list(sockets))
+
+    def send(self, ws, payload: str, coalesce_key: Optional[Hashable] = None) -> bool:
+        if ws.closed:
+            return False
+        outbox = self._outboxes.get(ws)
+        if outbox is None:
+            outbox = self._outboxes[ws] = _Outbox()
+
+        if coalesce_key is not None:
+            queued = outbox.keyed.get(coalesce_key)
+            if queued is not None:
+                queued[1] = payload
+                self.stats['coalesced'] += 1
+                return True
+
+        if len(outbox.frames) >= self.max_queue:
+            self._overflow(ws)
+            return False
+
+        cell = [coalesce_key, payload]
+        outbox.frames.append(cell)
+        if coalesce_key is not None:
+            outbox.keyed[coalesce_key] = cell
+        if outbox.writer is None:
+            outbox.writer = asyncio.create_task(self._drain(ws, outbox))
+        return True
+
+    def _overflow(self, ws):
+        if self.policy == POLICY_DROP:
+            self.stats['dropped'] += 1
+            return
+        logger.warning(
+            f"Disconnecting slow consumer (user {getattr(ws, 'user_id', '?')}): "
+            f"{self.max_queue} frames behind"
+        )
+        self.stats['disconnected'] += 1
+        self.discard(ws)
+        task = asyncio.create_task(self._close(ws))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+        self._broken(ws)
+
+    async def _close(self, ws):
+        try:
+            await ws.close(code=1013, message=b'Too slow')
+        except Exception as e:
+            logger.debug(f"Error closing slow consumer: {e}")
+
+    def _broken(self, ws):
+        if self.on_broken is not None:
+            self.on_broken(ws)
+
+    async def _drain(self, ws, outbox: _Outbox):
+        try:
+            while outbox.frames:
+                cell = outbox.frames.popleft()
+                key, payload = cell
+                if key is not None and outbox.keyed.get(key) is cell:
+                    del outbox.keyed[key]
+                await ws.send_str(payload)
+                self.stats['sent'] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending to websocket: {e}")
+            self.stats['failed'] += 1
+            self._outboxes.pop(ws, None)
+            self._broken(ws)
+            return
+        outbox.writer = None
+        if self._outboxes.get(ws) is outbox and not outbox.frames:
+            del self._outboxes[ws]
+
+    def discard(self, ws):
+        """Forget a socket and cancel its pending frames"""
+        outbox = self._outboxes.pop(ws, None)
+        if outbox is not None and outbox.writer is not None:
+            outbox.writer.cancel()
+
+    async def flush(self):
+        """Wait until every queued frame has been written (or failed) and slow consumers are closed"""
+        while True:
+            tasks = [o.writer for o in self._outboxes.values() if o.writer is not None]
+            tasks += self._closing
+            if not tasks:
+                return
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,127 @@
+"""
+Write-behind persistence of chat messages.
+
+ChatServer enqueues every message instead of POSTing it individually; a
+background task flushes batches to ``POST /api/chat/messages/bulk/`` when
+``batch_size`` messages are waiting or ``flush_interval`` seconds after the
+first one arrived.  Failed batches are retried with exponential backoff and
+stay at the head of the queue, so delivery is at-least-once; the Core API
+discards repeats by ``client_message_id``.
+
+At most ``max_pending`` messages wait in the queue: while the Core API is
+down, :meth:`MessageWriter.enqueue` refuses new messages instead of letting
+memory grow, and counts them in ``stats['dropped']``.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Returns True when the batch is stored (or permanently rejected) and can be
+# dropped from the queue, False to retry it later
+BatchSender = Callable[[List[dict]], Awaitable[bool]]
+
+
+class MessageWriter:
+    """Batching write-behind queue with retry/backoff"""
+
+    def __init__(
+        self,
+        send_batch: BatchSender,
+        batch_size: int = 100,
+        flush_interval: float = 0.2,
+        max_backoff: float = 30.0,
+        max_pending: int = 10000,
+    ):
+        self.send_batch = send_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.max_pending = max_pending
+        self._pending: Deque[dict] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._dropping = False
+        # 'created' / 'duplicates' / 'rejected' are counted by the sender from
+        # the bulk endpoint's response; 'dropped' by enqueue
+        self.stats = {'created': 0, 'duplicates': 0, 'rejected': 0, 'dropped': 0}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def enqueue(self, message: dict) -> bool:
+        """Queue a message; False (and it is not queued) when max_pending are waiting"""
+        if len(self._pending) >= self.max_pending:
+            self.stats['dropped'] += 1
+            if not self._dropping:
+                self._dropping = True
+                logger.error(
+                    f"Chat persistence queue full ({self.max_pending} messages); "
+                    f"refusing new messages until it drains"
+                )
+            return False
+        if self._dropping:
+            self._dropping = False
+            logger.warning(
+                f"Chat persistence queue accepting messages again "
+                f"({self.stats['dropped']} refused so far)"
+            )
+        self._pending.append(message)
+        if len(self._pending) >= self.batch_size or len(self._pending) == 1:
+            self._wakeup.set()
+        return True
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the background task and try once to flush what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._pending:
+            if not await self.flush():
+                logger.error(f"Dropping {len(self._pending)} unsaved chat messages on shutdown")
+                break
+
+    async def flush(self) -> bool:
+        """Send one batch from the head of the queue; False if it must be retried"""
+        if not self._pending:
+            return True
+        batch = [self._pending[i] for i in range(min(self.batch_size, len(self._pending)))]
+        try:
+            stored = await self.send_batch(batch)
+        except Exception as e:
+            logger.error(f"Failed to persist chat messages: {e}")
+            stored = False
+        if stored:
+            for _ in batch:
+                self._pending.popleft()
+        return stored
+
+    async def _run(self):
+        backoff = self.flush_interval
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            if len(self._pending) < self.batch_size:
+                # Give the batch a chance to fill up
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            if await self.flush():
+                backoff = self.flush_interval
+            else:
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
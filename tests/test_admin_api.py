@@ -3,6 +3,7 @@ Tests for Admin API
 """
 import pytest
 from django.contrib.auth.models import User as DjangoUser
+from django.test import override_settings
 from rest_framework.test import APITestCase
 from rest_framework import status
 
@@ -471,6 +472,86 @@ class AdminCategoryManagementTests(APITestCase):
         self.assertFalse(Category.objects.filter(id=category.id).exists())
 
 
+class AdminListQueryCountTests(APITestCase):
+    """Admin user and category lists read their statistics from annotations"""
+
+    def setUp(self):
+        from procurements.models import Category
+
+        DjangoUser.objects.create_user(username='admin', password='adminpass123', is_staff=True)
+        self.client.login(username='admin', password='adminpass123')
+        self.category = Category.objects.create(name='Food')
+        self.organizer = self._user('org', role='organizer')
+
+    def _user(self, suffix, **kwargs):
+        from users.models import User
+        return User.objects.create(platform='telegram', platform_user_id=f'qc_{suffix}', **kwargs)
+
+    def _add_users(self, n):
+        from datetime import timedelta
+        from decimal import Decimal
+        from django.utils import timezone
+        from payments.models import Transaction
+        from procurements.models import Participant, Procurement
+
+        for _ in range(n):
+            user = self._user(Participant.objects.count())
+            procurement = Procurement.objects.create(
+                title='P', description='x', organizer=self.organizer, category=self.category,
+                city='Moscow', target_amount=Decimal('1000'),
+                deadline=timezone.now() + timedelta(days=7),
+            )
+            Participant.objects.create(
+                procurement=procurement, user=user, quantity=1, amount=Decimal('10')
+            )
+            for kind, amount in (('procurement_join', '-30.00'), ('procurement_join', '-20.00'),
+                                 ('deposit', '100.00')):
+                Transaction.objects.create(
+                    user=user, transaction_type=kind, amount=Decimal(amount),
+                    balance_after=Decimal('0'),
+                )
+
+    def _queries(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries), response.data['results']
+
+    def test_user_list_query_count_is_constant(self):
+        self._add_users(2)
+        small, _ = self._queries('/api/admin/users/')
+        self._add_users(8)
+        large, results = self._queries('/api/admin/users/')
+        self.assertEqual(small, large)
+
+        by_id = {row['id']: row for row in results}
+        self.assertEqual(by_id[self.organizer.id]['organized_count'], 10)
+        buyer = next(row for row in results if row['id'] != self.organizer.id)
+        self.assertEqual(buyer['participations_count'], 1)
+        self.assertEqual(buyer['total_spent'], 50)
+
+    def test_category_list_query_count_is_constant(self):
+        from procurements.models import Category
+
+        self._add_users(3)
+        small, _ = self._queries('/api/admin/categories/')
+        for i in range(10):
+            Category.objects.create(name=f'Extra {i}')
+        large, results = self._queries('/api/admin/categories/')
+        self.assertEqual(small, large)
+        self.assertEqual(
+            next(row for row in results if row['id'] == self.category.id)['procurements_count'], 3
+        )
+
+    def test_created_category_has_count(self):
+        response = self.client.post('/api/admin/categories/', {'name': 'New'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['procurements_count'], 0)
+
+
 class AdminNotificationTests(APITestCase):
     """Tests for Admin notification endpoints"""
 
@@ -497,18 +578,23 @@ class AdminNotificationTests(APITestCase):
             is_active=True
         )
 
+    @override_settings(NOTIFICATION_JOBS_INLINE=True)
     def test_send_bulk_notification(self):
         """Test sending bulk notification to all users"""
         self.client.login(username='admin', password='adminpass123')
 
         url = '/api/admin/notifications/send_bulk/'
-        response = self.client.post(url, {
-            'notification_type': 'system',
-            'title': 'Test Notification',
-            'message': 'This is a test notification'
-        }, format='json')
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data['sent'], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {
+                'notification_type': 'system',
+                'title': 'Test Notification',
+                'message': 'This is a test notification'
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        job = self.client.get(f"/api/admin/notifications/jobs/{response.data['job_id']}/")
+        self.assertEqual(job.data['status'], 'done')
+        self.assertEqual(job.data['processed'], 2)
 
         # Verify notifications were created
         from chat.models import Notification
@@ -0,0 +1,172 @@
+"""
+Tests for the background CSV / XLSX exports of admin payments, transactions
+and users (GET /api/admin/<list>/export/?format=csv|xlsx, run by
+admin_api.export_jobs and downloaded from /api/admin/exports/{id}/download/).
+"""
+import csv
+import importlib.util
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth.models import User as DjangoUser
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+OPENPYXL_INSTALLED = importlib.util.find_spec('openpyxl') is not None
+
+
+@override_settings(ADMIN_EXPORTS_INLINE=True)
+class AdminExportTests(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        from users.models import User
+        from payments.models import Payment, Transaction
+
+        DjangoUser.objects.create_user(username='admin', password='adminpass123', is_staff=True)
+        self.client.login(username='admin', password='adminpass123')
+        self.user = User.objects.create(
+            platform='telegram', platform_user_id='exp1', first_name='Иван', phone='+79990001122'
+        )
+        self.other = User.objects.create(platform='telegram', platform_user_id='exp2', first_name='=cmd()')
+        for status, amount in (('succeeded', '100.00'), ('failed', '20.00'), ('succeeded', '5.50')):
+            Payment.objects.create(
+                user=self.user, payment_type='deposit', amount=Decimal(amount), status=status
+            )
+        Transaction.objects.create(
+            user=self.other, transaction_type='procurement_join', amount=Decimal('-30.00'),
+            balance_after=Decimal('70.00'), description='join',
+        )
+
+    def _download(self, url, params=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 202)
+        job = self.client.get(response.data['status_url']).data
+        self.assertEqual(job['status'], 'done')
+        response = self.client.get(job['download_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        return b''.join(response.streaming_content)
+
+    def _csv(self, url, params=None):
+        body = self._download(url, params).decode('utf-8-sig')
+        return list(csv.DictReader(io.StringIO(body)))
+
+    def test_payments_csv_honours_filters(self):
+        rows = self._csv('/api/admin/payments/export/', {'format': 'csv', 'status': 'succeeded'})
+        self.assertEqual(sorted(row['amount'] for row in rows), ['100.00', '5.50'])
+        self.assertEqual(rows[0]['user_first_name'], 'Иван')
+
+    def test_csv_is_the_default_format(self):
+        rows = self._csv('/api/admin/transactions/export/')
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['amount'], rows[0]['transaction_type']), ('-30.00', 'procurement_join'))
+
+    def test_users_csv_escapes_formulas(self):
+        rows = self._csv('/api/admin/users/export/', {'format': 'csv'})
+        by_id = {row['platform_user_id']: row for row in rows}
+        self.assertEqual(by_id['exp2']['first_name'], "'=cmd()")
+        self.assertEqual(by_id['exp1']['phone'], '+79990001122')
+
+    def test_user_export_skips_list_statistics(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self._csv('/api/admin/users/export/', {'format': 'csv'})
+        export_sql = [q['sql'] for q in ctx.captured_queries if 'FROM "users"' in q['sql']]
+        self.assertTrue(export_sql)
+        self.assertFalse(any('transactions' in sql for sql in export_sql))
+
+    def test_requires_admin_and_known_format(self):
+        self.assertEqual(
+            self.client.get('/api/admin/payments/export/', {'format': 'pdf'}).status_code, 404
+        )
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/admin/payments/export/').status_code, 403)
+
+    @override_settings(ADMIN_EXPORTS_INLINE=False)
+    def test_export_is_queued_for_the_worker(self):
+        from admin_api.models import ExportJob
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get('/api/admin/payments/export/', {'format': 'csv', 'status': 'failed'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertIsNone(response.data['download_url'])
+        job = ExportJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual(job.params, {'status': 'failed'})
+        self.assertEqual(self.client.get(f'/api/admin/exports/{job.id}/download/').status_code, 409)
+
+        out = StringIO()
+        call_command('run_export_jobs', stdout=out)
+        self.assertIn('Ran 1 jobs', out.getvalue())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows), ('done', 1))
+        download = self.client.get(self.client.get(f'/api/admin/exports/{job.id}/').data['download_url'])
+        rows = list(csv.DictReader(io.StringIO(b''.join(download.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual([row['amount'] for row in rows], ['20.00'])
+
+    def test_progress_saved_per_chunk(self):
+        from admin_api.models import ExportJob
+
+        with patch('admin_api.exports.CHUNK_SIZE', 2), \
+                patch('admin_api.export_jobs.ExportJob.objects.filter', wraps=ExportJob.objects.filter) as updates:
+            rows = self._csv('/api/admin/payments/export/', {'format': 'csv'})
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(ExportJob.objects.get().rows, 3)
+        # claim, progress after 2 rows and at the end, done
+        self.assertEqual(updates.call_count, 4)
+
+    def test_expired_files_purged(self):
+        from admin_api.export_jobs import purge_expired
+        from admin_api.models import ExportJob
+
+        self._csv('/api/admin/transactions/export/')
+        job = ExportJob.objects.get()
+        path = job.file.path
+        self.assertEqual(purge_expired(), 0)
+        ExportJob.objects.filter(pk=job.pk).update(finished_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(purge_expired(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.file.name, '')
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.client.get(f'/api/admin/exports/{job.id}/download/').status_code, 410)
+
+    def test_xlsx_without_openpyxl(self):
+        with patch('admin_api.views.OPENPYXL_AVAILABLE', False):
+            response = self.client.get('/api/admin/payments/export/', {'format': 'xlsx'})
+        self.assertEqual(response.status_code, 501)
+
+    @pytest.mark.skipif(not OPENPYXL_INSTALLED, reason="openpyxl not installed")
+    def test_payments_xlsx(self):
+        from openpyxl import load_workbook
+
+        body = self._download('/api/admin/payments/export/', {'format': 'xlsx', 'status': 'failed'})
+        sheet = load_workbook(io.BytesIO(body)).active
+        rows = list(sheet.values)
+        self.assertEqual(rows[0][0], 'id')
+        self.assertEqual(len(rows), 2)
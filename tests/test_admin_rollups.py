@@ -0,0 +1,175 @@
+"""
+Tests for the admin metric rollups (admin_api.rollups) and the dashboard /
+analytics views reading from them.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User as DjangoUser
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+
+class MetricRollupTests(APITestCase):
+
+    def setUp(self):
+        from users.models import User
+        from procurements.models import Category
+
+        DjangoUser.objects.create_user(username='admin', password='adminpass123', is_staff=True)
+        self.client.login(username='admin', password='adminpass123')
+        self.now = timezone.now()
+        self.category = Category.objects.create(name='Food', icon='F', is_active=True)
+        self.other_category = Category.objects.create(name='Toys', icon='T', is_active=True)
+        self.organizer = User.objects.create(
+            platform='telegram', platform_user_id='ru_org', first_name='Org', role='organizer'
+        )
+        self._age(self.organizer, days=10)
+        self.buyers = []
+        for days in (0, 2, 2, 40):
+            buyer = User.objects.create(
+                platform='websocket', platform_user_id=f'ru_{len(self.buyers)}', role='buyer'
+            )
+            self._age(buyer, days=days)
+            self.buyers.append(buyer)
+        self._procurement(self.category, days=3, status='active')
+        self._procurement(self.category, days=1, status='completed')
+        self._payment(self.buyers[1], '100.00', days=2)
+        self._payment(self.buyers[2], '50.00', days=0)
+        self._payment(self.buyers[3], '10.00', days=1, status='failed')
+
+    def _age(self, obj, days, field='created_at'):
+        type(obj).objects.filter(pk=obj.pk).update(**{field: self.now - timedelta(days=days)})
+
+    def _procurement(self, category, days, status='active'):
+        from procurements.models import Procurement
+
+        procurement = Procurement.objects.create(
+            title='P', description='x', organizer=self.organizer, category=category, city='Moscow',
+            target_amount=Decimal('1000'), deadline=self.now + timedelta(days=30), status=status,
+        )
+        self._age(procurement, days)
+        return procurement
+
+    def _payment(self, user, amount, days, status='succeeded'):
+        from payments.models import Payment
+
+        payment = Payment.objects.create(
+            user=user, payment_type='deposit', amount=Decimal(amount), status=status,
+            paid_at=self.now - timedelta(days=days) if status == 'succeeded' else None,
+        )
+        self._age(payment, days)
+        return payment
+
+    def _dashboard(self):
+        response = self.client.get('/api/admin/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def _analytics(self, **params):
+        response = self.client.get('/api/admin/analytics/', params)
+        self.assertEqual(response.status_code, 200)
+        response.data.pop('date_to')  # defaults to now
+        return response.data
+
+    def test_dashboard_same_from_raw_tables_and_rollups(self):
+        from admin_api.rollups import build_rollups
+
+        raw = self._dashboard()
+        self.assertEqual(raw['total_users'], 5)
+        self.assertEqual(raw['new_users_week'], 3)
+        self.assertEqual(raw['new_users_month'], 4)
+        self.assertEqual(raw['total_revenue'], '150.00')
+        self.assertEqual(raw['revenue_week'], '150.00')
+        self.assertEqual(raw['payments_by_status'], {'succeeded': 2, 'failed': 1})
+
+        build_rollups()
+        self.assertEqual(self._dashboard(), raw)
+
+    def test_dashboard_reads_rollups_not_history(self):
+        from admin_api.rollups import build_rollups
+        from users.models import User
+
+        build_rollups()
+        # Rows behind the checkpoint are only read through the rollups
+        User.objects.filter(pk=self.buyers[3].pk).delete()
+        self.assertEqual(self._dashboard()['total_users'], 5)
+
+    def test_rows_after_checkpoint_are_added(self):
+        from admin_api.rollups import build_rollups
+        from users.models import User
+
+        build_rollups(now=self.now - timedelta(hours=1))
+        User.objects.create(platform='telegram', platform_user_id='ru_late', role='buyer')
+        self._payment(self.buyers[0], '5.00', days=0)
+
+        data = self._dashboard()
+        self.assertEqual(data['total_users'], 6)
+        self.assertEqual(data['users_by_role'], {'organizer': 1, 'buyer': 5})
+        self.assertEqual(data['total_revenue'], '155.00')
+        self.assertEqual(data['total_payments'], 4)
+
+    def test_incremental_build_picks_up_late_rows(self):
+        from admin_api.models import MetricRollup, RollupCheckpoint
+        from admin_api.rollups import build_rollups
+
+        build_rollups()
+        # A payment confirmed late, with paid_at inside the lookback window
+        self._payment(self.buyers[0], '7.00', days=1)
+        build_rollups(lookback_days=2)
+
+        revenue = MetricRollup.objects.filter(granularity='day', metric='revenue')
+        self.assertEqual(sum(r.amount for r in revenue), Decimal('107.00'))
+        self.assertEqual(RollupCheckpoint.objects.count(), 1)
+        self.assertEqual(self._dashboard()['total_revenue'], '157.00')
+
+    def test_snapshots_rebuilt_once_per_interval(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from admin_api.rollups import build_rollups
+
+        build_rollups(now=self.now - timedelta(hours=1))
+        with CaptureQueriesContext(connection) as ctx:
+            build_rollups(now=self.now - timedelta(hours=1))
+        self.assertFalse(any('"users"."role"' in q['sql'] for q in ctx.captured_queries))
+
+        User = type(self.organizer)
+        User.objects.filter(pk=self.buyers[1].pk).update(role='organizer')
+        self.assertEqual(self._dashboard()['users_by_role'], {'organizer': 1, 'buyer': 4})
+        with CaptureQueriesContext(connection) as ctx:
+            build_rollups()
+        self.assertTrue(any('"users"."role"' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(self._dashboard()['users_by_role'], {'organizer': 2, 'buyer': 3})
+
+    def test_analytics_same_from_raw_tables_and_rollups(self):
+        from admin_api.rollups import build_rollups
+
+        for period in ('day', 'week', 'month'):
+            params = {'date_from': (self.now - timedelta(days=60)).strftime('%Y-%m-%d'), 'period': period}
+            raw = self._analytics(**params)
+            build_rollups()
+            self.assertEqual(self._analytics(**params), raw)
+            self.assertEqual(raw['funnel']['registered'], 5)
+            self.assertEqual(sum(e['count'] for e in raw['user_registrations']), 5)
+            self.assertEqual(sum(e['total'] for e in raw['revenue']), 150.0)
+
+    def test_top_categories_merge_new_rows(self):
+        from admin_api.rollups import build_rollups
+
+        build_rollups()
+        for _ in range(3):
+            self._procurement(self.other_category, days=0)
+
+        data = self._analytics()
+        self.assertEqual(
+            [(c['name'], c['procurement_count']) for c in data['top_categories']],
+            [('Toys', 3), ('Food', 2)],
+        )
+        self.assertEqual(data['top_organizers'][0]['procurement_count'], 5)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('build_rollups', stdout=out)
+        self.assertIn('Rollups are up to date', out.getvalue())
@@ -0,0 +1,144 @@
+"""
+Tests for asynchronous, batched bulk notification fan-out
+(chat.bulk_notifications and POST /api/admin/notifications/send_bulk/).
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User as DjangoUser
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+
+class BulkNotificationFanOutTests(APITestCase):
+
+    def setUp(self):
+        from users.models import User
+
+        DjangoUser.objects.create_user(username='admin', password='adminpass123', is_staff=True)
+        self.client.login(username='admin', password='adminpass123')
+        self.users = [
+            User.objects.create(platform='telegram', platform_user_id=f'bn{i}', is_active=True)
+            for i in range(5)
+        ]
+        User.objects.create(platform='telegram', platform_user_id='bn_inactive', is_active=False)
+
+    def _job(self, **kwargs):
+        from chat.models import BulkNotificationJob
+
+        defaults = {'notification_type': 'system', 'title': 'T', 'message': 'M'}
+        defaults.update(kwargs)
+        return BulkNotificationJob.objects.create(**defaults)
+
+    def test_send_bulk_returns_before_fan_out(self):
+        from chat.models import BulkNotificationJob, Notification
+
+        with patch('admin_api.views.enqueue_job') as enqueue:
+            response = self.client.post('/api/admin/notifications/send_bulk/', {
+                'title': 'Hello', 'message': 'World',
+            }, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+        enqueue.assert_called_once()
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertTrue(BulkNotificationJob.objects.filter(pk=response.data['job_id']).exists())
+
+    def test_jobs_run_in_the_worker_not_the_request(self):
+        from chat.models import BulkNotificationJob, Notification
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/admin/notifications/send_bulk/', {
+                'title': 'Hello', 'message': 'World',
+            }, format='json')
+        job = BulkNotificationJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual(job.status, 'pending')
+        self.assertEqual(Notification.objects.count(), 0)
+
+        out = StringIO()
+        call_command('run_notification_jobs', stdout=out)
+        self.assertIn('Ran 1 jobs', out.getvalue())
+        self.assertEqual(Notification.objects.count(), 5)
+
+    @override_settings(NOTIFICATION_JOBS_INLINE=True)
+    def test_explicit_recipients(self):
+        from chat.models import Notification
+
+        targets = [self.users[0].id, self.users[2].id, self.users[2].id]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/admin/notifications/send_bulk/', {
+                'title': 'Hello', 'message': 'World', 'user_ids': targets,
+            }, format='json')
+        job = self.client.get(f"/api/admin/notifications/jobs/{response.data['job_id']}/").data
+        self.assertEqual((job['status'], job['total'], job['processed'], job['progress']),
+                         ('done', 2, 2, 100))
+        self.assertEqual(
+            sorted(Notification.objects.values_list('user_id', flat=True)),
+            [self.users[0].id, self.users[2].id],
+        )
+
+    def test_batches_are_bounded(self):
+        from chat.bulk_notifications import run_job
+        from chat.models import Notification
+
+        job = self._job()
+        with CaptureQueriesContext(connection) as ctx:
+            run_job(job.pk, batch_size=2)
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "notifications"')]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(Notification.objects.count(), 5)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.total, job.processed), ('done', 5, 5))
+        self.assertEqual(job.last_user_id, self.users[-1].id)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_interrupted_job_resumes_without_duplicates(self):
+        from chat.models import BulkNotificationJob, Notification
+
+        job = self._job()
+        # A worker died after the first two users were notified
+        for user in self.users[:2]:
+            Notification.objects.create(user=user, notification_type='system', title='T', message='M')
+        BulkNotificationJob.objects.filter(pk=job.pk).update(
+            status='running', total=5, processed=2, last_user_id=self.users[1].id,
+            updated_at=timezone.now() - timedelta(hours=1),
+        )
+
+        out = StringIO()
+        call_command('run_notification_jobs', stdout=out)
+        self.assertIn('Ran 1 jobs', out.getvalue())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), ('done', 5))
+        self.assertEqual(
+            sorted(Notification.objects.values_list('user_id', flat=True)),
+            sorted(u.id for u in self.users),
+        )
+
+    def test_running_job_not_claimed_twice(self):
+        from chat.bulk_notifications import run_job
+        from chat.models import BulkNotificationJob, Notification
+
+        job = self._job()
+        BulkNotificationJob.objects.filter(pk=job.pk).update(status='running')
+        run_job(job.pk)
+        self.assertEqual(Notification.objects.count(), 0)
+
+    def test_failure_recorded(self):
+        from chat.bulk_notifications import run_job
+
+        job = self._job()
+        with patch('chat.models.Notification.objects.bulk_create', side_effect=RuntimeError('db down')):
+            run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('db down', job.error_message)
+
+    def test_missing_fields_and_unknown_job(self):
+        response = self.client.post('/api/admin/notifications/send_bulk/', {'title': 'x'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/admin/notifications/jobs/999/').status_code, 404)
@@ -0,0 +1,184 @@
+"""
+Tests for the WebSocket server's chat access cache and the Core API's
+access change notifications (procurements.access_events).
+"""
+import importlib.util
+import json
+import os
+import sys
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import pytest
+from rest_framework.test import APITestCase
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WS_DIR = os.path.join(ROOT, 'infrastructure', 'websocket')
+WS_SERVER = os.path.join(WS_DIR, 'chat_server.py')
+
+
+def load_chat_server():
+    if WS_DIR not in sys.path:
+        sys.path.insert(0, WS_DIR)
+    spec = importlib.util.spec_from_file_location('chat_server', WS_SERVER)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """Records POSTs and answers with a fixed status"""
+
+    closed = False
+
+    def __init__(self, status=200):
+        self.status = status
+        self.calls = []
+
+    def post(self, url, json=None):
+        self.calls.append((url, json))
+        return FakeResponse(self.status)
+
+
+class TestAccessCache:
+    """TTL + LRU behaviour"""
+
+    def test_lru_eviction(self):
+        cache = load_chat_server().AccessCache(maxsize=2)
+        cache.set('a', True)
+        cache.set('b', True)
+        cache.get('a')
+        cache.set('c', True)
+        assert cache.get('b') is None
+        assert cache.get('a') is True and cache.get('c') is True
+
+    def test_separate_negative_ttl(self):
+        module = load_chat_server()
+        cache = module.AccessCache(ttl=60, negative_ttl=5)
+        with patch.object(module.time, 'monotonic', return_value=100.0):
+            cache.set('yes', True)
+            cache.set('no', False)
+        with patch.object(module.time, 'monotonic', return_value=106.0):
+            assert cache.get('yes') is True
+            assert cache.get('no') is None
+            assert len(cache) == 1
+
+
+class TestChatServerAccessCheck:
+    """check_procurement_access goes through the cache and shared session"""
+
+    @pytest.mark.asyncio
+    async def test_grant_is_cached(self):
+        server = load_chat_server().ChatServer()
+        server._session = FakeSession(200)
+
+        assert await server.check_procurement_access(1, 10) is True
+        assert await server.check_procurement_access(1, 10) is True
+        assert len(server._session.calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_denial_is_cached_but_server_errors_are_not(self):
+        server = load_chat_server().ChatServer()
+        server._session = FakeSession(403)
+        assert await server.check_procurement_access(1, 10) is False
+        assert await server.check_procurement_access(1, 10) is False
+        assert len(server._session.calls) == 1
+
+        server._session = FakeSession(500)
+        assert await server.check_procurement_access(2, 10) is False
+        assert await server.check_procurement_access(2, 10) is False
+        assert len(server._session.calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_access_change_message_invalidates(self):
+        server = load_chat_server().ChatServer()
+        server._session = FakeSession(200)
+        await server.check_procurement_access(1, 10)
+        await server.check_procurement_access(2, 10)
+
+        server.handle_access_change(json.dumps({'procurement_id': 10, 'user_ids': [1]}))
+        server.handle_access_change('not json')
+
+        assert server.access_cache.get((1, 10)) is None
+        assert server.access_cache.get((2, 10)) is True
+
+    def test_session_uses_bounded_pool(self):
+        module = load_chat_server()
+        server = module.ChatServer()
+        with patch.object(module.aiohttp, 'ClientSession') as session_cls, \
+                patch.object(module.aiohttp, 'TCPConnector') as connector_cls:
+            session_cls.return_value = MagicMock(closed=False)
+            first = server._get_session()
+            second = server._get_session()
+        assert first is second
+        session_cls.assert_called_once()
+        connector_cls.assert_called_once_with(limit=server.HTTP_POOL_SIZE)
+
+
+class AccessChangePublishTests(APITestCase):
+    """The Core API announces activation/deactivation of participations"""
+
+    def setUp(self):
+        from users.models import User
+        from procurements.models import Procurement
+
+        self.organizer = User.objects.create(platform='telegram', platform_user_id='acc_org', role='organizer')
+        self.buyer = User.objects.create(platform='telegram', platform_user_id='acc_buyer')
+        self.procurement = Procurement.objects.create(
+            title='Access', description='x', organizer=self.organizer, city='Moscow',
+            target_amount=Decimal('1000'), deadline='2099-12-31T23:59:59Z', status='active',
+        )
+
+    def _published(self, client):
+        return [json.loads(call.args[1]) for call in client.publish.call_args_list]
+
+    def test_join_and_leave_publish_after_commit(self):
+        client = MagicMock()
+        with patch('procurements.access_events._get_client', return_value=client):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(
+                    f'/api/procurements/{self.procurement.id}/join/',
+                    {'user_id': self.buyer.id, 'amount': 100}, format='json'
+                )
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(
+                    f'/api/procurements/{self.procurement.id}/leave/',
+                    {'user_id': self.buyer.id}, format='json'
+                )
+
+        expected = {'procurement_id': self.procurement.id, 'user_ids': [self.buyer.id]}
+        self.assertEqual(self._published(client), [expected, expected])
+        self.assertEqual(client.publish.call_args.args[0], 'chat:access')
+
+    def test_status_only_save_does_not_publish(self):
+        from procurements.models import Participant
+
+        participant = Participant.objects.create(
+            procurement=self.procurement, user=self.buyer, amount=Decimal('100')
+        )
+        client = MagicMock()
+        with patch('procurements.access_events._get_client', return_value=client):
+            with self.captureOnCommitCallbacks(execute=True):
+                participant.status = Participant.Status.CONFIRMED
+                participant.save(update_fields=['status', 'updated_at'])
+        client.publish.assert_not_called()
+
+    def test_publish_failure_is_swallowed(self):
+        with patch('procurements.access_events._get_client', side_effect=ConnectionError('down')):
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = self.client.post(
+                    f'/api/procurements/{self.procurement.id}/join/',
+                    {'user_id': self.buyer.id, 'amount': 100}, format='json'
+                )
+        self.assertEqual(resp.status_code, 201)
@@ -0,0 +1,185 @@
+"""
+Tests for ChatServer fan-out through the pluggable broker layer
+(infrastructure/websocket/broker.py).
+
+Two ChatServer instances sharing an InMemoryHub stand in for two replicas.
+"""
+import importlib.util
+import json
+import os
+import sys
+from unittest.mock import AsyncMock
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WS_DIR = os.path.join(ROOT, 'infrastructure', 'websocket')
+if WS_DIR not in sys.path:
+    sys.path.insert(0, WS_DIR)
+
+import broker as broker_module  # noqa: E402
+
+
+def load_chat_server():
+    spec = importlib.util.spec_from_file_location('chat_server', os.path.join(WS_DIR, 'chat_server.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeWebSocket:
+    closed = False
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_str(self, data):
+        self.sent.append(json.loads(data))
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+
+@pytest.fixture
+def nodes():
+    module = load_chat_server()
+    hub = broker_module.InMemoryHub()
+    servers = []
+    for _ in range(2):
+        server = module.ChatServer()
+        server.broker = broker_module.InMemoryBroker(hub)
+        server.broker.set_handler(server._deliver_local)
+        server.save_message_to_db = AsyncMock()
+        servers.append(server)
+    return hub, servers
+
+
+async def flush(*servers):
+    for server in servers:
+        await server.fanout.flush()
+
+
+class TestBrokerFanOut:
+    """Messages published on one node reach sockets on every node"""
+
+    @pytest.mark.asyncio
+    async def test_message_reaches_other_replica(self, nodes):
+        hub, (a, b) = nodes
+        ws_a, ws_b = FakeWebSocket(), FakeWebSocket()
+        await a.register_connection(1, ws_a, 10)
+        await b.register_connection(1, ws_b, 20)
+        a.message_history.load(1, [], None)
+        b.message_history.load(1, [], None)
+
+        await a.handle_message(1, 10, json.dumps({'type': 'message', 'text': 'hi'}), ws_a)
+        await flush(a, b)
+
+        assert [m['text'] for m in ws_a.sent] == ['hi']
+        assert [m['text'] for m in ws_b.sent] == ['hi']
+        assert len(a.message_history.recent(1)) == len(b.message_history.recent(1)) == 1
+
+    @pytest.mark.asyncio
+    async def test_exclude_applies_only_to_sender_socket(self, nodes):
+        hub, (a, b) = nodes
+        sender, same_node, other_node = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await a.register_connection(1, sender, 10)
+        await a.register_connection(1, same_node, 11)
+        await b.register_connection(1, other_node, 20)
+
+        await a.handle_message(1, 10, json.dumps({'type': 'typing', 'is_typing': True}), sender)
+        await flush(a, b)
+
+        assert sender.sent == []
+        assert same_node.sent[0]['type'] == 'typing'
+        assert other_node.sent[0]['type'] == 'typing'
+
+    @pytest.mark.asyncio
+    async def test_rooms_are_isolated(self, nodes):
+        hub, (a, b) = nodes
+        ws_room1, ws_room2 = FakeWebSocket(), FakeWebSocket()
+        await a.register_connection(1, ws_room1, 10)
+        await b.register_connection(2, ws_room2, 20)
+
+        await a.broadcast_system_message(1, 'hello room 1')
+        await flush(a, b)
+
+        assert len(ws_room1.sent) == 1
+        assert ws_room2.sent == []
+
+
+class TestRoomReferenceCounting:
+    """A node subscribes on its first local socket and leaves with the last"""
+
+    @pytest.mark.asyncio
+    async def test_subscription_follows_local_sockets(self, nodes):
+        hub, (a, b) = nodes
+        first, second = FakeWebSocket(), FakeWebSocket()
+
+        await a.register_connection(1, first, 10)
+        await a.register_connection(1, second, 11)
+        assert hub.rooms[1] == {a.broker}
+
+        a.message_history.load(1, [{'type': 'message', 'text': 'old'}], None)
+        await a.unregister_connection(1, first, 10)
+        assert a.broker.is_subscribed(1)
+        assert 1 in a.message_history
+
+        await a.unregister_connection(1, second, 11)
+        assert not a.broker.is_subscribed(1)
+        assert 1 not in hub.rooms
+        # Stale history is dropped once the node stops receiving the room
+        assert 1 not in a.message_history
+
+    @pytest.mark.asyncio
+    async def test_unbalanced_leave_is_harmless(self):
+        broker = broker_module.InMemoryBroker()
+        assert await broker.leave(5) is False
+        assert await broker.join(5) is True
+        assert await broker.join(5) is False
+        assert await broker.leave(5) is False
+        assert await broker.leave(5) is True
+
+
+class TestCreateBroker:
+
+    def test_selection(self):
+        assert isinstance(broker_module.create_broker(None), broker_module.InMemoryBroker)
+        assert isinstance(broker_module.create_broker('redis://localhost:6379/0'), broker_module.RedisBroker)
+        assert isinstance(
+            broker_module.create_broker('redis://localhost:6379/0', 'memory'), broker_module.InMemoryBroker
+        )
+        with pytest.raises(ValueError):
+            broker_module.create_broker(None, 'redis')
+
+    def test_incomplete_broker_fails_on_creation(self):
+        class NoUnsubscribe(broker_module.Broker):
+            async def publish(self, room, payload):
+                pass
+
+            async def _subscribe(self, room):
+                pass
+
+        with pytest.raises(TypeError):
+            NoUnsubscribe()
+
+    @pytest.mark.asyncio
+    async def test_redis_broker_routes_channel_to_room(self):
+        broker = broker_module.RedisBroker('redis://localhost:6379/0')
+        handler = AsyncMock()
+        broker.set_handler(handler)
+        broker._room_refs[42] = 1
+
+        pubsub = AsyncMock()
+        pubsub.subscribed = True
+        messages = [{'channel': b'chat:room:42', 'data': b'payload'}]
+
+        async def get_message(**kwargs):
+            if messages:
+                return messages.pop()
+            raise broker_module.asyncio.CancelledError
+
+        pubsub.get_message = get_message
+        broker._pubsub = pubsub
+        with pytest.raises(broker_module.asyncio.CancelledError):
+            await broker._read_loop()
+        handler.assert_awaited_once_with(42, 'payload')
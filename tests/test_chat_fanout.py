@@ -0,0 +1,147 @@
+"""
+Tests for the WebSocket fan-out engine (infrastructure/websocket/fanout.py):
+concurrent sends, bounded per-socket queues, slow-consumer handling and
+typing-indicator coalescing.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WS_DIR = os.path.join(ROOT, 'infrastructure', 'websocket')
+if WS_DIR not in sys.path:
+    sys.path.insert(0, WS_DIR)
+
+from fanout import FanOut  # noqa: E402
+
+
+class FakeWebSocket:
+
+    def __init__(self, gate=None, fail=False):
+        self.closed = False
+        self.sent = []
+        self.close_code = None
+        self.gate = gate
+        self.fail = fail
+
+    async def send_str(self, data):
+        if self.fail:
+            raise ConnectionResetError('gone')
+        if self.gate is not None:
+            await self.gate.wait()
+        self.sent.append(data)
+
+    async def close(self, code=1000, message=b''):
+        self.closed = True
+        self.close_code = code
+
+
+class TestFanOut:
+
+    @pytest.mark.asyncio
+    async def test_broadcast_delivers_in_order(self):
+        fanout = FanOut()
+        sockets = [FakeWebSocket() for _ in range(3)]
+        for i in range(3):
+            assert fanout.broadcast(sockets, f'm{i}') == 3
+        await fanout.flush()
+        assert all(ws.sent == ['m0', 'm1', 'm2'] for ws in sockets)
+        assert fanout.stats['sent'] == 9
+        assert fanout.pending(sockets[0]) == 0
+
+    @pytest.mark.asyncio
+    async def test_slow_consumer_does_not_block_others(self):
+        fanout = FanOut()
+        gate = asyncio.Event()
+        slow, fast = FakeWebSocket(gate=gate), FakeWebSocket()
+        fanout.broadcast([slow, fast], 'm0')
+        fanout.broadcast([slow, fast], 'm1')
+        await asyncio.sleep(0.01)
+        assert fast.sent == ['m0', 'm1']
+        assert slow.sent == []
+        gate.set()
+        await fanout.flush()
+        assert slow.sent == ['m0', 'm1']
+
+    @pytest.mark.asyncio
+    async def test_lagging_consumer_disconnected(self):
+        broken = []
+        fanout = FanOut(max_queue=2, on_broken=broken.append)
+        slow = FakeWebSocket(gate=asyncio.Event())
+        for i in range(4):
+            fanout.send(slow, f'm{i}')
+        await asyncio.sleep(0)
+        assert slow.closed and slow.close_code == 1013
+        assert broken == [slow]
+        assert fanout.stats['disconnected'] == 1
+        assert fanout.pending(slow) == 0
+
+    @pytest.mark.asyncio
+    async def test_close_task_referenced_until_done(self):
+        fanout = FanOut(max_queue=1)
+        slow = FakeWebSocket(gate=asyncio.Event())
+        fanout.send(slow, 'm0')
+        fanout.send(slow, 'm1')
+        assert len(fanout._closing) == 1
+        await fanout.flush()
+        assert slow.closed
+        assert not fanout._closing
+
+    @pytest.mark.asyncio
+    async def test_drop_policy_skips_frames(self):
+        fanout = FanOut(max_queue=2, policy='drop')
+        gate = asyncio.Event()
+        slow = FakeWebSocket(gate=gate)
+        results = [fanout.send(slow, f'm{i}') for i in range(4)]
+        assert results == [True, True, False, False]
+        gate.set()
+        await fanout.flush()
+        assert slow.sent == ['m0', 'm1']
+        assert not slow.closed
+        assert fanout.stats['dropped'] == 2
+
+    @pytest.mark.asyncio
+    async def test_typing_coalesced_while_queued(self):
+        fanout = FanOut()
+        gate = asyncio.Event()
+        ws = FakeWebSocket(gate=gate)
+        fanout.send(ws, 'msg')
+        fanout.send(ws, 'typing-1-on', coalesce_key=('typing', 1))
+        fanout.send(ws, 'typing-2-on', coalesce_key=('typing', 2))
+        fanout.send(ws, 'typing-1-off', coalesce_key=('typing', 1))
+        gate.set()
+        await fanout.flush()
+        assert ws.sent == ['msg', 'typing-1-off', 'typing-2-on']
+        assert fanout.stats['coalesced'] == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_send_reports_broken_socket(self):
+        broken = []
+        fanout = FanOut(on_broken=broken.append)
+        bad, good = FakeWebSocket(fail=True), FakeWebSocket()
+        fanout.broadcast([bad, good], 'm0')
+        await fanout.flush()
+        assert broken == [bad]
+        assert good.sent == ['m0']
+        assert fanout.stats['failed'] == 1
+
+    @pytest.mark.asyncio
+    async def test_closed_sockets_skipped_and_discard_cancels(self):
+        fanout = FanOut()
+        closed = FakeWebSocket()
+        closed.closed = True
+        assert fanout.send(closed, 'm') is False
+
+        ws = FakeWebSocket(gate=asyncio.Event())
+        fanout.send(ws, 'm0')
+        fanout.send(ws, 'm1')
+        fanout.discard(ws)
+        await fanout.flush()
+        assert ws.sent == []
+        assert fanout.pending(ws) == 0
+
+    def test_unknown_policy_rejected(self):
+        with pytest.raises(ValueError):
+            FanOut(policy='ignore')
@@ -0,0 +1,155 @@
+"""
+Tests for ChatServer's single-task heartbeat wheel (HeartbeatWheel) that
+pings all sockets and reaps stale ones.
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+from unittest.mock import AsyncMock
+
+import aiohttp
+import pytest
+from aiohttp.test_utils import TestServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WS_DIR = os.path.join(ROOT, 'infrastructure', 'websocket')
+
+
+def load_chat_server():
+    if WS_DIR not in sys.path:
+        sys.path.insert(0, WS_DIR)
+    spec = importlib.util.spec_from_file_location('chat_server', os.path.join(WS_DIR, 'chat_server.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeWebSocket:
+
+    def __init__(self, fail_ping=False):
+        self.closed = False
+        self.pings = 0
+        self.close_code = None
+        self.fail_ping = fail_ping
+
+    async def ping(self):
+        if self.fail_ping:
+            raise ConnectionResetError('gone')
+        self.pings += 1
+
+    async def close(self, code=1000, message=b''):
+        self.closed = True
+        self.close_code = code
+
+
+class TestHeartbeatWheel:
+
+    def test_item_due_after_one_revolution(self):
+        wheel = load_chat_server().HeartbeatWheel(slots=4)
+        wheel.add('a')
+        assert [wheel.advance() for _ in range(3)] == [[], [], []]
+        assert wheel.advance() == ['a']
+        # ...and again every revolution
+        assert [wheel.advance() for _ in range(4)] == [[], [], [], ['a']]
+
+    def test_items_spread_by_connection_time(self):
+        wheel = load_chat_server().HeartbeatWheel(slots=3)
+        wheel.add('a')
+        wheel.advance()
+        wheel.add('b')
+        assert wheel.advance() == []
+        assert wheel.advance() == ['a']
+        assert wheel.advance() == ['b']
+
+    def test_remove(self):
+        wheel = load_chat_server().HeartbeatWheel(slots=2)
+        wheel.add('a')
+        wheel.remove('a')
+        wheel.remove('missing')
+        assert 'a' not in wheel
+        assert len(wheel) == 0
+        assert wheel.advance() + wheel.advance() == []
+
+
+@pytest.fixture
+def server():
+    server = load_chat_server().ChatServer()
+    server.broker.join = AsyncMock(return_value=True)
+    server.broker.leave = AsyncMock(return_value=True)
+    return server
+
+
+class TestHeartbeatReaping:
+
+    @pytest.mark.asyncio
+    async def test_register_adds_to_wheel_without_task(self, server):
+        ws = FakeWebSocket()
+        await server.register_connection(1, ws, 10)
+        assert ws in server.heartbeats
+        await server.unregister_connection(1, ws, 10)
+        assert ws not in server.heartbeats
+        assert ws not in server._missed_pongs
+
+    @pytest.mark.asyncio
+    async def test_pings_due_sockets(self, server):
+        sockets = [FakeWebSocket() for _ in range(3)]
+        await server._heartbeat(sockets)
+        assert [ws.pings for ws in sockets] == [1, 1, 1]
+        assert server.heartbeat_stats == {'pings': 3, 'reaped': 0}
+
+    @pytest.mark.asyncio
+    async def test_reaps_after_missed_pongs(self, server):
+        ws = FakeWebSocket()
+        await server.register_connection(1, ws, 10)
+        for _ in range(server.MAX_MISSED_PONGS):
+            await server._heartbeat([ws])
+        assert not ws.closed
+        await server._heartbeat([ws])
+        assert ws.closed
+        assert ws.close_code == 1001
+        assert ws not in server.heartbeats
+        assert server.heartbeat_stats['reaped'] == 1
+
+    @pytest.mark.asyncio
+    async def test_pong_keeps_socket_alive(self, server):
+        ws = FakeWebSocket()
+        for _ in range(server.MAX_MISSED_PONGS + 2):
+            await server._heartbeat([ws])
+            server._missed_pongs[ws] = 0
+        assert not ws.closed
+
+    @pytest.mark.asyncio
+    async def test_failed_ping_reaped(self, server):
+        good, bad = FakeWebSocket(), FakeWebSocket(fail_ping=True)
+        await server.register_connection(1, good, 10)
+        await server.register_connection(1, bad, 20)
+        await server._heartbeat([good, bad])
+        assert bad.closed and not good.closed
+        assert bad not in server.heartbeats and good in server.heartbeats
+        assert server.heartbeat_stats == {'pings': 1, 'reaped': 1}
+
+
+class TestHeartbeatLive:
+
+    @pytest.mark.asyncio
+    async def test_answering_client_stays_connected(self):
+        server = load_chat_server().ChatServer()
+        # A ping every 0.2s, so the run below spans several wheel revolutions
+        server.PING_INTERVAL = 0.2
+        server.authenticate_user = AsyncMock(return_value=10)
+        server.check_procurement_access = AsyncMock(return_value=True)
+        server.send_message_history = AsyncMock()
+
+        async with TestServer(server.app) as test_server:
+            async with aiohttp.ClientSession() as session:
+                async with session.ws_connect(test_server.make_url('/ws/procurement/1/?token=t')) as ws:
+                    # The client answers pings while it reads (autopong)
+                    reader = asyncio.create_task(ws.receive())
+                    await asyncio.sleep(0.2 * (server.MAX_MISSED_PONGS + 3))
+                    assert not reader.done()
+                    assert not ws.closed
+                    reader.cancel()
+
+        assert server.heartbeat_stats['pings'] > server.MAX_MISSED_PONGS
+        assert server.heartbeat_stats['reaped'] == 0
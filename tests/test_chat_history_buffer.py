@@ -0,0 +1,133 @@
+"""
+Tests for ChatServer's bounded per-room history (HistoryBuffer) and the
+cold-start backfill from the Core API.
+"""
+import importlib.util
+import os
+import sys
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WS_DIR = os.path.join(ROOT, 'infrastructure', 'websocket')
+
+
+def load_chat_server():
+    if WS_DIR not in sys.path:
+        sys.path.insert(0, WS_DIR)
+    spec = importlib.util.spec_from_file_location('chat_server', os.path.join(WS_DIR, 'chat_server.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def msg(i):
+    return {'type': 'message', 'text': f'm{i}', 'message_id': i}
+
+
+class FakeWebSocket:
+    closed = False
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+
+class TestHistoryBuffer:
+
+    def test_ring_buffer_is_bounded(self):
+        buffer = load_chat_server().HistoryBuffer(maxlen=3)
+        buffer.load(1, [msg(0), msg(1)], 'older')
+        for i in range(2, 6):
+            buffer.append(1, msg(i))
+        assert [m['message_id'] for m in buffer.recent(1)] == [3, 4, 5]
+
+    def test_append_ignored_for_unloaded_room(self):
+        buffer = load_chat_server().HistoryBuffer()
+        assert buffer.append(7, msg(1)) is False
+        assert 7 not in buffer
+
+    def test_cursor_goes_stale_when_buffer_overflows(self):
+        buffer = load_chat_server().HistoryBuffer(maxlen=2)
+        buffer.load(1, [msg(0), msg(1)], 'older')
+        buffer.load(2, [msg(0)], None)
+        buffer.append(1, msg(2))
+        buffer.append(2, msg(1))
+        buffer.append(2, msg(2))
+        assert buffer.cursor(1) == ''
+        # The start of the chat was evicted too, so it is reachable again
+        assert buffer.cursor(2) == ''
+
+    def test_overflowing_new_room_keeps_evicted_messages_reachable(self):
+        buffer = load_chat_server().HistoryBuffer(maxlen=3)
+        buffer.load(1, [], None)
+        for i in range(1, 4):
+            buffer.append(1, msg(i))
+        assert buffer.cursor(1) is None
+        for i in range(4, 7):
+            buffer.append(1, msg(i))
+        assert [m['message_id'] for m in buffer.recent(1)] == [4, 5, 6]
+        assert buffer.cursor(1) == ''
+
+    def test_idle_rooms_evicted_except_active(self):
+        module = load_chat_server()
+        buffer = module.HistoryBuffer(idle_ttl=60)
+        with patch.object(module.time, 'monotonic', return_value=100.0):
+            buffer.load(1, [], None)
+            buffer.load(2, [], None)
+            buffer.load(3, [], None)
+        with patch.object(module.time, 'monotonic', return_value=150.0):
+            buffer.recent(3)
+        with patch.object(module.time, 'monotonic', return_value=200.0):
+            assert buffer.evict_idle(keep=[2]) == 1
+        assert 1 not in buffer and 2 in buffer and 3 in buffer
+
+    def test_least_recent_room_dropped_beyond_max_rooms(self):
+        buffer = load_chat_server().HistoryBuffer(max_rooms=2)
+        buffer.load(1, [], None)
+        buffer.load(2, [], None)
+        buffer.recent(1)
+        buffer.load(3, [], None)
+        assert len(buffer) == 2
+        assert 2 not in buffer
+
+
+class TestHistoryBackfill:
+
+    @pytest.mark.asyncio
+    async def test_cold_start_loads_once_from_core_api(self):
+        server = load_chat_server().ChatServer()
+        server.fetch_history_page = AsyncMock(return_value=([msg(1), msg(2)], 'cur'))
+        first, second = FakeWebSocket(), FakeWebSocket()
+
+        await server.send_message_history(5, first)
+        await server.send_message_history(5, second)
+
+        server.fetch_history_page.assert_awaited_once_with(5)
+        assert [m['message_id'] for m in second.sent] == [1, 2]
+        assert server.message_history.cursor(5) == 'cur'
+
+    @pytest.mark.asyncio
+    async def test_scroll_back_uses_buffer_cursor(self):
+        server = load_chat_server().ChatServer()
+        server.fetch_history_page = AsyncMock(return_value=([msg(0)], None))
+        server.message_history.load(5, [msg(1)], 'cur')
+        ws = FakeWebSocket()
+
+        await server.handle_message(5, 1, '{"type": "history"}', ws)
+        server.fetch_history_page.assert_awaited_once_with(5, 'cur')
+        assert ws.sent[-1] == {'type': 'history', 'messages': [msg(0)], 'next_cursor': None}
+
+    @pytest.mark.asyncio
+    async def test_scroll_back_at_start_of_chat_is_empty(self):
+        server = load_chat_server().ChatServer()
+        server.fetch_history_page = AsyncMock()
+        server.message_history.load(5, [msg(1)], None)
+        ws = FakeWebSocket()
+
+        await server.handle_message(5, 1, '{"type": "history"}', ws)
+        server.fetch_history_page.assert_not_awaited()
+        assert ws.sent[-1]['messages'] == []
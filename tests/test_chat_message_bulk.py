@@ -0,0 +1,271 @@
+"""
+Tests for batched, write-behind chat message persistence: the idempotent
+POST /api/chat/messages/bulk/ endpoint and the WebSocket server's
+MessageWriter queue (infrastructure/websocket/message_writer.py).
+"""
+import asyncio
+import os
+import sys
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import AsyncMock
+
+import pytest
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WS_DIR = os.path.join(ROOT, 'infrastructure', 'websocket')
+if WS_DIR not in sys.path:
+    sys.path.insert(0, WS_DIR)
+
+from message_writer import MessageWriter  # noqa: E402
+
+
+class BulkMessageEndpointTests(APITestCase):
+    """Tests for POST /api/chat/messages/bulk/"""
+
+    url = '/api/chat/messages/bulk/'
+
+    def setUp(self):
+        from users.models import User
+        from procurements.models import Procurement
+
+        self.user = User.objects.create(platform='telegram', platform_user_id='bulk_user', role='organizer')
+        self.procurement = Procurement.objects.create(
+            title='Bulk', description='x', organizer=self.user, city='Moscow',
+            target_amount=Decimal('1000'), deadline=timezone.now() + timedelta(days=7),
+        )
+
+    def _item(self, client_id, **overrides):
+        item = {
+            'procurement_id': self.procurement.id,
+            'user_id': self.user.id,
+            'text': f'text {client_id}',
+            'client_message_id': client_id,
+        }
+        item.update(overrides)
+        return item
+
+    def test_creates_batch(self):
+        from chat.models import Message
+
+        response = self.client.post(
+            self.url, {'messages': [self._item('a'), self._item('b')]}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['duplicates'], 0)
+        self.assertEqual(
+            set(Message.objects.values_list('client_message_id', flat=True)), {'a', 'b'}
+        )
+
+    def test_retried_batch_is_idempotent(self):
+        from chat.models import Message
+
+        batch = {'messages': [self._item('a'), self._item('b')]}
+        self.client.post(self.url, batch, format='json')
+        response = self.client.post(self.url, batch, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(response.data['duplicates'], 2)
+        self.assertEqual(Message.objects.count(), 2)
+
+    def test_repeats_within_batch_are_skipped(self):
+        from chat.models import Message
+
+        response = self.client.post(
+            self.url, {'messages': [self._item('a'), self._item('a')]}, format='json'
+        )
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['duplicates'], 1)
+        self.assertEqual(Message.objects.count(), 1)
+
+    def test_unknown_procurement_rejected_individually(self):
+        from chat.models import Message
+
+        response = self.client.post(
+            self.url,
+            {'messages': [self._item('ok'), self._item('bad', procurement_id=999999)]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([r['client_message_id'] for r in response.data['rejected']], ['bad'])
+        self.assertEqual(Message.objects.count(), 1)
+
+    def test_empty_batch_is_invalid(self):
+        response = self.client.post(self.url, {'messages': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_client_message_id_in_listing(self):
+        self.client.post(self.url, {'messages': [self._item('abc')]}, format='json')
+        response = self.client.get(
+            '/api/chat/messages/', {'procurement_id': self.procurement.id}
+        )
+        self.assertEqual(response.data['results'][0]['client_message_id'], 'abc')
+
+
+class RecordingSender:
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+
+    async def __call__(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('core api down')
+        self.batches.append([m['client_message_id'] for m in batch])
+        return True
+
+
+def _msg(i):
+    return {'client_message_id': str(i)}
+
+
+class TestMessageWriter:
+    """Batching, retry and shutdown behaviour of the write-behind queue"""
+
+    @pytest.mark.asyncio
+    async def test_flushes_full_batch_immediately(self):
+        sender = RecordingSender()
+        writer = MessageWriter(sender, batch_size=3, flush_interval=60)
+        writer.start()
+        for i in range(3):
+            writer.enqueue(_msg(i))
+        await asyncio.sleep(0.05)
+        assert sender.batches == [['0', '1', '2']]
+        await writer.close()
+
+    @pytest.mark.asyncio
+    async def test_partial_batch_flushed_after_interval(self):
+        sender = RecordingSender()
+        writer = MessageWriter(sender, batch_size=100, flush_interval=0.05)
+        writer.start()
+        writer.enqueue(_msg(1))
+        writer.enqueue(_msg(2))
+        await asyncio.sleep(0.01)
+        assert sender.batches == []
+        await asyncio.sleep(0.1)
+        assert sender.batches == [['1', '2']]
+        await writer.close()
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_retried_in_order(self):
+        sender = RecordingSender(failures=2)
+        writer = MessageWriter(sender, batch_size=2, flush_interval=0.01, max_backoff=0.02)
+        writer.start()
+        writer.enqueue(_msg(1))
+        writer.enqueue(_msg(2))
+        writer.enqueue(_msg(3))
+        await asyncio.sleep(0.2)
+        assert sender.batches == [['1', '2'], ['3']]
+        assert len(writer) == 0
+        await writer.close()
+
+    @pytest.mark.asyncio
+    async def test_close_flushes_pending(self):
+        sender = RecordingSender()
+        writer = MessageWriter(sender, batch_size=2, flush_interval=60)
+        for i in range(5):
+            writer.enqueue(_msg(i))
+        await writer.close()
+        assert sender.batches == [['0', '1'], ['2', '3'], ['4']]
+
+    @pytest.mark.asyncio
+    async def test_rejected_batch_kept_on_close(self):
+        async def failing(batch):
+            return False
+
+        writer = MessageWriter(failing, batch_size=10)
+        writer.enqueue(_msg(1))
+        await writer.close()
+        assert len(writer) == 1
+
+    @pytest.mark.asyncio
+    async def test_queue_is_bounded(self, caplog):
+        writer = MessageWriter(RecordingSender(), batch_size=10, max_pending=2)
+        assert writer.enqueue(_msg(1)) and writer.enqueue(_msg(2))
+        assert writer.enqueue(_msg(3)) is False
+        assert writer.enqueue(_msg(4)) is False
+        assert len(writer) == 2
+        assert writer.stats['dropped'] == 2
+        # Logged once per outage, not per message
+        assert sum('queue full' in r.message for r in caplog.records) == 1
+        await writer.flush()
+        assert writer.enqueue(_msg(5))
+        await writer.close()
+
+
+class FakeResponse:
+
+    def __init__(self, status, payload):
+        self.status = status
+        self.payload = payload
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def json(self):
+        return self.payload
+
+    async def text(self):
+        return str(self.payload)
+
+
+class FakeSession:
+    closed = False
+
+    def __init__(self, response):
+        self.response = response
+
+    def post(self, url, json=None):
+        return self.response
+
+
+class FakeWebSocket:
+    closed = False
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+
+def load_chat_server():
+    import importlib.util
+
+    spec = importlib.util.spec_from_file_location('chat_server', os.path.join(WS_DIR, 'chat_server.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestChatServerPersistence:
+    """ChatServer's use of the write-behind queue"""
+
+    @pytest.mark.asyncio
+    async def test_stats_count_created_from_response(self):
+        server = load_chat_server().ChatServer()
+        server._session = FakeSession(FakeResponse(201, {
+            'received': 3, 'created': 1, 'duplicates': 2, 'rejected': [],
+        }))
+        assert await server._post_message_batch([_msg(1), _msg(2), _msg(3)])
+        stats = server.message_writer.stats
+        assert (stats['created'], stats['duplicates'], stats['rejected']) == (1, 2, 0)
+
+    @pytest.mark.asyncio
+    async def test_message_refused_when_queue_full(self):
+        server = load_chat_server().ChatServer()
+        server.message_writer.max_pending = 0
+        server.broadcast_message = AsyncMock()
+        ws = FakeWebSocket()
+
+        await server.handle_message(5, 1, '{"type": "message", "text": "hi"}', ws)
+        server.broadcast_message.assert_not_awaited()
+        assert ws.sent[-1]['type'] == 'error'
+        assert server.message_writer.stats['dropped'] == 1
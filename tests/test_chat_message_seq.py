@@ -0,0 +1,230 @@
+"""
+Tests for per-procurement chat message sequence numbers and the
+sequence-based unread arithmetic, including the backfill command.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+
+class MessageSeqTests(APITestCase):
+
+    def setUp(self):
+        from users.models import User
+        from procurements.models import Procurement, Participant
+
+        cache.clear()
+        self.organizer = User.objects.create(
+            platform='telegram', platform_user_id='seq_org', role='organizer'
+        )
+        self.reader = User.objects.create(platform='telegram', platform_user_id='seq_reader')
+        self.procurement = Procurement.objects.create(
+            title='Seq', description='x', organizer=self.organizer, city='Moscow',
+            target_amount=Decimal('1000'), deadline=timezone.now() + timedelta(days=7),
+        )
+        self.other = Procurement.objects.create(
+            title='Other', description='x', organizer=self.organizer, city='Moscow',
+            target_amount=Decimal('1000'), deadline=timezone.now() + timedelta(days=7),
+        )
+        Participant.objects.create(
+            procurement=self.procurement, user=self.reader, quantity=1, amount=Decimal('10')
+        )
+
+    def _post(self, user, n=1, procurement=None):
+        from chat.models import Message
+        return [
+            Message.objects.create(
+                procurement=procurement or self.procurement, user=user, text=f'm{i}'
+            )
+            for i in range(n)
+        ]
+
+    def _unread(self):
+        from chat.unread import unread_counts
+        return unread_counts(self.reader.id)[self.procurement.id]
+
+    def test_sequences_are_per_procurement(self):
+        first = self._post(self.organizer, 3)
+        other = self._post(self.organizer, 1, procurement=self.other)
+        self.assertEqual([m.seq for m in first], [1, 2, 3])
+        self.assertEqual(other[0].seq, 1)
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.message_seq, 3)
+
+    def test_full_save_does_not_roll_back_counter(self):
+        stale = type(self.procurement).objects.get(pk=self.procurement.pk)
+        self._post(self.organizer, 2)
+        stale.title = 'Renamed'
+        stale.save()
+        self.assertEqual(self._post(self.organizer)[0].seq, 3)
+
+    def test_bulk_assigns_consecutive_sequences(self):
+        from chat.models import Message
+
+        self._post(self.organizer)
+        self.client.post('/api/chat/messages/bulk/', {'messages': [
+            {'procurement_id': self.procurement.id, 'user_id': self.reader.id,
+             'text': 't', 'client_message_id': f'c{i}'}
+            for i in range(3)
+        ]}, format='json')
+        self.assertEqual(
+            list(Message.objects.filter(procurement=self.procurement)
+                 .order_by('seq').values_list('seq', flat=True)),
+            [1, 2, 3, 4],
+        )
+        # Bulk-inserted own messages are not unread for the sender
+        self.assertEqual(self._unread(), 1)
+
+    def test_bulk_race_with_retry_reserves_only_inserted(self):
+        from unittest.mock import patch
+        from chat.models import Message
+        from procurements.models import Procurement
+
+        batch = {'messages': [
+            {'procurement_id': self.procurement.id, 'user_id': self.reader.id,
+             'text': 't', 'client_message_id': f'r{i}'}
+            for i in range(2)
+        ]}
+        select_for_update = Procurement.objects.select_for_update
+
+        def retry_commits_first():
+            # A concurrent retry of the batch inserted r0 while we waited
+            Message.objects.create(
+                procurement=self.procurement, user=self.reader, text='t', client_message_id='r0'
+            )
+            return select_for_update()
+
+        with patch.object(Procurement.objects, 'select_for_update', side_effect=retry_commits_first):
+            response = self.client.post('/api/chat/messages/bulk/', batch, format='json')
+        self.assertEqual((response.data['created'], response.data['duplicates']), (1, 1))
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.message_seq, 2)
+        self.assertEqual(
+            sorted(Message.objects.filter(procurement=self.procurement).values_list('seq', flat=True)),
+            [1, 2],
+        )
+        self._post(self.organizer)
+        self.assertEqual(self._unread(), 1)
+
+    def test_unread_arithmetic(self):
+        messages = self._post(self.organizer, 3)
+        self._post(self.reader, 2)
+        self.assertEqual(self._unread(), 3)
+
+        self.client.post('/api/chat/messages/mark_read/', {
+            'user_id': self.reader.id, 'procurement_id': self.procurement.id,
+            'message_id': messages[0].id,
+        }, format='json')
+        # Own messages after the read position still do not count
+        self.assertEqual(self._unread(), 2)
+
+        self.client.post('/api/chat/messages/mark_read/', {
+            'user_id': self.reader.id, 'procurement_id': self.procurement.id,
+        }, format='json')
+        self.assertEqual(self._unread(), 0)
+        self._post(self.organizer, 1)
+        self.assertEqual(self._unread(), 1)
+
+    def test_soft_deleted_messages_subtracted(self):
+        messages = self._post(self.organizer, 3)
+        messages[2].is_deleted = True
+        messages[2].save(update_fields=['is_deleted', 'updated_at'])
+        self.assertEqual(self._unread(), 2)
+
+    def test_per_procurement_endpoint(self):
+        self._post(self.organizer, 2)
+        response = self.client.get('/api/chat/messages/unread_count/', {
+            'user_id': self.reader.id, 'procurement_id': self.procurement.id,
+        })
+        self.assertEqual(response.data['unread_count'], 2)
+
+    def test_count_does_not_scan_messages(self):
+        from chat.unread import unread_counts
+
+        self._post(self.organizer, 5)
+        with CaptureQueriesContext(connection) as ctx:
+            unread_counts(self.reader.id)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn('COUNT("chat_messages"."id") FILTER', ctx.captured_queries[0]['sql'])
+
+
+class BackfillMessageSeqTests(APITestCase):
+    """manage.py backfill_message_seq numbers legacy chats in place"""
+
+    def setUp(self):
+        from users.models import User
+        from procurements.models import Procurement
+        from chat.models import Message, MessageRead
+
+        cache.clear()
+        self.organizer = User.objects.create(
+            platform='telegram', platform_user_id='bf_org', role='organizer'
+        )
+        self.reader = User.objects.create(platform='telegram', platform_user_id='bf_reader')
+        self.procurement = Procurement.objects.create(
+            title='Legacy', description='x', organizer=self.organizer, city='Moscow',
+            target_amount=Decimal('1000'), deadline=timezone.now() + timedelta(days=7),
+        )
+        # Simulate a chat written before sequence numbers existed
+        Procurement.objects.filter(pk=self.procurement.pk).update(message_seq=None)
+        base = timezone.now() - timedelta(hours=1)
+        self.messages = []
+        for i, user in enumerate([self.organizer, self.reader, self.organizer, self.organizer]):
+            message = Message.objects.create(procurement=self.procurement, user=user, text=f'm{i}')
+            Message.objects.filter(pk=message.pk).update(created_at=base + timedelta(minutes=i))
+            self.messages.append(message)
+        MessageRead.objects.create(
+            user=self.reader, procurement=self.procurement, last_read_message=self.messages[0]
+        )
+
+    def _unread(self, user):
+        from chat.unread import unread_counts
+        return unread_counts(user.id, [self.procurement.id])[self.procurement.id]
+
+    def test_legacy_chat_falls_back_to_counting(self):
+        from chat.models import Message
+
+        self.assertFalse(Message.objects.filter(seq__isnull=False).exists())
+        self.assertEqual(self._unread(self.reader), 2)
+        self.assertEqual(self._unread(self.organizer), 1)
+
+    def test_backfill_numbers_messages_and_read_positions(self):
+        from chat.models import Message, MessageRead
+
+        out = StringIO()
+        call_command('backfill_message_seq', '--batch-size', '3', stdout=out)
+        self.assertIn('Numbered 4 messages in 1 procurements', out.getvalue())
+
+        self.assertEqual(
+            list(Message.objects.order_by('created_at').values_list('seq', flat=True)),
+            [1, 2, 3, 4],
+        )
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.message_seq, 4)
+
+        read = MessageRead.objects.get(user=self.reader)
+        self.assertEqual((read.last_read_seq, read.own_since_read), (1, 1))
+        organizer_read = MessageRead.objects.get(user=self.organizer)
+        self.assertEqual((organizer_read.last_read_seq, organizer_read.own_since_read), (0, 3))
+
+        # Same answers as the row-counting fallback
+        self.assertEqual(self._unread(self.reader), 2)
+        self.assertEqual(self._unread(self.organizer), 1)
+
+        # New messages continue the numbering
+        self.assertEqual(
+            Message.objects.create(procurement=self.procurement, user=self.reader, text='new').seq, 5
+        )
+
+    def test_rerun_is_noop_and_dry_run(self):
+        call_command('backfill_message_seq', stdout=StringIO())
+        out = StringIO()
+        call_command('backfill_message_seq', '--dry-run', stdout=out)
+        self.assertIn('0 procurements need', out.getvalue())
@@ -0,0 +1,179 @@
+"""
+Tests for GET /api/chat/messages/unread_counts/ — unread counts for every chat
+a user can access from one grouped query, cached per user.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+
+class UnreadCountsTests(APITestCase):
+    """Tests for the all-chats unread counts endpoint"""
+
+    url = '/api/chat/messages/unread_counts/'
+
+    def setUp(self):
+        from users.models import User
+        from procurements.models import Procurement, Participant
+
+        cache.clear()
+        self.reader = User.objects.create(platform='telegram', platform_user_id='unread_reader')
+        self.organizer = User.objects.create(
+            platform='telegram', platform_user_id='unread_org', role='organizer'
+        )
+
+        def procurement(title, organizer):
+            return Procurement.objects.create(
+                title=title, description='x', organizer=organizer, city='Moscow',
+                target_amount=Decimal('1000'), deadline=timezone.now() + timedelta(days=7),
+                status='active',
+            )
+
+        self.joined = procurement('Joined', self.organizer)
+        self.own = procurement('Own', self.reader)
+        self.quiet = procurement('Quiet', self.organizer)
+        self.foreign = procurement('Foreign', self.organizer)
+        for proc in (self.joined, self.quiet):
+            Participant.objects.create(
+                procurement=proc, user=self.reader, quantity=1, amount=Decimal('10')
+            )
+
+    def _post(self, procurement, user, n=1):
+        from chat.models import Message
+        return [
+            Message.objects.create(procurement=procurement, user=user, text=f'm{i}')
+            for i in range(n)
+        ]
+
+    def _counts(self):
+        response = self.client.get(self.url, {'user_id': self.reader.id})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_counts_for_all_accessible_chats(self):
+        self._post(self.joined, self.organizer, 3)
+        self._post(self.own, self.organizer, 2)
+        self._post(self.foreign, self.organizer, 5)
+        # The reader's own messages never count as unread
+        self._post(self.joined, self.reader, 4)
+
+        data = self._counts()
+        self.assertEqual(data['unread_counts'], {
+            str(self.joined.id): 3, str(self.own.id): 2, str(self.quiet.id): 0,
+        })
+        self.assertEqual(data['total'], 5)
+
+    def test_only_messages_after_last_read(self):
+        from chat.models import MessageRead
+
+        messages = self._post(self.joined, self.organizer, 3)
+        self.client.post('/api/chat/messages/mark_read/', {
+            'user_id': self.reader.id, 'procurement_id': self.joined.id,
+            'message_id': messages[1].id,
+        }, format='json')
+        self._post(self.joined, self.organizer, 1)
+        # Another user's read marker must not affect the reader
+        MessageRead.objects.create(
+            user=self.organizer, procurement=self.own, last_read_message=None
+        )
+        self.assertEqual(self._counts()['unread_counts'][str(self.joined.id)], 2)
+
+    def test_deleted_messages_not_counted(self):
+        from chat.models import Message
+
+        self._post(self.joined, self.organizer, 2)
+        Message.objects.create(
+            procurement=self.joined, user=self.organizer, text='gone', is_deleted=True
+        )
+        self.assertEqual(self._counts()['unread_counts'][str(self.joined.id)], 2)
+
+    def test_single_query(self):
+        from chat.unread import unread_counts
+
+        self._post(self.joined, self.organizer, 3)
+        with CaptureQueriesContext(connection) as ctx:
+            unread_counts(self.reader.id)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_cached_until_new_message(self):
+        self._post(self.joined, self.organizer, 1)
+        self.assertEqual(self._counts()['total'], 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._counts()['total'], 1)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        self._post(self.joined, self.organizer, 1)
+        self.assertEqual(self._counts()['total'], 2)
+
+    def test_sending_does_not_look_up_chat_members(self):
+        self.assertEqual(self._counts()['total'], 0)
+        with CaptureQueriesContext(connection) as ctx:
+            self._post(self.joined, self.organizer, 1)
+        self.assertFalse(any('"participants"' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(self._counts()['total'], 1)
+
+    def test_mark_read_invalidates(self):
+        self._post(self.joined, self.organizer, 2)
+        self.assertEqual(self._counts()['total'], 2)
+
+        response = self.client.post('/api/chat/messages/mark_read/', {
+            'user_id': self.reader.id, 'procurement_id': self.joined.id,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._counts()['total'], 0)
+
+    def test_bulk_insert_invalidates(self):
+        self.assertEqual(self._counts()['total'], 0)
+        self.client.post('/api/chat/messages/bulk/', {'messages': [{
+            'procurement_id': self.joined.id, 'user_id': self.organizer.id,
+            'text': 'hi', 'client_message_id': 'u1',
+        }]}, format='json')
+        self.assertEqual(self._counts()['total'], 1)
+
+    def test_joining_invalidates(self):
+        from procurements.models import Participant
+
+        self._post(self.foreign, self.organizer, 2)
+        self.assertNotIn(str(self.foreign.id), self._counts()['unread_counts'])
+        Participant.objects.create(
+            procurement=self.foreign, user=self.reader, quantity=1, amount=Decimal('10')
+        )
+        self.assertEqual(self._counts()['unread_counts'][str(self.foreign.id)], 2)
+
+    def test_user_id_required(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'user_id': 'abc'}).status_code, 400)
+
+
+class TestBotUnreadCounts:
+    """The /chat keyboard fetches all unread counts in one API call"""
+
+    @pytest.mark.asyncio
+    async def test_get_unread_counts_parses_keys(self):
+        from api_client import APIClient
+
+        client = APIClient()
+        with patch.object(client, '_request', AsyncMock(return_value={
+            'user_id': 1, 'unread_counts': {'5': 2, '7': 0}, 'total': 2,
+        })) as request:
+            counts = await client.get_unread_counts(1)
+        assert counts == {5: 2, 7: 0}
+        request.assert_awaited_once_with(
+            'GET', '/chat/messages/unread_counts/', params={'user_id': 1}
+        )
+
+    @pytest.mark.asyncio
+    async def test_get_unread_counts_handles_failure(self):
+        from api_client import APIClient
+
+        client = APIClient()
+        with patch.object(client, '_request', AsyncMock(return_value=None)):
+            assert await client.get_unread_counts(1) == {}
@@ -0,0 +1,139 @@
+"""
+Tests for opt-in keyset (cursor) pagination on the list endpoints.
+
+Requests with ?cursor= page by created_at without COUNT(*)/OFFSET; requests
+without it keep the page-number response.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import AsyncMock, patch
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+
+def _cursor(url):
+    return parse_qs(urlparse(url).query)['cursor'][0]
+
+
+class KeysetPaginationTests(APITestCase):
+    """Tests for ?cursor= on messages, procurements, participants and transactions"""
+
+    def setUp(self):
+        from users.models import User
+        from procurements.models import Procurement
+        from chat.models import Message
+
+        self.user = User.objects.create(platform='telegram', platform_user_id='ks_user', role='organizer')
+        self.procurement = Procurement.objects.create(
+            title='Keyset', description='x', organizer=self.user, city='Moscow',
+            target_amount=Decimal('1000'), deadline=timezone.now() + timedelta(days=7),
+        )
+        base = timezone.now() - timedelta(days=1)
+        self.messages = []
+        for i in range(25):
+            message = Message.objects.create(procurement=self.procurement, user=self.user, text=f'm{i}')
+            # Two messages share each timestamp to exercise the pk tie-break
+            Message.objects.filter(pk=message.pk).update(created_at=base + timedelta(minutes=i // 2))
+            self.messages.append(message)
+
+    def test_message_cursor_pages_newest_first_without_count(self):
+        url = f'/api/chat/messages/?procurement_id={self.procurement.id}&cursor=&page_size=10'
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn('count', resp.data)
+        self.assertEqual(resp.data['results'][0]['text'], 'm24')
+        self.assertIsNone(resp.data['previous'])
+
+        seen = []
+        while url:
+            resp = self.client.get(url)
+            seen.extend(item['id'] for item in resp.data['results'])
+            url = resp.data['next']
+        self.assertEqual(seen, [m.id for m in reversed(self.messages)])
+
+    def test_message_cursor_page_issues_no_count_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(f'/api/chat/messages/?procurement_id={self.procurement.id}&cursor=')
+        self.assertFalse(any('COUNT(' in q['sql'].upper() for q in ctx.captured_queries))
+
+    def test_page_number_is_still_the_default(self):
+        resp = self.client.get(f'/api/chat/messages/?procurement_id={self.procurement.id}')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['count'], 25)
+        self.assertEqual(len(resp.data['results']), 20)
+
+    def test_invalid_cursor_is_404(self):
+        resp = self.client.get(f'/api/chat/messages/?procurement_id={self.procurement.id}&cursor=garbage')
+        self.assertEqual(resp.status_code, 404)
+
+    def test_procurement_cursor_honours_ordering_param(self):
+        from procurements.models import Procurement
+        for amount in ('300', '200'):
+            Procurement.objects.create(
+                title=f'P{amount}', description='x', organizer=self.user, city='Moscow',
+                target_amount=Decimal(amount), deadline=timezone.now() + timedelta(days=7),
+            )
+        resp = self.client.get('/api/procurements/?cursor=&ordering=target_amount&page_size=2')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([p['title'] for p in resp.data['results']], ['P200', 'P300'])
+        resp = self.client.get(resp.data['next'])
+        self.assertEqual([p['title'] for p in resp.data['results']], ['Keyset'])
+
+    def test_participant_and_transaction_cursor(self):
+        from users.models import User
+        from procurements.models import Participant
+        from payments.models import Transaction
+
+        for i in range(3):
+            buyer = User.objects.create(platform='telegram', platform_user_id=f'ks_buyer{i}')
+            Participant.objects.create(procurement=self.procurement, user=buyer, amount=Decimal('10'))
+            Transaction.objects.create(
+                user=self.user, transaction_type='deposit', amount=Decimal(i + 1), balance_after=Decimal(i + 1)
+            )
+
+        resp = self.client.get(f'/api/procurements/participants/?procurement={self.procurement.id}&cursor=&page_size=2')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data['results']), 2)
+        self.assertEqual(len(self.client.get(resp.data['next']).data['results']), 1)
+
+        resp = self.client.get(f'/api/payments/transactions/?user_id={self.user.id}&cursor=')
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn('count', resp.data)
+        self.assertEqual([t['amount'] for t in resp.data['results']], ['3.00', '2.00', '1.00'])
+
+
+class TestBotHistoryPaging:
+    """Tests for the bot's cursor-based history client"""
+
+    @pytest.mark.asyncio
+    async def test_get_messages_returns_next_cursor(self):
+        from bot.api_client import APIClient
+
+        client = APIClient(base_url="http://localhost:8000/api")
+        with patch.object(client, '_request', new_callable=AsyncMock) as mock:
+            mock.return_value = {
+                "next": "http://localhost:8000/api/chat/messages/?cursor=cD0y&procurement_id=1",
+                "previous": None,
+                "results": [{"id": 2}, {"id": 1}],
+            }
+            page = await client.get_messages(1)
+
+        assert page["next_cursor"] == "cD0y"
+        assert [m["id"] for m in page["results"]] == [2, 1]
+        assert mock.call_args.kwargs["params"]["cursor"] == ""
+
+    @pytest.mark.asyncio
+    async def test_get_procurements_requests_keyset_page(self):
+        from bot.api_client import APIClient
+
+        client = APIClient(base_url="http://localhost:8000/api")
+        with patch.object(client, '_request', new_callable=AsyncMock) as mock:
+            mock.return_value = {"next": None, "previous": None, "results": [{"id": 1}]}
+            await client.get_procurements(limit=5)
+
+        assert mock.call_args.kwargs["params"] == {"cursor": "", "page_size": 5}
@@ -0,0 +1,93 @@
+"""
+Tests for the balance ledger: post_entry, the LedgerTotals running totals
+behind the balance / summary endpoints and manage.py verify_ledger.
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+
+class LedgerTests(APITestCase):
+
+    def setUp(self):
+        from users.models import User
+
+        self.user = User.objects.create(platform='telegram', platform_user_id='ledger1')
+
+    def _post(self, transaction_type, amount):
+        from payments.ledger import post_entry
+        return post_entry(self.user.id, transaction_type, Decimal(amount))
+
+    def test_post_entry_moves_balance_and_totals(self):
+        from payments.ledger import get_totals
+
+        self._post('deposit', '100.00')
+        entry = self._post('procurement_join', '-30.50')
+        self._post('procurement_refund', '10.00')
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal('79.50'))
+        self.assertEqual(entry.balance_after, Decimal('69.50'))
+        totals = get_totals(self.user.id)
+        self.assertEqual(
+            (totals.deposited, totals.spent, totals.refunded, totals.transaction_count),
+            (Decimal('100.00'), Decimal('-30.50'), Decimal('10.00'), 3),
+        )
+
+    def test_balance_and_summary_are_single_row_reads(self):
+        self._post('deposit', '100.00')
+        self._post('withdrawal', '-40.00')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/payments/transactions/summary/', {'user_id': self.user.id})
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(response.data['total_deposited'], '100.00')
+        self.assertEqual(response.data['total_withdrawn'], '40.00')
+        self.assertEqual(response.data['current_balance'], '60.00')
+        self.assertEqual(response.data['transaction_count'], 2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/users/{self.user.id}/balance/')
+        self.assertFalse(any('SUM(' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(Decimal(response.data['total_spent']), Decimal('40'))
+
+    def test_update_balance_endpoint_uses_decimal(self):
+        from payments.models import Transaction
+
+        response = self.client.post(
+            f'/api/users/{self.user.id}/update_balance/', {'amount': '0.10'}, format='json'
+        )
+        self.client.post(f'/api/users/{self.user.id}/update_balance/', {'amount': '0.20'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal('0.30'))
+        self.assertEqual(Transaction.objects.filter(user=self.user, transaction_type='bonus').count(), 2)
+
+        response = self.client.post(
+            f'/api/users/{self.user.id}/update_balance/', {'amount': 'abc'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_verify_ledger_reports_and_fixes_drift(self):
+        from payments.ledger import get_totals
+        from payments.models import LedgerTotals, Transaction
+
+        self._post('deposit', '100.00')
+        self._post('withdrawal', '-40.00')
+
+        out = StringIO()
+        call_command('verify_ledger', stdout=out)
+        self.assertIn('0 chain, 0 balance, 0 totals mismatches', out.getvalue())
+
+        LedgerTotals.objects.filter(user_id=self.user.id).update(deposited=Decimal('5'))
+        Transaction.objects.filter(user=self.user, transaction_type='withdrawal').update(
+            balance_after=Decimal('61.00')
+        )
+        out = StringIO()
+        call_command('verify_ledger', '--fix', '--chunk-size', '1', stdout=out)
+        self.assertIn('1 chain, 1 balance, 1 totals mismatches', out.getvalue())
+        self.assertEqual(get_totals(self.user.id).deposited, Decimal('100.00'))
@@ -0,0 +1,109 @@
+"""
+Tests for the Tochka reconciliation worker: the status endpoint only reads
+the database and manage.py reconcile_tochka_payments applies bank statuses.
+"""
+import asyncio
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+
+class FakeClient:
+
+    def __init__(self, statuses):
+        self.aget_payment_status = AsyncMock(
+            side_effect=lambda external_id: {'status': statuses[external_id], 'raw': {}}
+        )
+        self.aclose = AsyncMock()
+
+
+class PaymentReconciliationTests(APITestCase):
+
+    def setUp(self):
+        from users.models import User
+        from payments.models import Payment
+
+        self.user = User.objects.create(platform='telegram', platform_user_id='rc1', balance=Decimal('10'))
+        self.payment = Payment.objects.create(
+            user=self.user, payment_type='deposit', amount=Decimal('100.00'),
+            provider='tochka', order_id='ORD-1', external_id='ext-1',
+        )
+
+    def test_status_endpoint_does_not_call_bank(self):
+        with patch('payments.tochka_client.TochkaCyclopsClient.get_payment_status') as bank:
+            response = self.client.get(f'/api/payments/{self.payment.id}/status/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'pending')
+        bank.assert_not_called()
+
+    def test_succeeded_payment_is_credited_once(self):
+        from payments.models import Payment, Transaction
+        from payments.reconciliation import reconcile_batch
+
+        client = FakeClient({'ext-1': 'succeeded'})
+        payments, changed = reconcile_batch(client)
+        self.assertEqual((len(payments), len(changed)), (1, 1))
+        client.aclose.assert_awaited()
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.Status.SUCCEEDED)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal('110.00'))
+
+        Payment.objects.filter(pk=self.payment.pk).update(next_status_check_at=None)
+        self.assertEqual(reconcile_batch(client), ([], []))
+        self.assertEqual(Transaction.objects.filter(payment=self.payment).count(), 1)
+
+    def test_pending_payment_check_backs_off_with_age(self):
+        from payments.models import Payment
+        from payments.reconciliation import MAX_INTERVAL, reconcile_batch
+
+        Payment.objects.filter(pk=self.payment.pk).update(created_at=timezone.now() - timedelta(days=1))
+        client = FakeClient({'ext-1': 'pending'})
+        before = timezone.now()
+        payments, changed = reconcile_batch(client)
+        self.assertEqual((len(payments), changed), (1, []))
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+        self.assertGreaterEqual(self.payment.next_status_check_at, before + MAX_INTERVAL)
+
+        # Not due again until then
+        self.assertEqual(reconcile_batch(client), ([], []))
+        self.assertEqual(client.aget_payment_status.await_count, 1)
+
+    def test_oldest_payments_first(self):
+        from payments.models import Payment
+        from payments.reconciliation import claim_payments
+
+        older = Payment.objects.create(
+            user=self.user, payment_type='deposit', amount=Decimal('5.00'),
+            provider='tochka', order_id='ORD-0', external_id='ext-0',
+        )
+        Payment.objects.filter(pk=older.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual([payment.pk for payment in claim_payments(1)], [older.pk])
+
+    def test_rate_limiter_spaces_requests(self):
+        from payments.reconciliation import fetch_statuses
+
+        external_ids = [f'ext-{i}' for i in range(5)]
+        client = FakeClient(dict.fromkeys(external_ids, 'pending'))
+        start = time.monotonic()
+        results = asyncio.run(fetch_statuses(client, external_ids, concurrency=5, rate=50))
+        self.assertGreaterEqual(time.monotonic() - start, 4 / 50 * 0.9)
+        self.assertEqual(len(results), 5)
+
+    def test_bank_error_leaves_payment_pending(self):
+        from payments.reconciliation import reconcile_batch
+        from payments.tochka_client import TochkaCyclopsError
+
+        client = MagicMock(aclose=AsyncMock())
+        client.aget_payment_status = AsyncMock(side_effect=TochkaCyclopsError('timeout'))
+        payments, changed = reconcile_batch(client)
+        self.assertEqual((len(payments), changed), (1, []))
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
@@ -0,0 +1,87 @@
+"""
+Tests for the payment summary service behind /api/admin/payments/summary/:
+one conditional-aggregation query, cached per filter set until a payment
+changes, and manage.py benchmark_summaries.
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User as DjangoUser
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+URL = '/api/admin/payments/summary/'
+
+
+class PaymentSummaryTests(APITestCase):
+
+    def setUp(self):
+        from users.models import User
+        from payments.models import Payment
+
+        DjangoUser.objects.create_user(username='admin', password='adminpass123', is_staff=True)
+        self.client.login(username='admin', password='adminpass123')
+        self.user = User.objects.create(platform='telegram', platform_user_id='sum1')
+        for amount, status, payment_type in [
+            ('100.00', 'succeeded', 'deposit'),
+            ('50.00', 'succeeded', 'withdrawal'),
+            ('25.50', 'pending', 'deposit'),
+        ]:
+            Payment.objects.create(
+                user=self.user, amount=Decimal(amount), status=status, payment_type=payment_type
+            )
+
+    def test_matches_group_by_breakdowns_in_one_query(self):
+        from payments.models import Payment
+        from payments.summaries import payment_summary
+
+        with CaptureQueriesContext(connection) as ctx:
+            summary = payment_summary(Payment.objects.all())
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(summary['total_count'], 3)
+        self.assertEqual(summary['total_amount'], Decimal('175.50'))
+        self.assertEqual(summary['by_status'], {
+            'succeeded': {'count': 2, 'total': Decimal('150.00')},
+            'pending': {'count': 1, 'total': Decimal('25.50')},
+        })
+        self.assertEqual(summary['by_type'], {
+            'deposit': {'count': 2, 'total': Decimal('125.50')},
+            'withdrawal': {'count': 1, 'total': Decimal('50.00')},
+        })
+
+    def test_empty_queryset(self):
+        from payments.models import Payment
+        from payments.summaries import payment_summary
+
+        summary = payment_summary(Payment.objects.none().filter(status='refunded'))
+        self.assertEqual(summary, {'total_count': 0, 'total_amount': 0, 'by_status': {}, 'by_type': {}})
+
+    def test_endpoint_caches_per_filter_until_a_payment_changes(self):
+        from payments.models import Payment
+
+        self.assertEqual(self.client.get(URL).data['total_count'], 3)
+        self.assertEqual(self.client.get(URL, {'status': 'pending'}).data['total_count'], 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(URL, {'status': 'pending'})
+        self.assertEqual(response.data['total_count'], 1)
+        self.assertFalse(any('"payments"' in q['sql'] for q in ctx.captured_queries))
+
+        payment = Payment.objects.get(status='pending')
+        payment.status = 'succeeded'
+        payment.save()
+        self.assertEqual(self.client.get(URL, {'status': 'pending'}).data['total_count'], 0)
+        self.assertEqual(self.client.get(URL).data['by_status']['succeeded']['count'], 3)
+
+    def test_benchmark_command_rolls_back_seed(self):
+        from payments.models import Payment, Transaction
+
+        out = StringIO()
+        call_command('benchmark_summaries', '--seed', '30', '--repeat', '1', stdout=out)
+        output = out.getvalue()
+        self.assertIn('payment summary: before', output)
+        self.assertIn('transaction summary: ledger row', output)
+        self.assertEqual(Payment.objects.count(), 3)
+        self.assertEqual(Transaction.objects.count(), 0)
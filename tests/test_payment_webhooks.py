@@ -0,0 +1,129 @@
+"""
+Tests for the payment webhook inbox: the endpoints only store events
+(deduplicated by provider event ID) and manage.py run_payment_webhooks
+applies them exactly once.
+"""
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+
+
+class PaymentWebhookTests(APITestCase):
+
+    def setUp(self):
+        from users.models import User
+        from payments.models import Payment
+
+        self.user = User.objects.create(platform='telegram', platform_user_id='wh1', balance=Decimal('10'))
+        self.payment = Payment.objects.create(
+            user=self.user, payment_type='deposit', amount=Decimal('100.00'),
+            provider='tochka', order_id='ORD-1', external_id='ext-1',
+        )
+
+    def _tochka(self, event_type, event_id='evt-1', order_id='ORD-1', **payment):
+        return self.client.post('/api/payments/webhook/tochka/', {
+            'eventId': event_id, 'eventType': event_type, 'payment': {'orderId': order_id, **payment},
+        }, format='json')
+
+    def _run(self):
+        out = StringIO()
+        call_command('run_payment_webhooks', '--once', stdout=out)
+        return out.getvalue()
+
+    def _balance(self):
+        self.user.refresh_from_db()
+        return self.user.balance
+
+    def test_endpoint_only_enqueues(self):
+        from payments.models import WebhookEvent
+
+        response = self._tochka('payment.succeeded')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(WebhookEvent.objects.get().status, 'pending')
+        self.assertEqual(self._balance(), Decimal('10'))
+
+    def test_provider_retries_credit_once(self):
+        from payments.models import Transaction, WebhookEvent
+
+        for _ in range(3):
+            self.assertEqual(self._tochka('payment.succeeded').status_code, 200)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+
+        out = self._run()
+        self.assertIn('Processed 1', out)
+        self.assertEqual(self._balance(), Decimal('110.00'))
+        self.assertEqual(Transaction.objects.filter(payment=self.payment).count(), 1)
+
+        # A second success event for the same payment is recorded but ignored
+        self._tochka('payment.completed', event_id='evt-2')
+        self._run()
+        self.assertEqual(self._balance(), Decimal('110.00'))
+        self.assertEqual(WebhookEvent.objects.get(event_id='evt-2').status, 'ignored')
+
+    def test_refund_after_success(self):
+        self._tochka('payment.succeeded')
+        self._tochka('payment.refunded', event_id='evt-2', amount='40.00')
+        self._run()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'refunded')
+        self.assertEqual(self._balance(), Decimal('70.00'))
+
+    def test_unknown_payment_is_retried_until_it_appears(self):
+        from payments.models import Payment, WebhookEvent
+
+        self._tochka('payment.succeeded', order_id='ORD-2')
+        self._run()
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.error_message), ('pending', 'Payment not found'))
+        self.assertIsNotNone(event.next_attempt_at)
+
+        # Not due yet
+        self._run()
+        self.assertEqual(WebhookEvent.objects.get().attempts, 1)
+
+        Payment.objects.create(
+            user=self.user, payment_type='deposit', amount=Decimal('5.00'),
+            provider='tochka', order_id='ORD-2', external_id='ext-2',
+        )
+        WebhookEvent.objects.update(next_attempt_at=None)
+        self._run()
+        self.assertEqual(WebhookEvent.objects.get().status, 'processed')
+        self.assertEqual(self._balance(), Decimal('15.00'))
+
+    def test_missing_order_id(self):
+        response = self.client.post(
+            '/api/payments/webhook/tochka/', {'eventType': 'payment.succeeded', 'payment': {}}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_yookassa_events_deduplicate_without_event_id(self):
+        from payments.models import WebhookEvent
+
+        body = {'event': 'payment.succeeded', 'object': {'id': 'ext-1'}}
+        self.client.post('/api/payments/webhook/yookassa/', body, format='json')
+        self.client.post('/api/payments/webhook/yookassa/', body, format='json')
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+        self._run()
+        self.assertEqual(self._balance(), Decimal('110.00'))
+
+    def test_failing_event_is_retried_with_backoff_then_failed(self):
+        from payments.models import WebhookEvent
+        from payments.webhooks import MAX_ATTEMPTS, backoff, process_batch
+
+        self._tochka('payment.succeeded')
+        with patch('payments.processing.process_successful_payment', side_effect=RuntimeError('db down')):
+            process_batch()
+            event = WebhookEvent.objects.get()
+            self.assertEqual((event.status, event.attempts), ('pending', 1))
+            self.assertEqual(process_batch(), [])
+            for _ in range(MAX_ATTEMPTS - 1):
+                WebhookEvent.objects.update(next_attempt_at=None)
+                process_batch()
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.error_message), ('failed', 'db down'))
+        self.assertIsNone(event.next_attempt_at)
+        self.assertEqual(self._balance(), Decimal('10'))
+        self.assertLess(backoff(1), backoff(2))
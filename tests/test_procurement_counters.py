@@ -0,0 +1,427 @@
+"""
+Tests for the denormalized participant counters on Procurement.
+
+Covers incremental maintenance of active_participant_count / current_amount
+from join, leave, add_participant and participant update_status, the
+constant-query procurement list, the reconcile_procurement_counters
+management command, and the locked join / join_batch admission path
+(including a concurrent load test that runs on PostgreSQL).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import Client, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+
+class ProcurementCounterTests(APITestCase):
+    """Tests for incremental participant counters"""
+
+    def setUp(self):
+        from users.models import User
+        from procurements.models import Procurement
+
+        self.organizer = User.objects.create(
+            platform='telegram', platform_user_id='cnt_org', first_name='Org', role='organizer'
+        )
+        self.buyers = [
+            User.objects.create(platform='telegram', platform_user_id=f'cnt_buyer{i}', first_name=f'B{i}')
+            for i in range(3)
+        ]
+        self.procurement = Procurement.objects.create(
+            title='Counter Test',
+            description='Counters',
+            organizer=self.organizer,
+            city='Moscow',
+            target_amount=Decimal('10000'),
+            deadline='2099-12-31T23:59:59Z',
+            status=Procurement.Status.ACTIVE,
+        )
+
+    def _join(self, user, amount):
+        return self.client.post(f'/api/procurements/{self.procurement.id}/join/', {
+            'user_id': user.id, 'quantity': 1, 'amount': amount,
+        }, format='json')
+
+    def test_join_increments_counters(self):
+        """join bumps active_participant_count and current_amount."""
+        self.assertEqual(self._join(self.buyers[0], 1000).status_code, 201)
+        self.assertEqual(self._join(self.buyers[1], 500).status_code, 201)
+
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.active_participant_count, 2)
+        self.assertEqual(self.procurement.current_amount, Decimal('1500'))
+
+    def test_leave_decrements_counters(self):
+        """leave subtracts the participant from both counters."""
+        self._join(self.buyers[0], 1000)
+        self._join(self.buyers[1], 500)
+
+        resp = self.client.post(f'/api/procurements/{self.procurement.id}/leave/', {
+            'user_id': self.buyers[0].id,
+        }, format='json')
+        self.assertEqual(resp.status_code, 200)
+
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.active_participant_count, 1)
+        self.assertEqual(self.procurement.current_amount, Decimal('500'))
+
+    def test_add_participant_increments_counters(self):
+        """Organizer add_participant maintains counters like join."""
+        resp = self.client.post(f'/api/procurements/{self.procurement.id}/add_participant/', {
+            'user_id': self.buyers[0].id, 'organizer_id': self.organizer.id, 'amount': 700,
+        }, format='json')
+        self.assertEqual(resp.status_code, 201)
+
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.active_participant_count, 1)
+        self.assertEqual(self.procurement.current_amount, Decimal('700'))
+
+    def test_cancel_via_update_status_decrements_counters(self):
+        """Cancelling a participant via update_status deactivates it."""
+        participant_id = self._join(self.buyers[0], 1000).data['id']
+
+        resp = self.client.post(
+            f'/api/procurements/participants/{participant_id}/update_status/',
+            {'status': 'cancelled'}, format='json'
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(resp.data['is_active'])
+
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.active_participant_count, 0)
+        self.assertEqual(self.procurement.current_amount, Decimal('0'))
+
+    def test_confirm_via_update_status_keeps_counters(self):
+        """Non-cancelling status changes leave counters untouched."""
+        participant_id = self._join(self.buyers[0], 1000).data['id']
+
+        self.client.post(
+            f'/api/procurements/participants/{participant_id}/update_status/',
+            {'status': 'confirmed'}, format='json'
+        )
+
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.active_participant_count, 1)
+        self.assertEqual(self.procurement.current_amount, Decimal('1000'))
+
+    def test_stop_amount_reached_stops_procurement(self):
+        """Crossing stop_at_amount moves the procurement to STOPPED."""
+        self.procurement.stop_at_amount = Decimal('1200')
+        self.procurement.save(update_fields=['stop_at_amount'])
+
+        self._join(self.buyers[0], 1000)
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.status, 'active')
+
+        self._join(self.buyers[1], 500)
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.status, 'stopped')
+
+    def test_stale_full_save_keeps_counters(self):
+        """A full save of an instance loaded before a join does not undo it."""
+        from procurements.models import Procurement
+
+        stale = Procurement.objects.get(pk=self.procurement.pk)
+        self._join(self.buyers[0], 1000)
+        stale.title = 'Renamed'
+        stale.save()
+
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.title, 'Renamed')
+        self.assertEqual(self.procurement.active_participant_count, 1)
+        self.assertEqual(self.procurement.current_amount, Decimal('1000'))
+
+    def test_list_is_constant_query(self):
+        """Listing procurements does not issue a COUNT per row."""
+        from procurements.models import Procurement
+
+        self._join(self.buyers[0], 1000)
+
+        with CaptureQueriesContext(connection) as small_page:
+            resp = self.client.get('/api/procurements/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['results'][0]['participant_count'], 1)
+
+        for i in range(10):
+            Procurement.objects.create(
+                title=f'Extra {i}', description='x', organizer=self.organizer, city='Kazan',
+                target_amount=Decimal('100'), deadline='2099-12-31T23:59:59Z',
+            )
+
+        with CaptureQueriesContext(connection) as big_page:
+            self.client.get('/api/procurements/')
+        self.assertEqual(len(big_page.captured_queries), len(small_page.captured_queries))
+
+
+class ReconcileProcurementCountersTests(APITestCase):
+    """Tests for the reconcile_procurement_counters management command"""
+
+    def setUp(self):
+        from users.models import User
+        from procurements.models import Participant, Procurement
+
+        organizer = User.objects.create(platform='telegram', platform_user_id='rec_org', role='organizer')
+        buyer = User.objects.create(platform='telegram', platform_user_id='rec_buyer')
+        self.procurement = Procurement.objects.create(
+            title='Drifted', description='x', organizer=organizer, city='Moscow',
+            target_amount=Decimal('5000'), deadline='2099-12-31T23:59:59Z',
+        )
+        Participant.objects.create(procurement=self.procurement, user=buyer, amount=Decimal('250'))
+        # Simulate drift left behind by a bulk write that bypassed the model
+        Procurement.objects.filter(pk=self.procurement.pk).update(
+            active_participant_count=7, current_amount=Decimal('9')
+        )
+
+    def test_dry_run_reports_without_fixing(self):
+        out = StringIO()
+        call_command('reconcile_procurement_counters', '--dry-run', stdout=out)
+        self.assertIn(f'Procurement {self.procurement.id}', out.getvalue())
+
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.active_participant_count, 7)
+
+    def test_repairs_drift(self):
+        out = StringIO()
+        call_command('reconcile_procurement_counters', stdout=out)
+        self.assertIn('Repaired 1', out.getvalue())
+
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.active_participant_count, 1)
+        self.assertEqual(self.procurement.current_amount, Decimal('250'))
+
+    def test_consistent_counters_are_left_alone(self):
+        call_command('reconcile_procurement_counters', stdout=StringIO())
+        out = StringIO()
+        call_command('reconcile_procurement_counters', stdout=out)
+        self.assertIn('consistent', out.getvalue())
+
+
+class ParticipantDeltaAccountingTests(APITestCase):
+    """Tests for delta-based amount accounting in Participant.save()/delete()"""
+
+    def setUp(self):
+        from users.models import User
+        from procurements.models import Procurement
+
+        organizer = User.objects.create(platform='telegram', platform_user_id='dlt_org', role='organizer')
+        self.buyer = User.objects.create(platform='telegram', platform_user_id='dlt_buyer')
+        self.procurement = Procurement.objects.create(
+            title='Delta', description='x', organizer=organizer, city='Moscow',
+            target_amount=Decimal('5000'), deadline='2099-12-31T23:59:59Z',
+            status=Procurement.Status.ACTIVE,
+        )
+
+    def _create_participant(self, amount='300'):
+        from procurements.models import Participant
+        return Participant.objects.create(
+            procurement=self.procurement, user=self.buyer, amount=Decimal(amount)
+        )
+
+    def _procurement_updates(self, queries):
+        return [q['sql'] for q in queries if q['sql'].startswith('UPDATE "procurements"')]
+
+    def test_create_applies_delta_in_one_update_without_aggregate(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self._create_participant()
+        sql = [q['sql'] for q in ctx.captured_queries]
+        self.assertEqual(len(self._procurement_updates(ctx.captured_queries)), 1)
+        self.assertFalse(any('SUM(' in q for q in sql))
+
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.current_amount, Decimal('300'))
+        self.assertEqual(self.procurement.active_participant_count, 1)
+
+    def test_status_only_save_skips_accounting(self):
+        from procurements.models import Participant
+        participant = Participant.objects.get(pk=self._create_participant().pk)
+
+        participant.status = Participant.Status.CONFIRMED
+        with CaptureQueriesContext(connection) as ctx:
+            participant.save(update_fields=['status', 'updated_at'])
+        self.assertEqual(self._procurement_updates(ctx.captured_queries), [])
+
+    def test_unchanged_full_save_skips_accounting(self):
+        from procurements.models import Participant
+        participant = Participant.objects.get(pk=self._create_participant().pk)
+
+        participant.notes = 'no amount change'
+        with CaptureQueriesContext(connection) as ctx:
+            participant.save()
+        self.assertEqual(self._procurement_updates(ctx.captured_queries), [])
+
+    def test_amount_change_applies_difference(self):
+        from procurements.models import Participant
+        participant = Participant.objects.get(pk=self._create_participant('300').pk)
+
+        participant.amount = Decimal('450')
+        participant.save()
+
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.current_amount, Decimal('450'))
+        self.assertEqual(self.procurement.active_participant_count, 1)
+
+    def test_patch_participant_amount_via_api(self):
+        participant = self._create_participant('300')
+        resp = self.client.patch(
+            f'/api/procurements/participants/{participant.pk}/', {'amount': '100'}, format='json'
+        )
+        self.assertEqual(resp.status_code, 200)
+
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.current_amount, Decimal('100'))
+
+    def test_delete_subtracts_contribution(self):
+        participant = self._create_participant('300')
+        participant.delete()
+
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.current_amount, Decimal('0'))
+        self.assertEqual(self.procurement.active_participant_count, 0)
+
+    def test_crossing_stop_amount_is_conditional(self):
+        """STOPPED is only set on an active procurement that crosses the threshold."""
+        from procurements.models import Procurement
+        Procurement.objects.filter(pk=self.procurement.pk).update(
+            stop_at_amount=Decimal('200'), status=Procurement.Status.PAYMENT
+        )
+        self._create_participant('300')
+
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.status, Procurement.Status.PAYMENT)
+        self.assertEqual(self.procurement.current_amount, Decimal('300'))
+
+
+class JoinAdmissionTests(APITestCase):
+    """Tests for the locked join path and POST /join_batch/"""
+
+    def setUp(self):
+        from users.models import User
+        from procurements.models import Procurement
+
+        self.organizer = User.objects.create(platform='telegram', platform_user_id='adm_org', role='organizer')
+        self.buyers = [
+            User.objects.create(platform='telegram', platform_user_id=f'adm_buyer{i}')
+            for i in range(6)
+        ]
+        self.procurement = Procurement.objects.create(
+            title='Admission', description='x', organizer=self.organizer, city='Moscow',
+            target_amount=Decimal('5000'), stop_at_amount=Decimal('300'),
+            deadline='2099-12-31T23:59:59Z', status=Procurement.Status.ACTIVE,
+        )
+        self.url = f'/api/procurements/{self.procurement.id}/join_batch/'
+
+    def _entries(self, users, amount=100):
+        return [{'user_id': u.id, 'amount': amount} for u in users]
+
+    def test_batch_admits_until_stop_amount(self):
+        resp = self.client.post(self.url, {'participants': self._entries(self.buyers)}, format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(len(resp.data['admitted']), 3)
+        self.assertEqual(len(resp.data['rejected']), 3)
+        self.assertEqual(resp.data['status'], 'stopped')
+
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.current_amount, Decimal('300'))
+        self.assertEqual(self.procurement.active_participant_count, 3)
+
+    def test_batch_rejects_duplicates_and_unknown_users(self):
+        entries = self._entries([self.buyers[0], self.buyers[0]]) + [{'user_id': 999999, 'amount': 10}]
+        resp = self.client.post(self.url, {'participants': entries}, format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(len(resp.data['admitted']), 1)
+        errors = sorted(r['error'] for r in resp.data['rejected'])
+        self.assertEqual(errors, ['Already participating in this procurement', 'User not found'])
+
+    def test_batch_with_wrong_organizer_forbidden(self):
+        resp = self.client.post(self.url, {
+            'participants': self._entries(self.buyers[:1]), 'organizer_id': self.buyers[1].id,
+        }, format='json')
+        self.assertEqual(resp.status_code, 403)
+
+    def test_batch_with_organizer(self):
+        resp = self.client.post(self.url, {
+            'participants': self._entries(self.buyers[:2]), 'organizer_id': self.organizer.id,
+        }, format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data['participant_count'], 2)
+
+    def test_batch_all_rejected_returns_400(self):
+        self.client.post(self.url, {'participants': self._entries(self.buyers[:3])}, format='json')
+        resp = self.client.post(self.url, {'participants': self._entries(self.buyers[3:])}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data['admitted'], [])
+
+    def test_rejoin_after_leave_reactivates_row(self):
+        """Re-joining reuses the inactive row instead of violating unique_together."""
+        from procurements.models import Participant
+        join_url = f'/api/procurements/{self.procurement.id}/join/'
+        self.client.post(join_url, {'user_id': self.buyers[0].id, 'amount': 100}, format='json')
+        self.client.post(
+            f'/api/procurements/{self.procurement.id}/leave/', {'user_id': self.buyers[0].id}, format='json'
+        )
+
+        resp = self.client.post(join_url, {'user_id': self.buyers[0].id, 'amount': 150}, format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(Participant.objects.filter(procurement=self.procurement).count(), 1)
+
+        self.procurement.refresh_from_db()
+        self.assertEqual(self.procurement.current_amount, Decimal('150'))
+        self.assertEqual(self.procurement.active_participant_count, 1)
+
+    def test_join_twice_rejected(self):
+        join_url = f'/api/procurements/{self.procurement.id}/join/'
+        self.client.post(join_url, {'user_id': self.buyers[0].id, 'amount': 100}, format='json')
+        resp = self.client.post(join_url, {'user_id': self.buyers[0].id, 'amount': 100}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data['error'], 'Already participating in this procurement')
+
+
+@pytest.mark.skipif(
+    not connection.features.has_select_for_update,
+    reason='concurrent admission load test needs row-level locks (PostgreSQL)',
+)
+class ConcurrentJoinLoadTests(TransactionTestCase):
+    """Load test: many concurrent joins never overshoot stop_at_amount."""
+
+    JOINERS = 40
+
+    def test_concurrent_joins_do_not_overshoot(self):
+        from users.models import User
+        from procurements.models import Participant, Procurement
+
+        organizer = User.objects.create(platform='telegram', platform_user_id='load_org', role='organizer')
+        buyers = [
+            User.objects.create(platform='telegram', platform_user_id=f'load_buyer{i}')
+            for i in range(self.JOINERS)
+        ]
+        procurement = Procurement.objects.create(
+            title='Flash', description='x', organizer=organizer, city='Moscow',
+            target_amount=Decimal('5000'), stop_at_amount=Decimal('1000'),
+            deadline='2099-12-31T23:59:59Z', status=Procurement.Status.ACTIVE,
+        )
+
+        def join(user):
+            try:
+                return Client().post(
+                    f'/api/procurements/{procurement.id}/join/',
+                    {'user_id': user.id, 'amount': '100'},
+                    content_type='application/json',
+                ).status_code
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            codes = list(pool.map(join, buyers))
+
+        procurement.refresh_from_db()
+        self.assertEqual(codes.count(201), 10)
+        self.assertEqual(procurement.current_amount, Decimal('1000'))
+        self.assertEqual(procurement.active_participant_count, 10)
+        self.assertEqual(procurement.status, Procurement.Status.STOPPED)
+        self.assertEqual(Participant.objects.filter(procurement=procurement, is_active=True).count(), 10)
@@ -0,0 +1,141 @@
+"""
+Tests for procurement search: GET /api/procurements/search/, the ?search=
+list filter, the admin procurement search and the bot search handler.
+
+The SQLite test database exercises the icontains fallback; the ranking and
+typo-tolerance test only runs on PostgreSQL with pg_trgm.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from django.contrib.auth.models import User as DjangoUser
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+
+class ProcurementSearchTests(APITestCase):
+    """Tests for the search endpoint and search-backed filters"""
+
+    def setUp(self):
+        from users.models import User
+        from procurements.models import Procurement
+
+        self.organizer = User.objects.create(
+            platform='telegram', platform_user_id='srch_org', first_name='Svetlana', role='organizer'
+        )
+        deadline = timezone.now() + timedelta(days=7)
+        self.honey = Procurement.objects.create(
+            title='Altai honey', description='Wildflower honey from Altai', organizer=self.organizer,
+            city='Barnaul', target_amount=Decimal('1000'), deadline=deadline, status='active',
+        )
+        self.tea = Procurement.objects.create(
+            title='Green tea', description='Loose leaf', organizer=self.organizer,
+            city='Moscow', target_amount=Decimal('1000'), deadline=deadline, status='active',
+        )
+        self.draft = Procurement.objects.create(
+            title='Buckwheat honey', description='Dark honey', organizer=self.organizer,
+            city='Moscow', target_amount=Decimal('1000'), deadline=deadline, status='draft',
+        )
+
+    def test_search_matches_title_description_and_city(self):
+        resp = self.client.get('/api/procurements/search/', {'q': 'honey'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual({p['id'] for p in resp.data['results']}, {self.honey.id, self.draft.id})
+
+        resp = self.client.get('/api/procurements/search/', {'q': 'mosc'})
+        self.assertEqual({p['id'] for p in resp.data['results']}, {self.tea.id, self.draft.id})
+
+    def test_search_combines_with_list_filters(self):
+        resp = self.client.get('/api/procurements/search/', {'q': 'honey', 'status': 'active'})
+        self.assertEqual([p['id'] for p in resp.data['results']], [self.honey.id])
+
+    def test_search_requires_query(self):
+        resp = self.client.get('/api/procurements/search/', {'q': ' h '})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('error', resp.data)
+
+    def test_list_search_param_uses_search_backend(self):
+        resp = self.client.get('/api/procurements/', {'search': 'tea'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([p['id'] for p in resp.data['results']], [self.tea.id])
+
+    def test_admin_search_still_matches_organizer_name(self):
+        DjangoUser.objects.create_user(username='admin', password='adminpass123', is_staff=True)
+        self.client.login(username='admin', password='adminpass123')
+
+        resp = self.client.get('/api/admin/procurements/', {'search': 'Svetlana'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data['results']), 3)
+        resp = self.client.get('/api/admin/procurements/', {'search': 'tea'})
+        self.assertEqual([p['id'] for p in resp.data['results']], [self.tea.id])
+
+    def test_search_vector_refreshed_only_when_text_changes(self):
+        from procurements.models import Procurement
+
+        procurement = Procurement.objects.get(pk=self.tea.pk)
+        with patch.object(Procurement, 'update_search_vector') as refresh:
+            procurement.status = 'stopped'
+            procurement.save()
+            refresh.assert_not_called()
+
+            procurement.city = 'Kazan'
+            procurement.save()
+            refresh.assert_called_once()
+
+            procurement.title = 'Black tea'
+            procurement.save(update_fields=['status'])
+            self.assertEqual(refresh.call_count, 1)
+
+
+@pytest.mark.skipif(
+    connection.vendor != 'postgresql',
+    reason='full-text ranking and trigram matching need PostgreSQL with pg_trgm',
+)
+class PostgresProcurementSearchTests(APITestCase):
+    """Ranking, stemming and typo tolerance on the real search backend"""
+
+    def test_ranked_and_typo_tolerant(self):
+        from users.models import User
+        from procurements.models import Procurement
+
+        organizer = User.objects.create(platform='telegram', platform_user_id='pg_org', role='organizer')
+        deadline = timezone.now() + timedelta(days=7)
+        title_hit = Procurement.objects.create(
+            title='Мёд алтайский', description='Натуральный', organizer=organizer,
+            city='Барнаул', target_amount=Decimal('1000'), deadline=deadline,
+        )
+        description_hit = Procurement.objects.create(
+            title='Чай', description='Чай с мёдом', organizer=organizer,
+            city='Москва', target_amount=Decimal('1000'), deadline=deadline,
+        )
+
+        resp = self.client.get('/api/procurements/search/', {'q': 'мёд'})
+        self.assertEqual([p['id'] for p in resp.data['results']], [title_hit.id, description_hit.id])
+
+        resp = self.client.get('/api/procurements/search/', {'q': 'алтайскй'})
+        self.assertEqual([p['id'] for p in resp.data['results']], [title_hit.id])
+
+
+class TestBotSearch:
+    """The bot delegates search to the Core API instead of filtering locally"""
+
+    @pytest.mark.asyncio
+    async def test_process_search_query_uses_search_endpoint(self):
+        from bot.handlers.procurement_commands import process_search_query
+
+        message = AsyncMock()
+        message.text = 'honey'
+        state = AsyncMock()
+
+        with patch(
+            'bot.handlers.procurement_commands.api_client.search_procurements',
+            new_callable=AsyncMock,
+            return_value=[{'id': 1, 'title': 'Altai honey', 'progress': 10}],
+        ) as search:
+            await process_search_query(message, state)
+
+        search.assert_awaited_once_with('honey', status='active')
+        assert 'Found 1 procurement' in message.answer.call_args.args[0]
@@ -0,0 +1,110 @@
+"""
+Tests for the shared receipt builder behind receipt_table and
+send_to_supplier: SQL/Decimal totals, snapshot caching keyed on the
+participant version and the CSV / XLSX renderings.
+"""
+import csv
+import importlib.util
+import io
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+OPENPYXL_INSTALLED = importlib.util.find_spec('openpyxl') is not None
+
+
+class ReceiptTests(APITestCase):
+
+    def setUp(self):
+        from users.models import User
+        from procurements.models import Participant, Procurement
+
+        cache.clear()
+        self.organizer = User.objects.create(
+            platform='telegram', platform_user_id='rc_org', role='organizer'
+        )
+        self.procurement = Procurement.objects.create(
+            title='Honey', description='x', organizer=self.organizer, city='Tula',
+            target_amount=Decimal('1000'), deadline=timezone.now() + timedelta(days=7),
+            commission_percent=Decimal('2.50'), status=Procurement.Status.ACTIVE,
+        )
+        self.participants = []
+        for i, (amount, participant_status) in enumerate(
+            (('0.10', 'confirmed'), ('0.20', 'paid'), ('99.99', 'pending'))
+        ):
+            user = User.objects.create(
+                platform='telegram', platform_user_id=f'rc_{i}', first_name=f'Buyer{i}', phone='+7900'
+            )
+            self.participants.append(Participant.objects.create(
+                procurement=self.procurement, user=user, amount=Decimal(amount), status=participant_status,
+            ))
+        self.url = f'/api/procurements/{self.procurement.id}/receipt_table/'
+
+    def test_totals_are_exact(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_participants'], 2)
+        self.assertEqual(response.data['total_amount'], '0.30')
+        self.assertEqual(response.data['commission_amount'], '0.01')
+        self.assertEqual([row['full_name'] for row in response.data['rows']], ['Buyer0', 'Buyer1'])
+        self.assertEqual(response.data['rows'][0]['amount'], '0.10')
+
+    def test_snapshot_is_cached_until_a_participant_changes(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertFalse(any('FROM "participants"' in q['sql'] for q in ctx.captured_queries))
+
+        # A status-only save does not touch the procurement row
+        pending = self.participants[2]
+        pending.status = 'confirmed'
+        pending.save(update_fields=['status', 'updated_at'])
+        self.assertEqual(self.client.get(self.url).data['total_participants'], 3)
+
+        pending.delete()
+        self.assertEqual(self.client.get(self.url).data['total_participants'], 2)
+
+    def test_send_to_supplier_uses_the_receipt(self):
+        from procurements.models import SupplierDocumentJob
+
+        response = self.client.post(
+            f'/api/procurements/{self.procurement.id}/send_to_supplier/',
+            {'organizer_id': self.organizer.id}, format='json',
+        )
+        self.assertEqual(response.status_code, 202)
+        payload = SupplierDocumentJob.objects.get(pk=response.data['job_id']).request_payload
+        self.assertEqual(payload, self.client.get(self.url).data)
+
+    def test_csv(self):
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('receipt-', response['Content-Disposition'])
+        body = b''.join(response.streaming_content).decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0][:2], ['user_id', 'full_name'])
+        self.assertEqual(rows[1][5], '0.10')
+        self.assertEqual(rows[-2][1:6], ['Total', '', '', '', '0.30'])
+        self.assertEqual(rows[-1][5], '0.01')
+
+    def test_xlsx_without_openpyxl(self):
+        with patch('procurements.views.OPENPYXL_AVAILABLE', False):
+            response = self.client.get(self.url, {'format': 'xlsx'})
+        self.assertEqual(response.status_code, 501)
+
+    @pytest.mark.skipif(not OPENPYXL_INSTALLED, reason="openpyxl not installed")
+    def test_xlsx(self):
+        from openpyxl import load_workbook
+
+        response = self.client.get(self.url, {'format': 'xlsx'})
+        self.assertEqual(response.status_code, 200)
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        rows = list(sheet.values)
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1][5], 0.1)
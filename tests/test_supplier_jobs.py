@@ -0,0 +1,145 @@
+"""
+Tests for asynchronous supplier document delivery: the send_to_supplier
+endpoint only enqueues, manage.py run_supplier_jobs delivers with backoff.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+
+def _response(status_code=200, payload=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.ok = status_code < 400
+    response.json.return_value = payload or {}
+    response.text = 'error' if status_code >= 400 else '{}'
+    return response
+
+
+class SupplierJobTests(APITestCase):
+
+    def setUp(self):
+        from users.models import User
+        from procurements.models import Procurement
+
+        self.organizer = User.objects.create(
+            platform='telegram', platform_user_id='sj_org', role='organizer'
+        )
+        self.procurement = Procurement.objects.create(
+            title='Supplies', description='x', organizer=self.organizer, city='Moscow',
+            target_amount=Decimal('1000'), deadline=timezone.now() + timedelta(days=7),
+        )
+        self.url = f'/api/procurements/{self.procurement.id}/send_to_supplier/'
+
+    def _enqueue(self, key='k1', url='https://supplier.example/api'):
+        return self.client.post(self.url, {
+            'organizer_id': self.organizer.id, 'supplier_api_url': url, 'idempotency_key': key,
+        }, format='json')
+
+    def _run(self, post_response):
+        with patch('requests.Session.post', return_value=post_response) as post:
+            out = StringIO()
+            call_command('run_supplier_jobs', '--once', stdout=out)
+        return post, out.getvalue()
+
+    def _job(self, job_id):
+        from procurements.models import SupplierDocumentJob
+        return SupplierDocumentJob.objects.get(pk=job_id)
+
+    def test_endpoint_only_enqueues(self):
+        with patch('requests.Session.post') as post:
+            response = self._enqueue()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+        post.assert_not_called()
+
+        # Same idempotency key does not create a second job
+        self.assertEqual(self._enqueue().data['job_id'], response.data['job_id'])
+
+    def test_worker_delivers_due_jobs(self):
+        job_id = self._enqueue().data['job_id']
+        post, out = self._run(_response(200, {'supplier_ref': 'SUP-1'}))
+
+        post.assert_called_once()
+        self.assertEqual(post.call_args.kwargs['json']['procurement_id'], self.procurement.id)
+        job = self._job(job_id)
+        self.assertEqual(job.status, 'sent')
+        self.assertEqual(job.response_payload, {'supplier_ref': 'SUP-1'})
+        self.assertIn('Sent 1 jobs', out)
+
+        # Already delivered: the endpoint answers from the job
+        response = self._enqueue()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['idempotent'])
+
+    def test_failures_back_off_exponentially(self):
+        from procurements.models import SupplierDocumentJob
+        from procurements.supplier_jobs import backoff
+
+        job_id = self._enqueue().data['job_id']
+        self._run(_response(503))
+        job = self._job(job_id)
+        self.assertEqual((job.status, job.retry_count), ('failed_retry', 1))
+        self.assertAlmostEqual(
+            (job.next_attempt_at - timezone.now()).total_seconds(), backoff(1).total_seconds(), delta=5
+        )
+
+        # Not due yet
+        post, _ = self._run(_response(200))
+        post.assert_not_called()
+
+        SupplierDocumentJob.objects.filter(pk=job_id).update(next_attempt_at=timezone.now())
+        self._run(_response(503))
+        job = self._job(job_id)
+        self.assertEqual(job.retry_count, 2)
+        self.assertEqual(backoff(2), 2 * backoff(1))
+
+        SupplierDocumentJob.objects.filter(pk=job_id).update(next_attempt_at=timezone.now())
+        self._run(_response(503))
+        job = self._job(job_id)
+        self.assertEqual((job.status, job.retry_count, job.next_attempt_at), ('fatal_error', 3, None))
+
+    def test_connection_error_is_retried(self):
+        import requests
+
+        job_id = self._enqueue().data['job_id']
+        with patch('requests.Session.post', side_effect=requests.ConnectionError('refused')):
+            call_command('run_supplier_jobs', '--once', stdout=StringIO())
+        job = self._job(job_id)
+        self.assertEqual(job.status, 'failed_retry')
+        self.assertIn('refused', job.error_message)
+
+    def test_resubmission_makes_failed_job_due(self):
+        job_id = self._enqueue().data['job_id']
+        self._run(_response(500))
+        self.assertGreater(self._job(job_id).next_attempt_at, timezone.now())
+
+        self._enqueue()
+        post, _ = self._run(_response(200))
+        post.assert_called_once()
+        self.assertEqual(self._job(job_id).status, 'sent')
+
+    def test_claim_skips_claimed_and_reclaims_stale(self):
+        from procurements.models import SupplierDocumentJob
+        from procurements.supplier_jobs import STALE_AFTER, claim_jobs
+
+        job_id = self._enqueue().data['job_id']
+        self.assertEqual([job.id for job in claim_jobs(10)], [job_id])
+        self.assertEqual(self._job(job_id).status, 'processing')
+        self.assertEqual(claim_jobs(10), [])
+
+        SupplierDocumentJob.objects.filter(pk=job_id).update(
+            last_attempt_at=timezone.now() - STALE_AFTER - timedelta(minutes=1)
+        )
+        self.assertEqual([job.id for job in claim_jobs(10)], [job_id])
+
+    def test_without_supplier_url_marks_sent(self):
+        job_id = self._enqueue(url='').data['job_id']
+        post, _ = self._run(_response(200))
+        post.assert_not_called()
+        self.assertEqual(self._job(job_id).status, 'sent')
@@ -0,0 +1,122 @@
+"""
+Tests for the pooled Tochka Cyclops client: shared keep-alive session,
+GET-only retries, latency histograms and the aiohttp variant.
+"""
+import importlib.util
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+AIOHTTP_INSTALLED = importlib.util.find_spec('aiohttp') is not None
+
+
+def _client(cls=None):
+    from payments.tochka_client import TochkaCyclopsClient
+
+    client = (cls or TochkaCyclopsClient)()
+    client.api_url = 'https://tochka.test/api'
+    client.nominal_account = '40702810'
+    client.platform_id = 'platform'
+    client.private_key_path = '/nonexistent.pem'
+    client._sign_request = lambda body: 'signature'
+    return client
+
+
+def _response(status_code, content=b'{}'):
+    response = MagicMock()
+    response.status_code = status_code
+    response.content = content
+    return response
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff():
+    from payments.tochka_client import reset_latency_stats
+
+    reset_latency_stats()
+    with patch('payments.tochka_client.retry_delay', return_value=0):
+        yield
+
+
+def test_requests_share_one_session():
+    client = _client()
+    ok = _response(200, b'{"status": "completed", "amount": "10.00"}')
+    with patch('requests.Session.request', return_value=ok) as request, \
+            patch('requests.request') as module_request:
+        client.get_payment_status('p1')
+        session = client.session
+        result = client.get_payment_status('p2')
+    assert request.call_count == 2
+    module_request.assert_not_called()
+    assert client.session is session
+    assert (result['status'], result['amount']) == ('succeeded', Decimal('10.00'))
+
+
+def test_get_is_retried_on_unavailable():
+    client = _client()
+    responses = [_response(503), _response(200, b'{"availableBalance": 5}')]
+    with patch('requests.Session.request', side_effect=responses) as request:
+        assert client.get_virtual_account_balance('va1') == Decimal('5')
+    assert request.call_count == 2
+
+
+def test_post_is_not_retried():
+    import requests
+    from payments.tochka_client import TochkaCyclopsError
+
+    client = _client()
+    with patch('requests.Session.request', side_effect=requests.ConnectionError('reset')) as request:
+        with pytest.raises(TochkaCyclopsError):
+            client.create_deposit_link(1, Decimal('100'))
+    assert request.call_count == 1
+
+
+def test_error_response_raises():
+    from payments.tochka_client import TochkaCyclopsError
+
+    client = _client()
+    with patch('requests.Session.request', return_value=_response(400, b'{"message": "bad", "code": "E1"}')):
+        with pytest.raises(TochkaCyclopsError) as exc:
+            client.get_payment_status('p1')
+    assert exc.value.code == 'E1'
+
+
+def test_latency_histogram_per_endpoint_template():
+    from payments.tochka_client import latency_stats
+
+    client = _client()
+    with patch('requests.Session.request', return_value=_response(200)):
+        client.get_payment_status('p1')
+        client.get_payment_status('p2')
+    stats = latency_stats()
+    assert list(stats) == ['GET payments/{id}']
+    assert stats['GET payments/{id}']['count'] == 2
+    assert sum(stats['GET payments/{id}']['buckets'].values()) == 2
+
+
+@pytest.mark.skipif(not AIOHTTP_INSTALLED, reason="aiohttp not installed")
+async def test_async_client_retries_get():
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+    from payments.tochka_client import AsyncTochkaCyclopsClient
+
+    calls = []
+
+    async def payment(request):
+        calls.append(request.match_info['payment_id'])
+        if len(calls) == 1:
+            return web.Response(status=503)
+        return web.json_response({'status': 'completed', 'amount': '7.50'})
+
+    app = web.Application()
+    app.router.add_get('/api/payments/{payment_id}', payment)
+    async with TestServer(app) as server:
+        client = _client(AsyncTochkaCyclopsClient)
+        client.api_url = str(server.make_url('/api'))
+        try:
+            result = await client.aget_payment_status('p9')
+        finally:
+            await client.aclose()
+    assert calls == ['p9', 'p9']
+    assert (result['status'], result['amount']) == ('succeeded', Decimal('7.50'))
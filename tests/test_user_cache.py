@@ -0,0 +1,114 @@
+"""
+Tests for the read-through user lookup cache (users.cache).
+
+Covers cached by_platform / check_exists / retrieve / role reads, invalidation
+on profile update, ban, role and balance changes, negative caching of
+unregistered identities, hit/miss counters and the database fallback when the
+cache backend fails.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth.models import User as DjangoUser
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+
+class UserCacheTests(APITestCase):
+    """Tests for cached user lookups and their invalidation"""
+
+    def setUp(self):
+        from users.cache import reset_cache_stats
+        from users.models import User
+
+        cache.clear()
+        reset_cache_stats()
+        self.user = User.objects.create(
+            platform='telegram', platform_user_id='cache_1', first_name='Anna', phone='+79990001122'
+        )
+        self.lookup = {'platform': 'telegram', 'platform_user_id': 'cache_1'}
+
+    def test_by_platform_served_from_cache(self):
+        first = self.client.get('/api/users/by_platform/', self.lookup)
+        self.assertEqual(first.status_code, 200)
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get('/api/users/by_platform/', self.lookup)
+            exists = self.client.get('/api/users/check_exists/', self.lookup)
+            detail = self.client.get(f'/api/users/{self.user.id}/')
+            role = self.client.get(f'/api/users/{self.user.id}/role/')
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        self.assertEqual(second.data, first.data)
+        self.assertTrue(exists.data['exists'])
+        self.assertEqual(detail.data['first_name'], 'Anna')
+        self.assertEqual(role.data, {'role': 'buyer', 'role_display': 'Buyer'})
+
+    def test_profile_update_invalidates(self):
+        self.client.get('/api/users/by_platform/', self.lookup)
+        self.client.patch(f'/api/users/{self.user.id}/', {'first_name': 'Anya'}, format='json')
+
+        resp = self.client.get('/api/users/by_platform/', self.lookup)
+        self.assertEqual(resp.data['first_name'], 'Anya')
+
+    def test_ban_and_role_change_invalidate(self):
+        self.client.get(f'/api/users/{self.user.id}/')
+
+        self.user.is_banned = True
+        self.user.role = 'organizer'
+        self.user.save(update_fields=['is_banned', 'role', 'updated_at'])
+
+        resp = self.client.get(f'/api/users/{self.user.id}/')
+        self.assertTrue(resp.data['is_banned'])
+        self.assertEqual(self.client.get(f'/api/users/{self.user.id}/role/').data['role'], 'organizer')
+
+    def test_balance_changes_invalidate(self):
+        self.client.get(f'/api/users/{self.user.id}/')
+        self.user.update_balance(Decimal('150'))
+        self.assertEqual(Decimal(self.client.get(f'/api/users/{self.user.id}/').data['balance']), Decimal('150'))
+
+        from payments.models import Payment
+        from payments.views import PaymentViewSet
+        payment = Payment.objects.create(
+            user=self.user, payment_type='deposit', amount=Decimal('50'), status='pending'
+        )
+        PaymentViewSet()._process_successful_payment(payment, {})
+        self.assertEqual(Decimal(self.client.get(f'/api/users/{self.user.id}/').data['balance']), Decimal('200'))
+
+    def test_unknown_identity_cached_until_registration(self):
+        lookup = {'platform': 'telegram', 'platform_user_id': 'cache_new'}
+        self.assertEqual(self.client.get('/api/users/by_platform/', lookup).status_code, 404)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertFalse(self.client.get('/api/users/check_exists/', lookup).data['exists'])
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        from users.models import User
+        User.objects.create(platform='telegram', platform_user_id='cache_new')
+        self.assertTrue(self.client.get('/api/users/check_exists/', lookup).data['exists'])
+
+    def test_delete_invalidates(self):
+        self.client.get(f'/api/users/{self.user.id}/')
+        self.user.delete()
+        self.assertEqual(self.client.get(f'/api/users/{self.user.id}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/users/by_platform/', self.lookup).status_code, 404)
+
+    def test_hit_miss_counters(self):
+        self.client.get('/api/users/by_platform/', self.lookup)
+        self.client.get('/api/users/by_platform/', self.lookup)
+        self.client.get('/api/users/by_platform/', self.lookup)
+
+        DjangoUser.objects.create_user(username='admin', password='adminpass123', is_staff=True)
+        self.client.login(username='admin', password='adminpass123')
+        resp = self.client.get('/api/admin/cache/users/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((resp.data['hits'], resp.data['misses']), (2, 1))
+        self.assertAlmostEqual(resp.data['hit_rate'], 0.6667)
+
+    def test_cache_failure_falls_back_to_database(self):
+        with patch('users.cache.cache.get', side_effect=ConnectionError('redis down')), \
+                patch('users.cache.cache.set', side_effect=ConnectionError('redis down')):
+            resp = self.client.get('/api/users/by_platform/', self.lookup)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['id'], self.user.id)